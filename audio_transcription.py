@@ -0,0 +1,258 @@
+import os
+import time
+import wave
+import shutil
+import sqlite3
+import hashlib
+import tempfile
+import threading
+import subprocess
+import telemetry
+from concurrent.futures import ThreadPoolExecutor
+from request_scheduler import get_scheduler
+
+WHISPER_MODEL = "whisper-1"
+# Whisper rejects uploads above 25 MB.
+MAX_UPLOAD_BYTES = 25 * 1024 * 1024
+# WAV segments are cut this far below the limit, leaving room for the header.
+SEGMENT_HEADROOM_BYTES = 1024 * 1024
+DEFAULT_WINDOW_SECONDS = 300  # Naming only needs the first few minutes.
+DEFAULT_CHUNK_SECONDS = 120
+DEFAULT_WORKERS = 4
+TRANSCRIPT_CACHE_FILE = 'transcript_cache.db'
+# Leading bytes hashed for the transcript cache key, together with the size and mtime.
+KEY_PREFIX_BYTES = 1024 * 1024
+
+
+def file_key(file_path, prefix_bytes=KEY_PREFIX_BYTES):
+    """
+    :return: Hash of the file's size, modification time and first ``prefix_bytes``
+             bytes; reading the whole file would cost more than the transcribed window
+    """
+    st = os.stat(file_path)
+    digest = hashlib.sha256(f"{st.st_size}:{st.st_mtime_ns}:".encode())
+    with open(file_path, 'rb') as f:
+        digest.update(f.read(prefix_bytes))
+    return digest.hexdigest()
+
+
+def audio_duration(file_path):
+    """
+    Return the duration of an audio file in seconds, or None if it cannot be determined.
+
+    WAV files are read with the standard library; other formats need ffprobe.
+    """
+    if file_path.lower().endswith('.wav'):
+        try:
+            with wave.open(file_path, 'rb') as audio:
+                return audio.getnframes() / float(audio.getframerate())
+        except (wave.Error, EOFError):
+            pass
+    if shutil.which('ffprobe'):
+        result = subprocess.run(
+            ['ffprobe', '-v', 'error', '-show_entries', 'format=duration',
+             '-of', 'default=noprint_wrappers=1:nokey=1', file_path],
+            capture_output=True, text=True
+        )
+        try:
+            return float(result.stdout.strip())
+        except ValueError:
+            pass
+    return None
+
+
+def max_segment_seconds(file_path):
+    """
+    Return the longest WAV segment of ``file_path`` that stays under the
+    upload limit. WAV is uncompressed, so its size follows from the frame
+    rate, sample width and channel count.
+
+    :return: Seconds, or None for other formats (cut to small mp3 segments)
+    """
+    if not file_path.lower().endswith('.wav'):
+        return None
+    try:
+        with wave.open(file_path, 'rb') as audio:
+            bytes_per_second = audio.getframerate() * audio.getsampwidth() * audio.getnchannels()
+    except (wave.Error, EOFError):
+        return None
+    if not bytes_per_second:
+        return None
+    return (MAX_UPLOAD_BYTES - SEGMENT_HEADROOM_BYTES) / bytes_per_second
+
+
+def cut_segment(file_path, start, duration, output_dir):
+    """
+    Write ``duration`` seconds of audio starting at ``start`` to a new file.
+
+    :return: Path of the segment
+    :raises RuntimeError: If the format cannot be cut without ffmpeg
+    """
+    if file_path.lower().endswith('.wav'):
+        output_path = os.path.join(output_dir, f"segment_{start:.0f}.wav")
+        try:
+            with wave.open(file_path, 'rb') as source:
+                rate = source.getframerate()
+                source.setpos(min(int(start * rate), source.getnframes()))
+                frames = source.readframes(int(duration * rate))
+                with wave.open(output_path, 'wb') as target:
+                    target.setnchannels(source.getnchannels())
+                    target.setsampwidth(source.getsampwidth())
+                    target.setframerate(rate)
+                    target.writeframes(frames)
+            return output_path
+        except (wave.Error, EOFError):
+            # Float and extensible PCM are not supported by the wave module; ffmpeg cuts them below.
+            if not shutil.which('ffmpeg'):
+                raise RuntimeError(f"'{file_path}' is a WAV variant that needs ffmpeg to be split")
+    if not shutil.which('ffmpeg'):
+        raise RuntimeError("ffmpeg is required to split non-WAV audio")
+    output_path = os.path.join(output_dir, f"segment_{start:.0f}.mp3")
+    # Mono 16 kHz mp3 keeps every chunk far below the upload limit.
+    subprocess.run(
+        ['ffmpeg', '-v', 'error', '-y', '-ss', str(start), '-t', str(duration), '-i', file_path,
+         '-ac', '1', '-ar', '16000', '-b:a', '64k', output_path],
+        check=True
+    )
+    return output_path
+
+
+class TranscriptCache:
+    def __init__(self, path=TRANSCRIPT_CACHE_FILE):
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS transcripts (
+                key TEXT PRIMARY KEY,
+                text TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+
+    def get(self, key):
+        with self._lock:
+            row = self.conn.execute("SELECT text FROM transcripts WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def put(self, key, text):
+        with self._lock:
+            self.conn.execute("INSERT OR REPLACE INTO transcripts (key, text, created_at) VALUES (?, ?, ?)",
+                              (key, text, time.time()))
+
+
+class AudioTranscriber:
+    """
+    Transcribes the leading window of audio files, in concurrent chunks.
+
+    Only the first ``window_seconds`` are transcribed by default (0 or None
+    transcribes everything). Longer windows are split into ``chunk_seconds``
+    pieces (shorter for WAV files that would exceed the upload limit) that
+    are sent in parallel over one shared client. Transcripts are
+    cached by the file's size, mtime and a hash of its first bytes.
+
+    ``transcribe_fn(path) -> text`` replaces the Whisper call, e.g. with a
+    local stub in tests and benchmarks.
+    """
+
+    def __init__(self, api_key=None, window_seconds=None, chunk_seconds=None, max_workers=None,
+                 cache_path=TRANSCRIPT_CACHE_FILE, transcribe_fn=None):
+        self.api_key = api_key
+        self.window_seconds = window_seconds if window_seconds is not None else \
+            float(os.getenv("audio_window_seconds", DEFAULT_WINDOW_SECONDS))
+        self.chunk_seconds = chunk_seconds or float(os.getenv("audio_chunk_seconds", DEFAULT_CHUNK_SECONDS))
+        self.max_workers = max_workers or int(os.getenv("audio_workers", DEFAULT_WORKERS))
+        self.cache = TranscriptCache(cache_path) if cache_path else None
+        self.transcribe_fn = transcribe_fn or self._whisper
+        self._client = None
+        self._client_lock = threading.Lock()
+
+    @property
+    def client(self):
+        with self._client_lock:
+            if self._client is None:
+                from openai import OpenAI
+                # Retried by the request scheduler only, as in OpenAIIntegration.create_client.
+                self._client = OpenAI(api_key=self.api_key, max_retries=0)
+            return self._client
+
+    def _whisper(self, audio_path):
+        return get_scheduler().call(self._whisper_request, audio_path)
+
+    def _whisper_request(self, audio_path):
+        telemetry.increment('audio_bytes_sent', os.path.getsize(audio_path))
+        # The file is reopened on every attempt so retries upload it from the start.
+        with telemetry.span('llm.request', endpoint='transcriptions'), open(audio_path, 'rb') as audio_file:
+            transcription = self.client.audio.transcriptions.create(model=WHISPER_MODEL, file=audio_file)
+        return transcription.text
+
+    def transcribe(self, file_path):
+        cache_key = f"{file_key(file_path)}:{WHISPER_MODEL}:{self.window_seconds or 'all'}"
+        if self.cache is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                telemetry.increment('cache_lookups', cache='transcript', result='hit')
+                return cached
+            telemetry.increment('cache_lookups', cache='transcript', result='miss')
+
+        with telemetry.span('transcribe'):
+            text = self._transcribe_uncached(file_path)
+        if self.cache is not None:
+            self.cache.put(cache_key, text)
+        return text
+
+    def _transcribe_uncached(self, file_path):
+        duration = audio_duration(file_path)
+        if duration is None:
+            # Without a duration the file cannot be cut, so send it whole if the API accepts it.
+            if os.path.getsize(file_path) > MAX_UPLOAD_BYTES:
+                raise RuntimeError(f"'{file_path}' exceeds the upload limit and cannot be split (install ffmpeg)")
+            return self.transcribe_fn(file_path)
+
+        window = min(duration, self.window_seconds) if self.window_seconds else duration
+        if window >= duration and duration <= self.chunk_seconds and os.path.getsize(file_path) <= MAX_UPLOAD_BYTES:
+            return self.transcribe_fn(file_path)
+        chunk_seconds = self.chunk_seconds
+        max_seconds = max_segment_seconds(file_path)
+        if max_seconds is not None:
+            # High sample rates, wide samples or many channels exceed the limit within chunk_seconds.
+            chunk_seconds = min(chunk_seconds, max_seconds)
+
+        starts = []
+        start = 0.0
+        while start < window:
+            starts.append(start)
+            start += chunk_seconds
+
+        with tempfile.TemporaryDirectory(prefix="transcribe_") as tmp_dir:
+            def transcribe_chunk(start):
+                segment = cut_segment(file_path, start, min(chunk_seconds, window - start), tmp_dir)
+                return self.transcribe_fn(segment)
+
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                texts = list(pool.map(transcribe_chunk, starts))
+        return ' '.join(text.strip() for text in texts if text)
+
+
+_transcriber = None
+_transcriber_lock = threading.Lock()
+
+
+def get_transcriber(api_key=None):
+    """
+    Return the shared transcriber, creating it on first use.
+    """
+    global _transcriber
+    with _transcriber_lock:
+        if _transcriber is None:
+            _transcriber = AudioTranscriber(api_key=api_key)
+        return _transcriber
+
+
+def set_transcriber(transcriber):
+    """
+    Replace the shared transcriber, e.g. with ``AudioTranscriber(transcribe_fn=stub)``.
+    """
+    global _transcriber
+    with _transcriber_lock:
+        _transcriber = transcriber
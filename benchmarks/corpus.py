@@ -0,0 +1,223 @@
+import os
+import csv
+import wave
+import math
+import random
+import struct
+import zipfile
+from xml.sax.saxutils import escape
+
+FILE_TYPES = ('pdf', 'docx', 'xlsx', 'csv', 'txt', 'wav')
+
+WORDS = (
+    "invoice receipt quarterly report marketing strategy budget forecast revenue expense contract "
+    "agreement meeting minutes project plan roadmap design review customer account statement payroll "
+    "employee onboarding policy security audit compliance inventory supplier order shipment analysis "
+    "summary proposal research survey results presentation training manual release notes annual tax"
+).split()
+
+
+def sentence(rng, length=12):
+    words = [rng.choice(WORDS) for _ in range(length)]
+    return ' '.join(words).capitalize() + '.'
+
+
+def paragraphs(rng, count):
+    return [' '.join(sentence(rng, rng.randint(8, 16)) for _ in range(rng.randint(3, 6))) for _ in range(count)]
+
+
+def write_txt(path, rng, scale):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(sentence(rng, 5).upper() + '\n\n')
+        f.write('\n\n'.join(paragraphs(rng, 20 * scale)))
+
+
+def write_csv(path, rng, scale):
+    columns = rng.sample(WORDS, 6)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for i in range(200 * scale):
+            writer.writerow([i, rng.choice(WORDS), round(rng.random() * 1000, 2), rng.choice(WORDS),
+                             f"2023-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}", rng.randint(0, 99)])
+
+
+def _pdf_escape(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def write_pdf(path, rng, scale):
+    """Write a minimal PDF with a Helvetica text layer on ``2 * scale`` pages."""
+    page_count = 2 * scale
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # Pages, filled in once the page object numbers are known.
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_refs = []
+    for _ in range(page_count):
+        lines = [sentence(rng, 9) for _ in range(40)]
+        stream = "BT /F1 11 Tf 14 TL 50 760 Td " + ' '.join(f"({_pdf_escape(line)}) '" for line in lines) + " ET"
+        stream = stream.encode('latin-1')
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_ref = len(objects)
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_ref)
+        page_refs.append(len(objects))
+    kids = ' '.join(f"{ref} 0 R" for ref in page_refs).encode('ascii')
+    objects[1] = b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % page_count
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, 'wb') as f:
+        f.write(out)
+
+
+def write_docx(path, rng, scale):
+    body = ''.join(f"<w:p><w:r><w:t>{escape(text)}</w:t></w:r></w:p>" for text in paragraphs(rng, 20 * scale))
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as z:
+        z.writestr('[Content_Types].xml',
+                   '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                   '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+                   '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+                   '<Default Extension="xml" ContentType="application/xml"/>'
+                   '<Override PartName="/word/document.xml" ContentType="application/'
+                   'vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/></Types>')
+        z.writestr('_rels/.rels',
+                   '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                   '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                   '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/'
+                   'relationships/officeDocument" Target="word/document.xml"/></Relationships>')
+        z.writestr('word/_rels/document.xml.rels',
+                   '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                   '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships"/>')
+        z.writestr('word/document.xml',
+                   '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                   '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+                   f'<w:body>{body}</w:body></w:document>')
+
+
+def _cell(column, row, value):
+    ref = f"{chr(ord('A') + column)}{row}"
+    if isinstance(value, (int, float)):
+        return f'<c r="{ref}"><v>{value}</v></c>'
+    return f'<c r="{ref}" t="inlineStr"><is><t>{escape(str(value))}</t></is></c>'
+
+
+def write_xlsx(path, rng, scale):
+    sheet_count = 3 * scale
+    sheets = []
+    for index in range(sheet_count):
+        columns = rng.sample(WORDS, 5)
+        rows = [columns] + [[rng.choice(WORDS), rng.randint(0, 1000), round(rng.random() * 100, 2),
+                             rng.choice(WORDS), rng.randint(2000, 2024)] for _ in range(100 * scale)]
+        xml_rows = ''.join(
+            f'<row r="{r}">' + ''.join(_cell(c, r, v) for c, v in enumerate(values)) + '</row>'
+            for r, values in enumerate(rows, start=1)
+        )
+        sheets.append((f"{rng.choice(WORDS).title()} {index + 1}", xml_rows))
+
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as z:
+        overrides = ''.join(
+            f'<Override PartName="/xl/worksheets/sheet{i}.xml" ContentType="application/'
+            f'vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+            for i in range(1, sheet_count + 1)
+        )
+        z.writestr('[Content_Types].xml',
+                   '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                   '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+                   '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+                   '<Default Extension="xml" ContentType="application/xml"/>'
+                   '<Override PartName="/xl/workbook.xml" ContentType="application/'
+                   'vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+                   f'{overrides}</Types>')
+        z.writestr('_rels/.rels',
+                   '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                   '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                   '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/'
+                   'relationships/officeDocument" Target="xl/workbook.xml"/></Relationships>')
+        z.writestr('xl/workbook.xml',
+                   '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                   '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+                   'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"><sheets>'
+                   + ''.join(f'<sheet name="{escape(name)}" sheetId="{i}" r:id="rId{i}"/>'
+                             for i, (name, _) in enumerate(sheets, start=1))
+                   + '</sheets></workbook>')
+        z.writestr('xl/_rels/workbook.xml.rels',
+                   '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                   '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                   + ''.join(f'<Relationship Id="rId{i}" Type="http://schemas.openxmlformats.org/officeDocument/'
+                             f'2006/relationships/worksheet" Target="worksheets/sheet{i}.xml"/>'
+                             for i in range(1, sheet_count + 1))
+                   + '</Relationships>')
+        for i, (_, xml_rows) in enumerate(sheets, start=1):
+            z.writestr(f'xl/worksheets/sheet{i}.xml',
+                       '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                       '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                       f'<sheetData>{xml_rows}</sheetData></worksheet>')
+
+
+def write_wav(path, rng, scale):
+    rate = 8000
+    seconds = 30 * scale
+    frequency = rng.choice((220, 330, 440))
+    with wave.open(path, 'wb') as audio:
+        audio.setnchannels(1)
+        audio.setsampwidth(2)
+        audio.setframerate(rate)
+        samples = (int(8000 * math.sin(2 * math.pi * frequency * i / rate)) for i in range(rate * seconds))
+        audio.writeframes(b''.join(struct.pack('<h', s) for s in samples))
+
+
+WRITERS = {
+    'pdf': write_pdf,
+    'docx': write_docx,
+    'xlsx': write_xlsx,
+    'csv': write_csv,
+    'txt': write_txt,
+    'wav': write_wav,
+}
+
+
+def generate_corpus(directory, count=10, types=FILE_TYPES, scale=1, seed=0):
+    """
+    Write a reproducible synthetic corpus.
+
+    :param directory: Output directory (created if missing)
+    :param count: Files per type
+    :param types: File types to generate, from FILE_TYPES
+    :param scale: Size multiplier (pages, paragraphs, rows, sheets, seconds of audio)
+    :param seed: Random seed; the same arguments always produce the same files
+    :return: List of generated paths
+    """
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    paths = []
+    for file_type in types:
+        for index in range(count):
+            path = os.path.join(directory, f"scan_{file_type}_{index:05d}.{file_type}")
+            WRITERS[file_type](path, rng, scale)
+            paths.append(path)
+    return paths
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate a synthetic benchmark corpus.")
+    parser.add_argument('directory')
+    parser.add_argument('--count', type=int, default=10, help="Files per type")
+    parser.add_argument('--types', default=','.join(FILE_TYPES), help="Comma-separated file types")
+    parser.add_argument('--scale', type=int, default=1, help="Size multiplier")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    paths = generate_corpus(args.directory, args.count, args.types.split(','), args.scale, args.seed)
+    print(f"Wrote {len(paths)} files to '{args.directory}'")
@@ -0,0 +1,243 @@
+import re
+import json
+import time
+import random
+import itertools
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+CONTENT_PATTERN = re.compile(r'Content: "(.*)"\s*$', re.DOTALL)
+BATCH_PATTERN = re.compile(r'Files: (\[.*\])\s*$', re.DOTALL)
+WORD_PATTERN = re.compile(r'[A-Za-z]{3,}')
+
+
+def fake_suggestion(content):
+    words = WORD_PATTERN.findall(content)[:40]
+    name = '-'.join(word.capitalize() for word in words[:4]) or 'Untitled'
+    tags = sorted({word.lower() for word in words[4:]})[:4]
+    confidence = 0.5 + (len(words) % 5) / 10
+    return name, tags, confidence
+
+
+def fake_reply(prompt):
+    """Build a deterministic assistant reply in the format the real assistant is instructed to use."""
+    batch = BATCH_PATTERN.search(prompt)
+    if batch:
+        replies = []
+        for item in json.loads(batch.group(1)):
+            name, tags, confidence = fake_suggestion(item["content"])
+            replies.append({"id": item["id"], "filename": name, "tags": tags, "confidence": confidence})
+        return json.dumps(replies)
+    match = CONTENT_PATTERN.search(prompt)
+    name, tags, confidence = fake_suggestion(match.group(1) if match else prompt)
+    return f'"{name}" [{", ".join(tags)}] (confidence: {confidence:.2f})'
+
+
+class FakeOpenAIServer:
+    """
+    Local stand-in for the Assistants and Whisper endpoints used by the app.
+
+    :param run_latency: Seconds a run stays in progress before it completes
+    :param request_latency: Seconds added to every HTTP response
+    :param error_rate: Fraction of requests answered with 429 (Retry-After) or 500
+    :param transcription_latency: Seconds each transcription request takes
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, run_latency=0.5, request_latency=0.02, error_rate=0.0,
+                 transcription_latency=0.3, seed=0):
+        self.run_latency = run_latency
+        self.request_latency = request_latency
+        self.error_rate = error_rate
+        self.transcription_latency = transcription_latency
+        self._random = random.Random(seed)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.assistants = {}
+        self.runs = {}
+        self.messages = {}
+        self.stats = {"requests": 0, "errors": 0, "runs": 0, "transcriptions": 0}
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def new_id(self, prefix):
+        with self._lock:
+            return f"{prefix}_{next(self._ids):08d}"
+
+    def count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def inject_error(self):
+        with self._lock:
+            return self.error_rate and self._random.random() < self.error_rate
+
+    def run_object(self, run_id):
+        run = self.runs[run_id]
+        elapsed = time.monotonic() - run["started"]
+        status = run["status"]
+        if status == 'in_progress' and elapsed >= self.run_latency:
+            status = run["status"] = 'completed'
+        return {
+            "id": run_id, "object": "thread.run", "created_at": int(run["created_at"]),
+            "thread_id": run["thread_id"], "assistant_id": run["assistant_id"], "status": status,
+            "model": "gpt-3.5-turbo-16k", "instructions": "", "tools": [], "metadata": {},
+            "last_error": None,
+        }
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def send_json(self, status, body, headers=None):
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def read_body(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                return self.rfile.read(length) if length else b''
+
+            def handle_request(self, method):
+                body = self.read_body()
+                server.count("requests")
+                if server.request_latency:
+                    time.sleep(server.request_latency)
+                if server.inject_error():
+                    server.count("errors")
+                    if server._random.random() < 0.5:
+                        self.send_json(429, {"error": {"message": "Rate limit reached", "type": "requests"}},
+                                       {'retry-after-ms': '200'})
+                    else:
+                        self.send_json(500, {"error": {"message": "Injected server error", "type": "server_error"}})
+                    return
+                path = self.path.split('?', 1)[0].rstrip('/')
+                for pattern, route_method, handler in ROUTES:
+                    match = re.fullmatch(pattern, path)
+                    if match and route_method == method:
+                        status, response = handler(body, *match.groups())
+                        self.send_json(status, response)
+                        return
+                self.send_json(404, {"error": {"message": f"Unknown route {method} {path}"}})
+
+            def do_GET(self):
+                self.handle_request('GET')
+
+            def do_POST(self):
+                self.handle_request('POST')
+
+        def create_assistant(body):
+            data = json.loads(body or b'{}')
+            assistant_id = server.new_id('asst')
+            server.assistants[assistant_id] = {
+                "id": assistant_id, "object": "assistant", "created_at": int(time.time()),
+                "name": data.get("name"), "model": data.get("model"), "instructions": data.get("instructions"),
+                "tools": [], "metadata": {}, "description": None,
+            }
+            return 200, server.assistants[assistant_id]
+
+        def retrieve_assistant(body, assistant_id):
+            if assistant_id not in server.assistants:
+                return 404, {"error": {"message": f"No assistant found with id '{assistant_id}'."}}
+            return 200, server.assistants[assistant_id]
+
+        def create_and_run(body):
+            data = json.loads(body or b'{}')
+            messages = (data.get("thread") or {}).get("messages") or [{"content": ""}]
+            thread_id, run_id = server.new_id('thread'), server.new_id('run')
+            server.runs[run_id] = {
+                "thread_id": thread_id, "assistant_id": data.get("assistant_id"), "status": 'in_progress',
+                "started": time.monotonic(), "created_at": time.time(),
+            }
+            server.messages[thread_id] = fake_reply(str(messages[-1].get("content", "")))
+            server.count("runs")
+            return 200, server.run_object(run_id)
+
+        def retrieve_run(body, thread_id, run_id):
+            if run_id not in server.runs:
+                return 404, {"error": {"message": f"No run found with id '{run_id}'."}}
+            return 200, server.run_object(run_id)
+
+        def cancel_run(body, thread_id, run_id):
+            if run_id not in server.runs:
+                return 404, {"error": {"message": f"No run found with id '{run_id}'."}}
+            server.runs[run_id]["status"] = 'cancelled'
+            return 200, server.run_object(run_id)
+
+        def list_messages(body, thread_id):
+            text = server.messages.get(thread_id)
+            if text is None:
+                return 404, {"error": {"message": f"No thread found with id '{thread_id}'."}}
+            message_id = f"msg_{thread_id}"
+            message = {
+                "id": message_id, "object": "thread.message", "created_at": int(time.time()),
+                "thread_id": thread_id, "role": "assistant", "file_ids": [], "metadata": {},
+                "content": [{"type": "text", "text": {"value": text, "annotations": []}}],
+            }
+            return 200, {"object": "list", "data": [message], "first_id": message_id, "last_id": message_id,
+                         "has_more": False}
+
+        def transcribe(body):
+            server.count("transcriptions")
+            time.sleep(server.transcription_latency)
+            return 200, {"text": f"Synthetic transcript of a {len(body) // 1024} KB recording about "
+                                 f"quarterly budget planning and the product roadmap."}
+
+        ROUTES = (
+            (r'/v1/assistants', 'POST', create_assistant),
+            (r'/v1/assistants/([^/]+)', 'GET', retrieve_assistant),
+            (r'/v1/threads/runs', 'POST', create_and_run),
+            (r'/v1/threads/([^/]+)/runs/([^/]+)', 'GET', retrieve_run),
+            (r'/v1/threads/([^/]+)/runs/([^/]+)/cancel', 'POST', cancel_run),
+            (r'/v1/threads/([^/]+)/messages', 'GET', list_messages),
+            (r'/v1/audio/transcriptions', 'POST', transcribe),
+        )
+        return Handler
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve a local stand-in for the OpenAI endpoints.")
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--run-latency', type=float, default=0.5)
+    parser.add_argument('--request-latency', type=float, default=0.02)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    args = parser.parse_args()
+    fake = FakeOpenAIServer(port=args.port, run_latency=args.run_latency, request_latency=args.request_latency,
+                            error_rate=args.error_rate)
+    print(f"Serving on {fake.base_url} (set OPENAI_BASE_URL to this address)")
+    try:
+        fake.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
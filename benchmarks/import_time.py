@@ -0,0 +1,112 @@
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARK_DIR)
+
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, 'import_baseline.json')
+DEFAULT_TOLERANCE = 0.25
+# Entry points (GUI and CLI) and the modules on their startup path.
+DEFAULT_MODULES = ('main', 'cli', 'file_operations', 'openai_integration', 'content_extractors')
+# Libraries that must not be imported at startup; they load on first use.
+HEAVY_MODULES = ('pandas', 'PyPDF2', 'docx', 'openpyxl', 'openai')
+
+
+def measure_import(module, python=sys.executable):
+    """
+    Import ``module`` in a fresh interpreter with ``-X importtime``.
+
+    :return: Dict with total_ms, the heaviest imports and which HEAVY_MODULES were loaded,
+             or an error message if the import failed
+    """
+    check = f"import sys, {module}; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    process = subprocess.run([python, '-X', 'importtime', '-c', check], cwd=REPO_DIR,
+                             capture_output=True, text=True)
+    if process.returncode != 0:
+        return {"error": process.stderr.strip().splitlines()[-1] if process.stderr.strip() else "import failed"}
+    imports = []
+    for line in process.stderr.splitlines():
+        # "import time:  self [us] | cumulative | imported package"
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line.split(':', 1)[1].split('|')
+        # Nested imports are indented by two spaces per level after the separator's space.
+        imports.append((name[1:].rstrip(), int(self_us), int(cumulative_us)))
+    total_us = sum(self_us for _, self_us, _ in imports)
+    heaviest = sorted((entry for entry in imports if not entry[0].startswith(' ')),
+                      key=lambda entry: entry[2], reverse=True)[:5]
+    return {
+        "total_ms": round(total_us / 1000, 1),
+        "heaviest": [(name, round(cumulative / 1000, 1)) for name, _, cumulative in heaviest],
+        "heavy_loaded": [m for m in process.stdout.strip().split(',') if m],
+    }
+
+
+def run(modules, repeat):
+    results = {}
+    for module in modules:
+        samples = [measure_import(module) for _ in range(repeat)]
+        errors = [sample["error"] for sample in samples if "error" in sample]
+        if errors:
+            results[module] = {"error": errors[0]}
+            continue
+        median = statistics.median(sample["total_ms"] for sample in samples)
+        best = min(samples, key=lambda sample: abs(sample["total_ms"] - median))
+        results[module] = dict(best, total_ms=median)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the import (startup) time of the application modules.")
+    parser.add_argument('modules', nargs='*', default=list(DEFAULT_MODULES), help="Modules to import")
+    parser.add_argument('--repeat', type=int, default=5, help="Fresh interpreters per module; the median is kept")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="Baseline results file")
+    parser.add_argument('--save-baseline', action='store_true', help="Store these results as the new baseline")
+    parser.add_argument('--compare', action='store_true',
+                        help="Fail if an import got slower than --tolerance or loads a heavy library at startup")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help="Allowed relative regression")
+    args = parser.parse_args(argv)
+
+    results = run(args.modules, args.repeat)
+    status = 0
+    for module, result in results.items():
+        if "error" in result:
+            print(f"{module:<20} could not be imported: {result['error']}")
+            continue
+        heavy = f"  loads {', '.join(result['heavy_loaded'])}" if result["heavy_loaded"] else ''
+        print(f"{module:<20} {result['total_ms']:>8} ms{heavy}")
+        for name, cumulative_ms in result["heaviest"]:
+            print(f"    {name:<30} {cumulative_ms:>8} ms")
+        if heavy and args.compare:
+            status = 1
+
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        print(f"Compared with '{args.baseline}' (tolerance {args.tolerance:.0%}):")
+        for module, result in results.items():
+            before = baseline.get(module, {}).get("total_ms")
+            if not before or "total_ms" not in result:
+                continue
+            change = (result["total_ms"] - before) / before
+            regressed = change > args.tolerance
+            print(f"  {module:<20} {before:>8} -> {result['total_ms']:<8} {change:+.1%}{'  REGRESSION' if regressed else ''}")
+            if regressed and args.compare:
+                status = 1
+    elif args.compare:
+        print(f"No baseline at '{args.baseline}'; run with --save-baseline first.")
+        status = 1
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved baseline to '{args.baseline}'")
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,242 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import platform
+import threading
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+
+from corpus import FILE_TYPES, generate_corpus  # noqa: E402
+from fake_openai import FakeOpenAIServer  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, 'baseline.json')
+DEFAULT_TOLERANCE = 0.15
+STAGES = ('extract', 'suggest', 'rename')
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process plus its largest child (e.g. an extraction worker)."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    self_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    child_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere.
+    unit = 1024 * 1024 if platform.system() == 'Darwin' else 1024
+    return round((self_rss + child_rss) / unit, 1)
+
+
+class StageTimer:
+    def __init__(self):
+        self.samples = {stage: [] for stage in STAGES}
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self._lock:
+            self.samples[stage].append(seconds)
+
+    def wrap(self, stage, fn):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.record(stage, time.perf_counter() - start)
+        return timed
+
+    def summary(self):
+        return {
+            stage: {
+                "count": len(values),
+                "p50_ms": round(percentile(values, 0.5) * 1000, 2) if values else None,
+                "p95_ms": round(percentile(values, 0.95) * 1000, 2) if values else None,
+                "total_s": round(sum(values), 3),
+            }
+            for stage, values in self.samples.items()
+        }
+
+
+def measure(corpus_dir, args):
+    from file_operations import FileOperations
+    from openai_integration import OpenAIIntegration
+    from suggestion_pipeline import SuggestionPipeline
+    from request_scheduler import PRIORITY_BULK
+    from directory_scanner import scan_directory
+    import telemetry
+
+    timer = StageTimer()
+    file_ops = FileOperations()
+    openai_integration = OpenAIIntegration()
+    file_ops.detect_file_type_and_extract_content = timer.wrap(
+        'extract', file_ops.detect_file_type_and_extract_content)
+    openai_integration.generate_suggestion = timer.wrap('suggest', openai_integration.generate_suggestion)
+    openai_integration.generate_batch_suggestions = timer.wrap('suggest', openai_integration.generate_batch_suggestions)
+    apply_rename = timer.wrap('rename', file_ops.apply_rename)
+
+    start = time.perf_counter()
+    client = openai_integration.create_client()
+    assistant = openai_integration.create_assistant(client)
+    pipeline = SuggestionPipeline(file_ops, openai_integration, client, assistant, max_workers=args.workers,
+                                  prefetch=args.prefetch, priority=PRIORITY_BULK)
+    outcomes = {}
+    try:
+        with file_ops.batch():
+            for suggestion in pipeline.start(scan_directory(corpus_dir)):
+                if suggestion.new_name:
+                    outcome = 'renamed' if apply_rename(suggestion.file_path, suggestion.new_name,
+                                                        suggestion.tags, suggestion.content) else 'failed'
+                else:
+                    outcome = 'skipped' if suggestion.skipped else 'error'
+                outcomes[outcome] = outcomes.get(outcome, 0) + 1
+    finally:
+        pipeline.cancel()
+        if file_ops.extraction_engine:
+            file_ops.extraction_engine.shutdown()
+    elapsed = time.perf_counter() - start
+
+    files = sum(outcomes.values())
+    tokens_sent = sum(telemetry.get_telemetry().snapshot()["counters"].get('llm_tokens_sent', {}).values())
+    return {
+        "files": files,
+        "outcomes": outcomes,
+        "elapsed_s": round(elapsed, 3),
+        "files_per_sec": round(files / elapsed, 3) if elapsed else None,
+        "tokens_sent": tokens_sent,
+        "tokens_per_file": round(tokens_sent / files, 1) if files else None,
+        "stages": timer.summary(),
+        "peak_rss_mb": peak_rss_mb(),
+        "scheduler": openai_integration.scheduler.metrics(),
+    }
+
+
+def run_benchmark(args):
+    config = {
+        "count": args.count, "types": args.types, "scale": args.scale, "seed": args.seed,
+        "run_latency": args.run_latency, "request_latency": args.request_latency, "error_rate": args.error_rate,
+        "workers": args.workers, "prefetch": args.prefetch,
+    }
+    workdir = tempfile.mkdtemp(prefix='file_organizer_bench_')
+    corpus_dir = os.path.join(workdir, 'corpus')
+    previous_dir = os.getcwd()
+    try:
+        generate_corpus(corpus_dir, args.count, args.types, args.scale, args.seed)
+        with FakeOpenAIServer(run_latency=args.run_latency, request_latency=args.request_latency,
+                              error_rate=args.error_rate, seed=args.seed) as server:
+            os.environ["openai_api_key"] = "benchmark"
+            os.environ["OPENAI_BASE_URL"] = server.base_url
+            os.environ.pop("openai_assistant_id", None)
+            # Logs and caches are created relative to the working directory, so every run starts cold.
+            os.chdir(workdir)
+            results = measure(corpus_dir, args)
+            results["server"] = dict(server.stats)
+    finally:
+        os.chdir(previous_dir)
+        if args.keep:
+            print(f"Kept benchmark files in '{workdir}'")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+    results["config"] = config
+    results["python"] = platform.python_version()
+    return results
+
+
+def comparable_metrics(results):
+    """Yield (name, value, higher_is_better) for every metric that is compared with the baseline."""
+    yield "files_per_sec", results.get("files_per_sec"), True
+    yield "tokens_per_file", results.get("tokens_per_file"), False
+    for stage, summary in results.get("stages", {}).items():
+        yield f"{stage}.p50_ms", summary.get("p50_ms"), False
+        yield f"{stage}.p95_ms", summary.get("p95_ms"), False
+    yield "peak_rss_mb", results.get("peak_rss_mb"), False
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Compare results with a baseline.
+
+    :return: List of (metric, baseline, current, relative change, regressed)
+    """
+    previous = {name: value for name, value, _ in comparable_metrics(baseline)}
+    rows = []
+    for name, current, higher_is_better in comparable_metrics(results):
+        before = previous.get(name)
+        if not before or current is None:
+            continue
+        change = (current - before) / before
+        regressed = change < -tolerance if higher_is_better else change > tolerance
+        rows.append((name, before, current, change, regressed))
+    return rows
+
+
+def print_report(results):
+    print(f"{results['files']} files in {results['elapsed_s']}s: {results['files_per_sec']} files/sec, "
+          f"{results['tokens_per_file']} tokens/file, peak RSS {results['peak_rss_mb']} MB")
+    for stage, summary in results["stages"].items():
+        print(f"  {stage:<8} n={summary['count']:<5} p50={summary['p50_ms']} ms  p95={summary['p95_ms']} ms")
+    print(f"  outcomes: {results['outcomes']}")
+    print(f"  server:   {results['server']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the headless rename pipeline.")
+    parser.add_argument('--count', type=int, default=10, help="Files per type")
+    parser.add_argument('--types', default=','.join(FILE_TYPES), help="Comma-separated file types")
+    parser.add_argument('--scale', type=int, default=1, help="File size multiplier")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--run-latency', type=float, default=0.5, help="Seconds each assistant run takes")
+    parser.add_argument('--request-latency', type=float, default=0.02, help="Seconds added to every API request")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of API requests that fail")
+    parser.add_argument('--workers', type=int, help="Concurrent suggestion workers")
+    parser.add_argument('--prefetch', type=int, help="Suggestions prepared ahead of the renamer")
+    parser.add_argument('--output', help="Write the results as JSON to this file")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="Baseline results file")
+    parser.add_argument('--save-baseline', action='store_true', help="Store these results as the new baseline")
+    parser.add_argument('--compare', action='store_true', help="Fail if a metric regressed beyond --tolerance")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help="Allowed relative regression")
+    parser.add_argument('--keep', action='store_true', help="Keep the generated corpus and databases")
+    args = parser.parse_args(argv)
+    args.types = [t.strip() for t in args.types.split(',') if t.strip()]
+
+    results = run_benchmark(args)
+    print_report(results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    status = 0
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        if baseline.get("config") != results["config"]:
+            print("Warning: the baseline was recorded with different settings:", baseline.get("config"))
+        print(f"Compared with '{args.baseline}' (tolerance {args.tolerance:.0%}):")
+        for name, before, current, change, regressed in compare(results, baseline, args.tolerance):
+            print(f"  {name:<18} {before:>10} -> {current:<10} {change:+.1%}{'  REGRESSION' if regressed else ''}")
+            if regressed and args.compare:
+                status = 1
+    elif args.compare:
+        print(f"No baseline at '{args.baseline}'; run with --save-baseline first.")
+        status = 1
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved baseline to '{args.baseline}'")
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,337 @@
+import os
+import sys
+import json
+import time
+import argparse
+import telemetry
+from dotenv import load_dotenv
+from file_operations import FileOperations
+from openai_integration import OpenAIIntegration
+from suggestion_pipeline import SuggestionPipeline
+from request_scheduler import PRIORITY_BULK
+from directory_scanner import scan_directory, scan_options_from_env
+from folder_watcher import FolderWatcher, CURSOR_FILE
+from rename_journal import DONE, DEFERRED as JOURNAL_DEFERRED
+
+POLICIES = ('dry-run', 'auto-approve', 'confidence')
+DEFAULT_MIN_CONFIDENCE = 0.8
+
+# Plan statuses. Reviewers change "pending" to "approved" (and may edit
+# new_name/tags) before running "apply".
+PENDING = 'pending'
+APPROVED = 'approved'
+APPLIED = 'applied'
+FAILED = 'failed'
+SKIPPED = 'skipped'
+ERROR = 'error'
+# The file was locked; the rename journal retries it (see "apply" and the end of "run").
+DEFERRED = 'deferred'
+
+
+def decide(suggestion, policy, min_confidence):
+    """
+    Decide whether a suggestion may be applied without review.
+
+    :return: APPROVED or PENDING
+    """
+    if policy == 'auto-approve':
+        return APPROVED
+    if policy == 'confidence' and suggestion.confidence is not None and suggestion.confidence >= min_confidence:
+        return APPROVED
+    return PENDING
+
+
+def plan_item(suggestion, status, final_path=None):
+    """:param final_path: Path of an applied or deferred rename, whose name may have a collision suffix"""
+    new_name = os.path.basename(final_path) if status in (APPLIED, DEFERRED) and final_path else suggestion.new_name
+    return {
+        "file_path": suggestion.file_path,
+        "original_name": os.path.basename(suggestion.file_path),
+        "new_name": new_name,
+        "tags": suggestion.tags,
+        "confidence": suggestion.confidence,
+        "status": status,
+        "error": suggestion.error,
+        "duplicate_of": suggestion.duplicate_of,
+        "duplicate_kind": suggestion.duplicate_kind,
+    }
+
+
+def start_pipeline(args, file_paths):
+    file_ops = FileOperations()
+    file_ops.recover_renames()
+    openai_integration = OpenAIIntegration()
+    client = openai_integration.create_client()
+    assistant = openai_integration.create_assistant(client)
+    pipeline = SuggestionPipeline(file_ops, openai_integration, client, assistant,
+                                  max_workers=args.workers, prefetch=args.prefetch,
+                                  priority=PRIORITY_BULK).start(file_paths)
+    return file_ops, openai_integration, pipeline
+
+
+def rename_status(op):
+    """:return: Plan status for the outcome of a journaled rename"""
+    if op.state == DONE:
+        return APPLIED
+    if op.state == JOURNAL_DEFERRED:
+        return DEFERRED
+    return FAILED
+
+
+def triage(suggestion, args):
+    """
+    :return: Plan status of a suggestion before anything is renamed; APPROVED
+             suggestions are to be applied unless the policy is dry-run
+    """
+    if suggestion.skipped:
+        return SKIPPED
+    if not suggestion.new_name:
+        return ERROR
+    return decide(suggestion, args.policy, args.min_confidence)
+
+
+def apply_suggestions(suggestions, file_ops, batch_id=None):
+    """
+    Rename approved suggestions through the rename journal in one call.
+
+    :param batch_id: Rename journal batch to add the renames to
+
+    :return: List of (status, path of the file afterwards), in input order
+    """
+    operations = file_ops.apply_renames([(suggestion.file_path, suggestion.new_name, suggestion.tags,
+                                          suggestion.content) for suggestion in suggestions], batch_id)
+    return [(rename_status(op), op.target if op.state in (DONE, JOURNAL_DEFERRED) else suggestion.file_path)
+            for suggestion, op in zip(suggestions, operations)]
+
+
+def handle_suggestion(suggestion, file_ops, args, batch_id=None):
+    """
+    Apply a suggestion according to the policy.
+
+    :param batch_id: Rename journal batch to add the rename to
+
+    :return: (status, path of the file afterwards)
+    """
+    status = triage(suggestion, args)
+    if status == APPROVED and args.policy != 'dry-run':
+        return apply_suggestions([suggestion], file_ops, batch_id)[0]
+    return status, suggestion.file_path
+
+
+def run(args):
+    scan_options = scan_options_from_env()
+    if args.max_depth is not None:
+        scan_options["max_depth"] = args.max_depth
+    if args.exclude:
+        scan_options["exclude"] = tuple(args.exclude)
+    file_paths = scan_directory(args.directory, **scan_options)
+
+    file_ops, openai_integration, pipeline = start_pipeline(args, file_paths)
+    counts = {}
+    # Approved suggestions are renamed a journal chunk at a time, so each chunk
+    # costs one fsync pass and one commit instead of one per file.
+    approved = []
+    batch_id = None
+
+    def record(plan, suggestion, status, final_path=None):
+        counts[status] = counts.get(status, 0) + 1
+        plan.write(json.dumps(plan_item(suggestion, status, final_path)) + '\n')
+
+    def flush(plan):
+        nonlocal batch_id
+        chunk = approved[:]
+        approved.clear()
+        if chunk:
+            if batch_id is None:
+                # Renames of the whole run share one journal batch, so "undo" reverts the run.
+                batch_id = file_ops.journal.new_batch()
+            for suggestion, (status, final_path) in zip(chunk, apply_suggestions(chunk, file_ops, batch_id)):
+                record(plan, suggestion, status, final_path)
+            plan.flush()
+
+    try:
+        # Tags are written in bulk when the run ends instead of once per file.
+        with open(args.plan, 'w') as plan, file_ops.tag_batch():
+            try:
+                for suggestion in pipeline:
+                    status = triage(suggestion, args)
+                    if status == APPROVED and args.policy != 'dry-run':
+                        approved.append(suggestion)
+                        if len(approved) >= file_ops.rename_chunk_size:
+                            flush(plan)
+                        continue
+                    record(plan, suggestion, status)
+                    plan.flush()
+            finally:
+                # Suggestions approved before an interruption are still applied and recorded.
+                flush(plan)
+    except KeyboardInterrupt:
+        print("Interrupted; the plan file contains every file processed so far.")
+    finally:
+        pipeline.cancel()
+
+    if counts.get(DEFERRED):
+        print(f"Waiting for {counts[DEFERRED]} locked files...")
+        retried = file_ops.retry_deferred(wait=True)
+        print(f"{sum(1 for op in retried if op.state == DONE)} deferred renames applied later.")
+    print(f"Plan written to '{args.plan}': " + ', '.join(f"{n} {status}" for status, n in sorted(counts.items())))
+    print(f"OpenAI requests: {openai_integration.scheduler.metrics()}")
+    return 0
+
+
+def watch(args):
+    scan_options = scan_options_from_env()
+    watcher = FolderWatcher(
+        args.directories,
+        exclude=tuple(args.exclude) if args.exclude else scan_options["exclude"],
+        max_depth=args.max_depth if args.max_depth is not None else scan_options["max_depth"],
+        min_size=scan_options["min_size"], max_size=scan_options["max_size"],
+        debounce_seconds=args.debounce, poll_interval=args.poll_interval, cursor_path=args.cursor,
+        use_inotify=False if args.poll else None
+    )
+    file_ops, openai_integration, pipeline = start_pipeline(args, watcher)
+    print(f"Watching {', '.join(watcher.roots)} ({watcher.mode}); press Ctrl+C to stop.")
+    counts = {}
+    try:
+        # Appended, so the plan accumulates across restarts like the cursor.
+        with open(args.plan, 'a') as plan:
+            for suggestion in pipeline:
+                file_ops.retry_deferred()
+                status, final_path = handle_suggestion(suggestion, file_ops, args)
+                if status != ERROR:
+                    # Errors stay queued in the cursor and are retried after a restart.
+                    watcher.mark_processed(final_path)
+                counts[status] = counts.get(status, 0) + 1
+                plan.write(json.dumps(plan_item(suggestion, status, final_path)) + '\n')
+                plan.flush()
+    except KeyboardInterrupt:
+        print("Stopped.")
+    finally:
+        watcher.stop()
+        pipeline.cancel()
+        watcher.close()
+
+    print(f"Plan appended to '{args.plan}': " + ', '.join(f"{n} {status}" for status, n in sorted(counts.items())))
+    return 0
+
+
+def apply(args):
+    file_ops = FileOperations()
+    file_ops.recover_renames()
+    with open(args.plan, 'r') as f:
+        items = [json.loads(line) for line in f if line.strip()]
+
+    selected = []
+    failed = 0
+    for item in items:
+        if item["status"] != APPROVED and not (args.all_pending and item["status"] == PENDING):
+            continue
+        if not os.path.exists(item["file_path"]):
+            item["status"], item["error"] = FAILED, "file not found"
+            failed += 1
+            continue
+        selected.append(item)
+
+    # One journaled batch; locked files are retried at the end instead of blocking the rest.
+    renames = [(item["file_path"], file_ops.prepare_new_filename(item["new_name"], item["file_path"]),
+                item.get("tags") or []) for item in selected]
+    operations = file_ops.apply_renames(renames)
+    if any(op.state == JOURNAL_DEFERRED for op in operations):
+        print(f"Waiting for {sum(1 for op in operations if op.state == JOURNAL_DEFERRED)} locked files...")
+        retried = {op.id: op for op in file_ops.retry_deferred(wait=True)}
+        operations = [retried.get(op.id, op) for op in operations]
+
+    applied = 0
+    batch_id = None
+    for item, op in zip(selected, operations):
+        if op.state == DONE:
+            item["status"], item["new_name"] = APPLIED, os.path.basename(op.target)
+            batch_id = op.batch_id
+            applied += 1
+        else:
+            item["status"], item["error"] = FAILED, op.error or op.state
+            failed += 1
+
+    # Record the outcome so applying the same plan again is a no-op.
+    tmp_path = args.plan + '.tmp'
+    with open(tmp_path, 'w') as f:
+        for item in items:
+            f.write(json.dumps(item) + '\n')
+    os.replace(tmp_path, args.plan)
+
+    print(f"Applied {applied} renames, {failed} failed.")
+    if batch_id is not None:
+        print(f"Undo with: python cli.py undo {batch_id}")
+    return 1 if failed else 0
+
+
+def undo(args):
+    file_ops = FileOperations()
+    if args.list:
+        for batch in file_ops.journal.batches():
+            created = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(batch["created_at"]))
+            counts = ', '.join(f"{n} {state}" for state, n in sorted(batch["counts"].items()))
+            print(f"{batch['id']:6d}  {created}  {counts}{'  (undone)' if batch['undone_at'] else ''}")
+        return 0
+    file_ops.recover_renames()
+    undone = file_ops.undo_batch(args.batch)
+    print(f"Restored {len(undone)} original names.")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Rename and tag files without the GUI.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help="Generate suggestions for a directory and write a plan file")
+    run_parser.add_argument('directory', help="Directory to process")
+    run_parser.add_argument('--plan', default='rename_plan.jsonl', help="Plan file to write (JSON lines)")
+    run_parser.add_argument('--policy', choices=POLICIES, default='dry-run',
+                            help="dry-run: only write the plan; auto-approve: apply every suggestion; "
+                                 "confidence: apply suggestions at or above --min-confidence")
+    run_parser.add_argument('--min-confidence', type=float, default=DEFAULT_MIN_CONFIDENCE,
+                            help="Threshold for the confidence policy (0-1)")
+    run_parser.add_argument('--workers', type=int, help="Concurrent suggestion workers")
+    run_parser.add_argument('--prefetch', type=int, help="Suggestions prepared ahead of the renamer")
+    run_parser.add_argument('--max-depth', type=int, help="Subdirectory levels to scan")
+    run_parser.add_argument('--exclude', action='append', help="Glob pattern to skip (repeatable)")
+    run_parser.set_defaults(func=run)
+
+    watch_parser = subparsers.add_parser('watch', help="Process new and changed files in directories as they arrive")
+    watch_parser.add_argument('directories', nargs='+', help="Directories to watch")
+    watch_parser.add_argument('--plan', default='rename_plan.jsonl', help="Plan file to append to (JSON lines)")
+    watch_parser.add_argument('--policy', choices=POLICIES, default='dry-run', help="Same as for 'run'")
+    watch_parser.add_argument('--min-confidence', type=float, default=DEFAULT_MIN_CONFIDENCE,
+                              help="Threshold for the confidence policy (0-1)")
+    watch_parser.add_argument('--workers', type=int, help="Concurrent suggestion workers")
+    watch_parser.add_argument('--prefetch', type=int, help="Suggestions prepared ahead of the renamer")
+    watch_parser.add_argument('--max-depth', type=int, help="Subdirectory levels to watch")
+    watch_parser.add_argument('--exclude', action='append', help="Glob pattern to skip (repeatable)")
+    watch_parser.add_argument('--debounce', type=float,
+                              help="Seconds a file must stay unchanged before it is processed")
+    watch_parser.add_argument('--poll-interval', type=float, help="Seconds between directory checks when polling")
+    watch_parser.add_argument('--poll', action='store_true', help="Poll directory mtimes instead of using inotify")
+    watch_parser.add_argument('--cursor', default=CURSOR_FILE, help="Cursor database that survives restarts")
+    watch_parser.set_defaults(func=watch)
+
+    apply_parser = subparsers.add_parser('apply', help="Apply the approved entries of a plan file")
+    apply_parser.add_argument('plan', help="Plan file written by 'run'")
+    apply_parser.add_argument('--all-pending', action='store_true', help="Also apply entries still marked pending")
+    apply_parser.set_defaults(func=apply)
+
+    undo_parser = subparsers.add_parser('undo', help="Restore the original names of a batch of renames")
+    undo_parser.add_argument('batch', type=int, nargs='?', help="Batch id (default: the latest batch)")
+    undo_parser.add_argument('--list', action='store_true', help="List recent batches instead")
+    undo_parser.set_defaults(func=undo)
+    return parser
+
+
+def main(argv=None):
+    load_dotenv()
+    telemetry.configure_from_env()
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,93 +1,198 @@
-from PyPDF2 import PdfReader
-import docx
-import pandas as pd
-import csv
 import os
-from openai import OpenAI
+import codecs
+# PDF, Word, Excel and audio libraries are imported inside their extractors, so importing
+# this module (and starting the GUI) does not load them; see extractor_registry.py.
+from extractor_registry import SUPPORTED_EXTENSIONS, get_registry
 
-def extract_pdf_content(file_path):
+# Longest UTF-8 encoding of a single character, used to turn a character budget into a byte budget.
+MAX_BYTES_PER_CHAR = 4
+
+def _truncate(content, max_chars):
+    if max_chars is not None and len(content) > max_chars:
+        return content[:max_chars]
+    return content
+
+def detect_encoding(raw):
+    """
+    Guess the text encoding of a byte prefix.
+    
+    :param raw: Leading bytes of a file
+    :return: Codec name
+    """
+    for bom, encoding in ((codecs.BOM_UTF8, 'utf-8-sig'), (codecs.BOM_UTF32_LE, 'utf-32'),
+                          (codecs.BOM_UTF32_BE, 'utf-32'), (codecs.BOM_UTF16_LE, 'utf-16'),
+                          (codecs.BOM_UTF16_BE, 'utf-16')):
+        if raw.startswith(bom):
+            return encoding
+    try:
+        # The prefix may end in the middle of a multi-byte character, so decode incrementally.
+        codecs.getincrementaldecoder('utf-8')().decode(raw, final=False)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        pass
+    try:
+        from charset_normalizer import from_bytes
+        match = from_bytes(raw).best()
+        if match is not None:
+            return match.encoding
+    except ImportError:
+        pass
+    try:
+        raw.decode('cp1252')
+        return 'cp1252'
+    except UnicodeDecodeError:
+        return 'latin-1'
+
+def read_text_prefix(file_path, max_chars=None):
+    """
+    Read at most ``max_chars`` characters from a text file, detecting its encoding.
+    
+    :param file_path: Path to the text file
+    :param max_chars: Character budget, or None to read the whole file
+    :return: (text, encoding)
+    """
+    with open(file_path, 'rb') as file:
+        raw = file.read() if max_chars is None else file.read(max_chars * MAX_BYTES_PER_CHAR)
+    encoding = detect_encoding(raw[:64 * 1024])
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    return _truncate(decoder.decode(raw, final=max_chars is None), max_chars), encoding
+
+def extract_pdf_content(file_path, max_chars=None):
     """
     Extract the text content from a PDF file.
     
     :param file_path: Path to the PDF file
+    :param max_chars: Stop extracting pages once this many characters are collected
     :return: Extracted text content as a string
     """
-    content = ""
+    from PyPDF2 import PdfReader
+    parts = []
+    length = 0
     with open(file_path, 'rb') as file:
         reader = PdfReader(file)
         for page in reader.pages:
-            content += page.extract_text()
-    return content
+            text = page.extract_text() or ""
+            parts.append(text)
+            length += len(text)
+            if max_chars is not None and length >= max_chars:
+                break
+    return _truncate(''.join(parts), max_chars)
 
-def extract_word_content(file_path):
+def extract_word_content(file_path, max_chars=None):
     """
     Extract the text content from a Word document.
     
     :param file_path: Path to the Word file
+    :param max_chars: Stop collecting paragraphs once this many characters are collected
     :return: Extracted text content as a string
     """
+    import docx
     doc = docx.Document(file_path)
-    return ' '.join([paragraph.text for paragraph in doc.paragraphs])
+    parts = []
+    length = 0
+    for paragraph in doc.paragraphs:
+        text = paragraph.text
+        parts.append(text)
+        length += len(text) + 1
+        if max_chars is not None and length >= max_chars:
+            break
+    return _truncate(' '.join(parts), max_chars)
 
-def extract_text_content(file_path):
+def extract_text_content(file_path, max_chars=None):
     """
     Extract the content from a text file.
     
+    Only the bytes needed for ``max_chars`` characters are read, so very
+    large files cost the same as small ones.
+    
     :param file_path: Path to the text file
+    :param max_chars: Character budget, or None to read the whole file
     :return: Extracted text content as a string
     """
-    with open(file_path, 'r', encoding='utf-8') as file:
-        return file.read()
+    content, _ = read_text_prefix(file_path, max_chars)
+    return content
 
-def extract_excel_content(file_path):
+def extract_excel_content(file_path, max_chars=None):
     """
-    Extract sheet names and column headers from all sheets in an Excel file.
+    Extract column headers, inferred column types, row counts and sample
+    rows from all sheets in an Excel file.
+    
+    The workbook is opened once and only the first rows of each sheet are
+    read, so extraction time does not depend on sheet size; see
+    tabular_extractor.py.
     
     :param file_path: Path to the Excel file
-    :return: Summary of sheet names and their column headers as a string
+    :param max_chars: Stop after this many characters of summary
+    :return: Summary of each sheet as a string
     """
-    xl = pd.ExcelFile(file_path)
+    from tabular_extractor import read_xls_tables, read_xlsx_tables
+    if os.path.splitext(file_path)[1].lower() == '.xls':
+        tables = read_xls_tables(file_path)
+    else:
+        tables = read_xlsx_tables(file_path)
     sheets_summary = []
+    length = 0
     
-    for sheet_name in xl.sheet_names:
-        df = pd.read_excel(file_path, sheet_name=sheet_name, nrows=0)
-        columns = ', '.join(df.columns)
-        sheets_summary.append(f"Sheet '{sheet_name}': {columns}")
+    for table in tables:
+        if not table.headers:
+            continue
+        sheets_summary.append(f"Sheet '{table.name}':\n{table.describe()}")
+        length += len(sheets_summary[-1]) + 2
+        if max_chars is not None and length >= max_chars:
+            tables.close()
+            break
     
-    return ' | '.join(sheets_summary)
+    if not sheets_summary:
+        return "Empty Excel file"
+    return _truncate('\n\n'.join(sheets_summary), max_chars)
 
-def extract_csv_content(file_path):
+def extract_csv_content(file_path, max_chars=None):
     """
-    Extract column headers and a sample of data from a CSV file.
+    Extract column headers, inferred column types, a row count and a sample
+    of data from a CSV file.
+    
+    Encoding and dialect (delimiter, quoting) are detected on a bounded
+    prefix, and the row count of large files is estimated from it.
     
     :param file_path: Path to the CSV file
+    :param max_chars: Character budget for the summary
     :return: Summary of column headers and a sample of data as a string
     """
-    with open(file_path, 'r', newline='', encoding='utf-8') as csvfile:
-        csv_reader = csv.reader(csvfile)
-        headers = next(csv_reader, None)
-        if headers:
-            sample_data = [next(csv_reader, None) for _ in range(5)]  # Get up to 5 rows as a sample
-            headers_str = ', '.join(headers)
-            sample_str = ' | '.join([', '.join(row) if row else '' for row in sample_data])
-            return f"Headers: {headers_str}\nSample data: {sample_str}"
-        else:
-            return "Empty CSV file"
+    from tabular_extractor import read_csv_table
+    table = read_csv_table(file_path, detect_encoding)
+    if table is None:
+        return "Empty CSV file"
+    return _truncate(table.describe(sample_rows=5), max_chars)
 
-def extract_audio_content(file_path, api_key):
+def extract_audio_content(file_path, api_key, max_chars=None):
     """
     Extract the text content from an audio file using OpenAI's Whisper model.
     
+    Only the leading window of long recordings is transcribed, in concurrent
+    chunks over a shared client; see audio_transcription.py.
+    
     :param file_path: Path to the audio file
     :param api_key: OpenAI API key
+    :param max_chars: Character budget for the transcript
     :return: Transcribed text content as a string
     """
-    client = OpenAI(api_key=api_key)
+    from audio_transcription import get_transcriber
+    return _truncate(get_transcriber(api_key).transcribe(file_path), max_chars)
+
+def extract_audio_file(file_path, max_chars=None):
+    """Transcribe an audio file with the API key from the environment."""
+    return extract_audio_content(file_path, os.getenv("openai_api_key"), max_chars)
+
+def extract_content(file_path, max_chars=None):
+    """
+    Extract content from a file, choosing the extractor by file extension.
     
-    with open(file_path, "rb") as audio_file:
-        transcription = client.audio.transcriptions.create(
-            model="whisper-1", 
-            file=audio_file
-        )
+    This is a module-level function so it can run in worker processes.
     
-    return transcription.text
\ No newline at end of file
+    :param file_path: Path to the file
+    :param max_chars: Character budget passed to the extractor
+    :return: Extracted content as a string
+    :raises ValueError: If no extractor is registered for the extension
+    """
+    _, file_extension = os.path.splitext(file_path)
+    return get_registry().get(file_extension)(file_path, max_chars)
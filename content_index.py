@@ -0,0 +1,333 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+
+INDEX_FILE = 'content_index.db'
+# Characters of extracted text stored per document; keeps the index small on large shares.
+DEFAULT_MAX_CHARS = 20000
+# bm25 weights for the name, tags and content columns: matches in names and tags rank higher.
+COLUMN_WEIGHTS = (10.0, 5.0, 1.0)
+SNIPPET_TOKENS = 12
+
+_QUERY_TERM = re.compile(r'-?"[^"]*"|\S+')
+_WORD = re.compile(r'\w+\*?', re.UNICODE)
+
+logger = logging.getLogger(__name__)
+
+
+class ContentIndexError(ValueError):
+    pass
+
+
+def to_fts_query(text):
+    """
+    Translate a search box query into an FTS5 expression.
+
+    Words must all match, ``"quoted phrases"`` match as phrases, ``word*``
+    matches a prefix and ``-word`` or ``-"phrase"`` excludes documents.
+    Everything else is treated as plain text, so user input can never
+    produce an FTS5 syntax error.
+
+    :raises ContentIndexError: If the query has nothing to match
+    """
+    include, exclude = [], []
+    for term in _QUERY_TERM.findall(text):
+        target = include
+        if term.startswith('-') and len(term) > 1:
+            target, term = exclude, term[1:]
+        if term.startswith('"'):
+            words = _WORD.findall(term.strip('"'))
+            if words:
+                target.append('"' + ' '.join(word.rstrip('*') for word in words) + '"')
+        else:
+            for word in _WORD.findall(term):
+                target.append(f'"{word[:-1]}"*' if word.endswith('*') else f'"{word}"')
+    if not include:
+        raise ContentIndexError("Enter at least one word or phrase to search for")
+    expression = ' AND '.join(include)
+    for term in exclude:
+        expression += f' NOT {term}'
+    return expression
+
+
+class ContentIndex:
+    """
+    Full-text index of renamed files (SQLite FTS5).
+
+    Each document is stored under the id of its rename log entry, so tag
+    query results can filter keyword matches directly. Name, tags and the
+    first ``max_chars`` characters of extracted text are indexed; results
+    are ranked with bm25, weighting names and tags above body text.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS documents (
+            id INTEGER PRIMARY KEY,
+            path TEXT NOT NULL,
+            tags TEXT NOT NULL DEFAULT '[]',
+            file_type TEXT,
+            size INTEGER,
+            indexed_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_documents_path ON documents(path);
+        CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+            name, tags, content, tokenize = 'unicode61 remove_diacritics 2'
+        );
+    """
+
+    def __init__(self, path=INDEX_FILE, max_chars=None):
+        self.path = path
+        self.max_chars = max_chars or int(os.getenv("content_index_max_chars", DEFAULT_MAX_CHARS))
+        # _lock serializes statements; _write_lock is always taken first and held for whole batches.
+        self._lock = threading.RLock()
+        self._write_lock = threading.RLock()
+        self._batch_depth = 0
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+        # Per-term document counts of the index, for weighting keywords; kept out of the database file.
+        self.conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS temp.documents_vocab "
+                          "USING fts5vocab(main, documents_fts, 'row')")
+
+    @contextmanager
+    def batch(self):
+        """
+        Group several updates into one transaction. Other threads' updates wait
+        until it ends, so they are never committed or rolled back with it;
+        searches only wait for the statement in progress.
+        """
+        with self._write_lock:
+            with self._lock:
+                if self._batch_depth == 0:
+                    self.conn.execute("BEGIN")
+                self._batch_depth += 1
+            try:
+                yield self
+            except BaseException:
+                with self._lock:
+                    self._batch_depth -= 1
+                    if self._batch_depth == 0:
+                        self.conn.execute("ROLLBACK")
+                raise
+            else:
+                with self._lock:
+                    self._batch_depth -= 1
+                    if self._batch_depth == 0:
+                        self.conn.execute("COMMIT")
+
+    def add(self, doc_id, path, tags, content, previous_path=None):
+        """
+        Index (or re-index) a renamed file. Documents of the same file under
+        ``path`` or ``previous_path`` are replaced.
+        """
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            size = None
+        name = os.path.basename(path)
+        # Underscores and hyphens in names and tags separate words for searching.
+        searchable_name = re.sub(r'[_\-.]+', ' ', name)
+        with self.batch(), self._lock:
+            stale = [row[0] for row in self.conn.execute(
+                "SELECT id FROM documents WHERE path IN (?, ?)", (path, previous_path or path))]
+            for stale_id in stale + [doc_id]:
+                self._delete(stale_id)
+            self.conn.execute(
+                "INSERT INTO documents (id, path, tags, file_type, size, indexed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (doc_id, path, json.dumps(list(tags)), os.path.splitext(name)[1].lower().lstrip('.'), size,
+                 time.time())
+            )
+            self.conn.execute(
+                "INSERT INTO documents_fts (rowid, name, tags, content) VALUES (?, ?, ?, ?)",
+                (doc_id, searchable_name, ' '.join(tag.replace('_', ' ') for tag in tags),
+                 (content or '')[:self.max_chars])
+            )
+
+    def update_tags(self, doc_id, tags):
+        with self.batch(), self._lock:
+            self.conn.execute("UPDATE documents SET tags = ? WHERE id = ?", (json.dumps(list(tags)), doc_id))
+            self.conn.execute("UPDATE documents_fts SET tags = ? WHERE rowid = ?",
+                              (' '.join(tag.replace('_', ' ') for tag in tags), doc_id))
+
+    def _delete(self, doc_id):
+        self.conn.execute("DELETE FROM documents WHERE id = ?", (doc_id,))
+        self.conn.execute("DELETE FROM documents_fts WHERE rowid = ?", (doc_id,))
+
+    def remove(self, path):
+        with self.batch(), self._lock:
+            for row in self.conn.execute("SELECT id FROM documents WHERE path = ?", (path,)).fetchall():
+                self._delete(row[0])
+
+    def clear(self):
+        with self.batch(), self._lock:
+            self.conn.execute("DELETE FROM documents")
+            self.conn.execute("DELETE FROM documents_fts")
+
+    def retain(self, doc_ids):
+        """Remove every document whose id is not in ``doc_ids``."""
+        doc_ids = set(doc_ids)
+        with self.batch(), self._lock:
+            for row in self.conn.execute("SELECT id FROM documents").fetchall():
+                if row[0] not in doc_ids:
+                    self._delete(row[0])
+
+    def count(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def document_frequencies(self, terms):
+        """
+        :param terms: Lowercase words as tokenized by the index (diacritics removed)
+        :return: Dict of term to the number of indexed documents containing it; absent terms are left out
+        """
+        terms = list(set(terms))
+        frequencies = {}
+        with self._lock:
+            # Chunked to stay below SQLite's limit on bound variables.
+            for start in range(0, len(terms), 500):
+                chunk = terms[start:start + 500]
+                placeholders = ','.join('?' * len(chunk))
+                rows = self.conn.execute(
+                    f"SELECT term, doc FROM documents_vocab WHERE term IN ({placeholders})", chunk
+                ).fetchall()
+                frequencies.update((row[0], row[1]) for row in rows)
+        return frequencies
+
+    def search(self, query, allowed_ids=None, limit=50):
+        """
+        Ranked keyword and phrase search.
+
+        :param query: Search text, see ``to_fts_query``
+        :param allowed_ids: Optional set of document ids (e.g. from a tag query) to restrict results to
+        :param limit: Maximum number of results
+        :return: List of dicts with id, path, name, tags, snippet and score (lower is better), best first
+        """
+        expression = to_fts_query(query)
+        if allowed_ids is not None and not allowed_ids:
+            return []
+        ranked_sql = (
+            f"SELECT rowid, bm25(documents_fts, {', '.join(str(w) for w in COLUMN_WEIGHTS)}) AS score "
+            "FROM documents_fts WHERE documents_fts MATCH ? ORDER BY score"
+        )
+        ranked = []
+        with self._lock:
+            try:
+                if allowed_ids is None:
+                    ranked = self.conn.execute(ranked_sql + " LIMIT ?", (expression, limit)).fetchall()
+                else:
+                    # Ranked matches are streamed and filtered until enough pass the tag filter.
+                    for doc_id, score in self.conn.execute(ranked_sql, (expression,)):
+                        if doc_id in allowed_ids:
+                            ranked.append((doc_id, score))
+                            if len(ranked) >= limit:
+                                break
+                if not ranked:
+                    return []
+                # Snippets are only built for the results that are returned.
+                placeholders = ','.join('?' * len(ranked))
+                details = {row[0]: row[1:] for row in self.conn.execute(
+                    "SELECT documents_fts.rowid, documents.path, documents.tags, "
+                    f"snippet(documents_fts, 2, '[', ']', '...', {SNIPPET_TOKENS}) "
+                    "FROM documents_fts JOIN documents ON documents.id = documents_fts.rowid "
+                    f"WHERE documents_fts MATCH ? AND documents_fts.rowid IN ({placeholders})",
+                    [expression] + [doc_id for doc_id, _ in ranked]
+                )}
+            except sqlite3.OperationalError as e:
+                raise ContentIndexError(f"Invalid search: {e}") from e
+
+        results = []
+        for doc_id, score in ranked:
+            path, tags, snippet = details[doc_id]
+            results.append({
+                "id": doc_id,
+                "full_path": path,
+                "new_name": os.path.basename(path),
+                "tags": json.loads(tags),
+                "snippet": snippet,
+                "score": score,
+            })
+        return results
+
+    def optimize(self):
+        with self._write_lock, self._lock:
+            self.conn.execute("INSERT INTO documents_fts (documents_fts) VALUES ('optimize')")
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+def rebuild_index(file_ops, index, batch_size=500):
+    """
+    Re-index every file in the rename log from scratch.
+
+    Only the latest entry of each path that still exists is indexed. Each
+    chunk is extracted before its transaction opens, and documents are
+    replaced in place; those of files no longer in the log are removed at
+    the end, so an interrupted rebuild never leaves the index partly empty.
+
+    :return: Number of indexed documents
+    """
+    rename_log = file_ops.rename_log
+    ids = rename_log.all_ids()
+    latest = {}
+    for start in range(0, len(ids), batch_size):
+        chunk = ids[start:start + batch_size]
+        for doc_id, entry in zip(chunk, rename_log.entries_by_ids(chunk)):
+            latest[entry["full_path"]] = (doc_id, entry)
+
+    indexed = []
+    paths = [path for path in latest if os.path.exists(path)]
+    for start in range(0, len(paths), batch_size):
+        extracted = []
+        for path, content, error in file_ops.extract_many(paths[start:start + batch_size]):
+            if error is not None:
+                logger.warning("Cannot extract '%s': %s", path, error)
+                content = ''
+            extracted.append((path, content))
+        with index.batch():
+            for path, content in extracted:
+                doc_id, entry = latest[path]
+                index.add(doc_id, path, entry["tags"], content)
+                indexed.append(doc_id)
+        logger.info("Indexed %d of %d files", len(indexed), len(paths))
+    index.retain(indexed)
+    index.optimize()
+    return len(indexed)
+
+
+if __name__ == '__main__':
+    import argparse
+    from dotenv import load_dotenv
+    import telemetry
+
+    load_dotenv()
+    telemetry.configure_from_env()
+    parser = argparse.ArgumentParser(description="Manage the full-text content index.")
+    parser.add_argument('--index', default=INDEX_FILE, help="Index database")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('rebuild', help="Re-extract and re-index every renamed file")
+    search_parser = subparsers.add_parser('search', help="Search the index")
+    search_parser.add_argument('query')
+    search_parser.add_argument('--tags', help="Tag query that results must match, e.g. 'invoice, 2023'")
+    search_parser.add_argument('--limit', type=int, default=20)
+    subparsers.add_parser('stats', help="Show the number of indexed documents")
+    args = parser.parse_args()
+
+    from file_operations import FileOperations
+    file_ops = FileOperations(content_index_path=args.index)
+    if file_ops.content_index is None:
+        parser.exit(1, "The content index is disabled; set content_index_enabled=true in .env to use it.\n")
+    if args.command == 'rebuild':
+        print(f"Indexed {rebuild_index(file_ops, file_ops.content_index)} files")
+    elif args.command == 'search':
+        for result in file_ops.search_content(args.query, args.tags, limit=args.limit):
+            print(f"{result['score']:8.2f}  {result['full_path']}\n          {result['snippet']}")
+    else:
+        print(f"{file_ops.content_index.count()} documents in '{args.index}'")
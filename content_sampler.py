@@ -0,0 +1,208 @@
+import os
+import re
+import threading
+from collections import Counter
+
+# Tokens of document content sent per naming request. A title page, the
+# headings and a few windows of body text are enough to name a file.
+DEFAULT_TOKEN_BUDGET = 800
+MODEL_TOKEN_BUDGETS = {
+    "gpt-3.5-turbo": 800,
+    "gpt-3.5-turbo-16k": 800,
+    "gpt-4": 1000,
+    "gpt-4o": 1000,
+    "gpt-4o-mini": 1000,
+}
+
+# Share of the budget for each sampled section.
+SECTION_SHARES = (('title', 0.3), ('headings', 0.2), ('start', 0.2), ('middle', 0.15), ('end', 0.15))
+TITLE_LINES = 8
+# Longer lines (e.g. PDF pages extracted without line breaks) are split into pieces of this many words.
+MAX_LINE_WORDS = 60
+SEPARATOR = '[...]'
+
+_BOILERPLATE_PATTERNS = [re.compile(p, re.IGNORECASE) for p in (
+    r'^\s*(page\s*)?\d+\s*((of|/)\s*\d+)?\s*$',            # Page numbers
+    r'^\s*(©|\(c\)|copyright\b).*$',                         # Copyright notices
+    r'^.*\ball rights reserved\b.*$',
+    r'^\s*(confidential|internal use only|draft)\s*$',
+    r'^\s*https?://\S+\s*$',                                 # Bare URLs
+    r'^[\s\W_]*$',                                           # Rules and punctuation-only lines
+)]
+_LEADER_PATTERN = re.compile(r'([.\-_=·•*])\1{3,}')          # Table-of-contents leaders, rules
+_SPACE_PATTERN = re.compile(r'[ \t\f\v\u00a0]+')
+_HEADING_PATTERN = re.compile(r'^(#{1,6}\s+\S.*|(\d+(\.\d+)*\.?|[IVX]+\.|[A-Z]\.)\s+[A-Z].{0,80}|[A-Z][A-Z0-9 ,&:/-]{3,80})$')
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+_encodings = {}
+_encodings_lock = threading.Lock()
+
+
+def _encoding(model):
+    """Return a tiktoken encoding for ``model``, or None when tiktoken is not installed."""
+    with _encodings_lock:
+        if model not in _encodings:
+            try:
+                import tiktoken
+                try:
+                    _encodings[model] = tiktoken.encoding_for_model(model)
+                except KeyError:
+                    _encodings[model] = tiktoken.get_encoding("cl100k_base")
+            except ImportError:
+                _encodings[model] = None
+        return _encodings[model]
+
+
+def count_tokens(text, model=None):
+    """
+    Count the tokens ``text`` uses for ``model``.
+
+    Uses tiktoken when it is installed; otherwise estimates from words and
+    punctuation, which is within about 15% for English prose.
+    """
+    encoding = _encoding(model)
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return int(len(_TOKEN_PATTERN.findall(text)) * 1.3) + 1
+
+
+def token_budget(model=None):
+    budget = os.getenv("content_token_budget")
+    if budget:
+        return int(budget)
+    return MODEL_TOKEN_BUDGETS.get(model, DEFAULT_TOKEN_BUDGET)
+
+
+def strip_boilerplate(text):
+    """
+    Remove page numbers, copyright and confidentiality lines, rules, lines
+    repeated on every page (running headers and footers) and whitespace runs.
+
+    :return: List of the remaining lines
+    """
+    lines = [_SPACE_PATTERN.sub(' ', _LEADER_PATTERN.sub(' ', line)).strip() for line in text.splitlines()]
+    counts = Counter(line.lower() for line in lines if line)
+    page_count = max(2, sum(1 for line in lines if _BOILERPLATE_PATTERNS[0].match(line)))
+    cleaned = []
+    for line in lines:
+        if not line:
+            continue
+        if any(pattern.match(line) for pattern in _BOILERPLATE_PATTERNS):
+            continue
+        # Short lines repeated on many pages are headers or footers; table rows and prose rarely repeat exactly.
+        if len(line) < 80 and counts[line.lower()] >= 3 and counts[line.lower()] >= page_count // 2:
+            continue
+        cleaned.append(line)
+    return cleaned
+
+
+def _split_long_lines(lines):
+    split = []
+    for line in lines:
+        words = line.split(' ')
+        if len(words) <= MAX_LINE_WORDS:
+            split.append(line)
+        else:
+            split.extend(' '.join(words[i:i + MAX_LINE_WORDS]) for i in range(0, len(words), MAX_LINE_WORDS))
+    return split
+
+
+def _is_heading(line):
+    return len(line) <= 90 and not line.endswith(('.', ',', ';')) and bool(_HEADING_PATTERN.match(line))
+
+
+def _take(lines, token_limit, model, from_end=False):
+    """Take whole lines (from the start, or from the end) until ``token_limit`` tokens are used."""
+    taken = []
+    used = 0
+    for line in (reversed(lines) if from_end else lines):
+        cost = count_tokens(line, model) + 1
+        if used + cost > token_limit:
+            if not taken and token_limit > 8:
+                # A single long line (e.g. a PDF page without line breaks) is cut to fit.
+                taken.append(_truncate_tokens(line, token_limit, model, from_end))
+            break
+        taken.append(line)
+        used += cost
+    return list(reversed(taken)) if from_end else taken
+
+
+def _truncate_tokens(text, token_limit, model, from_end=False):
+    encoding = _encoding(model)
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        return encoding.decode(tokens[-token_limit:] if from_end else tokens[:token_limit])
+    words = text.split(' ')
+    keep = max(1, int(token_limit / 1.3))
+    return ' '.join(words[-keep:] if from_end else words[:keep])
+
+
+def sample_content(content, model=None, budget=None):
+    """
+    Reduce extracted content to at most ``budget`` tokens for a naming request.
+
+    Boilerplate is stripped first. Content that then fits is returned whole;
+    otherwise the title page, the headings and windows from the start,
+    middle and end of the document are kept, in document order, joined by
+    "[...]" markers.
+
+    :param content: Extracted text
+    :param model: Model name, for the tokenizer and the default budget
+    :param budget: Token budget; defaults to ``token_budget(model)``
+    :return: Sampled text
+    """
+    budget = budget or token_budget(model)
+    lines = strip_boilerplate(content or '')
+    text = '\n'.join(lines)
+    if count_tokens(text, model) <= budget:
+        return text
+
+    lines = _split_long_lines(lines)
+    shares = dict((name, int(budget * share)) for name, share in SECTION_SHARES)
+    title = _take(lines[:TITLE_LINES], shares['title'], model)
+    body_start = len(title)
+    headings = [(i, line) for i, line in enumerate(lines) if i >= body_start and _is_heading(line)]
+
+    # Spread the headings budget over the whole document instead of the first few.
+    heading_indexes = set()
+    if headings:
+        per_heading = max(count_tokens(line, model) + 1 for _, line in headings[:50])
+        limit = max(1, shares['headings'] // max(per_heading, 1))
+        step = max(1, len(headings) / limit)
+        picked = [headings[int(k * step)] for k in range(min(limit, len(headings)))]
+        used = 0
+        for index, line in picked:
+            cost = count_tokens(line, model) + 1
+            if used + cost > shares['headings']:
+                break
+            heading_indexes.add(index)
+            used += cost
+
+    body = lines[body_start:]
+    middle_at = len(body) // 2
+    windows = {
+        'start': (body_start, _take(body, shares['start'], model)),
+        'middle': (body_start + middle_at, _take(body[middle_at:], shares['middle'], model)),
+        'end': (None, _take(body, shares['end'], model, from_end=True)),
+    }
+    selected = {i: line for i, line in enumerate(title)}
+    for name, (start, window) in windows.items():
+        if name == 'end':
+            start = len(lines) - len(window)
+        for offset, line in enumerate(window):
+            selected.setdefault(start + offset, line)
+    for index in heading_indexes:
+        selected.setdefault(index, lines[index])
+
+    parts = []
+    previous = None
+    for index in sorted(selected):
+        if previous is not None and index != previous + 1:
+            parts.append(SEPARATOR)
+        parts.append(selected[index])
+        previous = index
+    sampled = '\n'.join(parts)
+    # Line costs are counted separately, so the joined text can be slightly over; trim if so.
+    if count_tokens(sampled, model) > budget:
+        sampled = _truncate_tokens(sampled, budget, model)
+    return sampled
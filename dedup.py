@@ -0,0 +1,269 @@
+import os
+import re
+import random
+import struct
+import hashlib
+import threading
+from collections import OrderedDict
+
+DEFAULT_THRESHOLD = 0.8
+DEFAULT_PERMUTATIONS = 64
+DEFAULT_BANDS = 16
+SHINGLE_WORDS = 5
+# Files remembered for duplicate checks; the oldest are forgotten so a long-running watch stays bounded.
+DEFAULT_MAX_FILES = 100000
+# Files are compared by this many leading bytes before hashing them in full.
+PREFIX_BYTES = 64 * 1024
+
+EXACT = 'exact'
+NEAR = 'near'
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_WORD_PATTERN = re.compile(r'\w+')
+
+
+def hash_file(file_path, limit=None, block_size=1024 * 1024):
+    """
+    Stream a SHA-256 over the file, or over its first ``limit`` bytes.
+    """
+    digest = hashlib.sha256()
+    remaining = limit
+    with open(file_path, 'rb') as f:
+        while remaining is None or remaining > 0:
+            block = f.read(block_size if remaining is None else min(block_size, remaining))
+            if not block:
+                break
+            digest.update(block)
+            if remaining is not None:
+                remaining -= len(block)
+    return digest.hexdigest()
+
+
+def shingles(text, size=SHINGLE_WORDS):
+    """
+    :return: Set of 32-bit hashes of overlapping ``size``-word shingles of the lowercased text
+    """
+    words = _WORD_PATTERN.findall(text.lower())
+    if len(words) < size:
+        words = words + [''] * (size - len(words)) if words else []
+    return {
+        struct.unpack('<I', hashlib.blake2b(' '.join(words[i:i + size]).encode('utf-8'), digest_size=4).digest())[0]
+        for i in range(max(len(words) - size + 1, 0))
+    }
+
+
+class MinHasher:
+    """
+    MinHash signatures over shingle sets; the fraction of equal positions in
+    two signatures estimates the Jaccard similarity of the sets.
+    """
+
+    def __init__(self, permutations=DEFAULT_PERMUTATIONS, seed=1):
+        rng = random.Random(seed)
+        self.permutations = [(rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME))
+                             for _ in range(permutations)]
+
+    def signature(self, shingle_set):
+        if not shingle_set:
+            return None
+        return tuple(
+            min((a * value + b) % _MERSENNE_PRIME for value in shingle_set) & _MAX_HASH
+            for a, b in self.permutations
+        )
+
+    @staticmethod
+    def similarity(first, second):
+        return sum(1 for x, y in zip(first, second) if x == y) / len(first)
+
+
+class LSHIndex:
+    """
+    Locality-sensitive hashing over MinHash signatures: signatures are cut
+    into ``bands`` bands, and two documents become candidates when any band
+    matches exactly.
+    """
+
+    def __init__(self, bands=DEFAULT_BANDS):
+        self.bands = bands
+        self._buckets = [{} for _ in range(bands)]
+
+    def _band_keys(self, signature):
+        rows = len(signature) // self.bands
+        return [signature[band * rows:(band + 1) * rows] for band in range(self.bands)]
+
+    def add(self, key, signature):
+        for buckets, band in zip(self._buckets, self._band_keys(signature)):
+            buckets.setdefault(band, []).append(key)
+
+    def remove(self, key, signature):
+        for buckets, band in zip(self._buckets, self._band_keys(signature)):
+            keys = buckets.get(band)
+            if keys and key in keys:
+                keys.remove(key)
+                if not keys:
+                    del buckets[band]
+
+    def candidates(self, signature):
+        found = []
+        seen = set()
+        for buckets, band in zip(self._buckets, self._band_keys(signature)):
+            for key in buckets.get(band, ()):
+                if key not in seen:
+                    seen.add(key)
+                    found.append(key)
+        return found
+
+
+class DuplicateMatch:
+    def __init__(self, original, kind, similarity=1.0):
+        self.original = original
+        self.kind = kind
+        self.similarity = similarity
+
+
+class DuplicateDetector:
+    """
+    Finds files that duplicate a file seen earlier in the same run.
+
+    Exact duplicates are found without reading most files: every file's
+    leading ``PREFIX_BYTES`` are hashed when it is registered, and a full
+    hash is computed only when another file has the same size and prefix.
+    Files renamed after registration are followed through ``moved``, so an
+    original can still be hashed after it got its new name. Near-duplicates (minor revisions,
+    re-exports) are found from the extracted text with MinHash and LSH and
+    must reach an estimated Jaccard similarity of ``threshold``.
+
+    The first file of each group is its original; ``check_exact`` and
+    ``check_near`` return a DuplicateMatch pointing at it. Only the last
+    ``max_files`` files (``dedup_max_files``) are remembered.
+    """
+
+    def __init__(self, threshold=None, permutations=DEFAULT_PERMUTATIONS, bands=DEFAULT_BANDS, max_files=None):
+        self.threshold = threshold if threshold is not None else \
+            float(os.getenv("dedup_threshold", DEFAULT_THRESHOLD))
+        self.minhasher = MinHasher(permutations)
+        self.lsh = LSHIndex(bands)
+        self._lock = threading.Lock()
+        self._by_size = {}
+        self._hashes = {}
+        self._signatures = {}
+        self._originals = {}
+        self.max_files = max_files or int(os.getenv("dedup_max_files", DEFAULT_MAX_FILES))
+        # Registered files, oldest first, with their size
+        self._files = OrderedDict()
+        # Current path of registered files that were renamed since, and the reverse
+        self._locations = {}
+        self._registered = {}
+
+    def _remember(self, file_path, size=None):
+        # Called with the lock held
+        if file_path in self._files:
+            return
+        self._files[file_path] = size
+        while len(self._files) > self.max_files:
+            self._forget(*self._files.popitem(last=False))
+
+    def _forget(self, file_path, size):
+        same_size = self._by_size.get(size)
+        if same_size and file_path in same_size:
+            same_size.remove(file_path)
+            if not same_size:
+                del self._by_size[size]
+        self._hashes.pop(file_path, None)
+        self._originals.pop(file_path, None)
+        location = self._locations.pop(file_path, None)
+        if location is not None:
+            self._registered.pop(location, None)
+        signature = self._signatures.pop(file_path, None)
+        if signature is not None:
+            self.lsh.remove(file_path, signature)
+
+    def _digest(self, file_path, full):
+        # A prefix mismatch is enough to tell most same-size files apart; full hashes are computed on demand.
+        # Files are hashed without the lock, so workers never queue behind a large file.
+        with self._lock:
+            prefix, whole = self._hashes.get(file_path, (None, None))
+            location = self._locations.get(file_path, file_path)
+        if prefix is None:
+            prefix = hash_file(location, PREFIX_BYTES)
+        if full and whole is None:
+            whole = hash_file(location)
+        with self._lock:
+            cached_prefix, cached_whole = self._hashes.get(file_path, (None, None))
+            self._hashes[file_path] = (prefix, whole or cached_whole)
+        return whole if full else prefix
+
+    def check_exact(self, file_path):
+        """
+        Register ``file_path`` and return a match if it is byte-identical to an earlier file.
+
+        :return: DuplicateMatch or None
+        """
+        size = os.path.getsize(file_path)
+        # Hashed now, while the file still has the name it was registered under.
+        prefix = hash_file(file_path, PREFIX_BYTES)
+        with self._lock:
+            self._hashes[file_path] = (prefix, None)
+            same_size = self._by_size.setdefault(size, [])
+            # Earlier files of this size; registering now keeps the first file of a group its original.
+            candidates = list(same_size)
+            same_size.append(file_path)
+            self._remember(file_path, size)
+        if not candidates:
+            return None
+        match = None
+        for other in candidates:
+            try:
+                if self._digest(other, full=False) != prefix:
+                    continue
+                if size <= PREFIX_BYTES or self._digest(other, full=True) == self._digest(file_path, full=True):
+                    with self._lock:
+                        match = DuplicateMatch(self._originals.get(other, other), EXACT)
+                    break
+            except OSError:
+                # The earlier file was renamed or removed meanwhile.
+                continue
+        if match:
+            with self._lock:
+                self._originals[file_path] = match.original
+        return match
+
+    def moved(self, old_path, new_path):
+        """Follow a registered file that was renamed; it keeps the path it was registered under."""
+        with self._lock:
+            key = self._registered.pop(old_path, old_path)
+            if key not in self._files:
+                return
+            if new_path == key:
+                self._locations.pop(key, None)
+            else:
+                self._locations[key] = new_path
+                self._registered[new_path] = key
+
+    def check_near(self, file_path, content):
+        """
+        Register the extracted text of ``file_path`` and return a match if it
+        is nearly identical to the text of an earlier file.
+
+        :return: DuplicateMatch or None
+        """
+        signature = self.minhasher.signature(shingles(content or ''))
+        if signature is None:
+            return None
+        with self._lock:
+            best = None
+            for other in self.lsh.candidates(signature):
+                similarity = MinHasher.similarity(signature, self._signatures[other])
+                if similarity >= self.threshold and (best is None or similarity > best[1]):
+                    best = (other, similarity)
+            self._signatures[file_path] = signature
+            self._remember(file_path)
+            if best:
+                original = self._originals.get(best[0], best[0])
+                self._originals[file_path] = original
+                return DuplicateMatch(original, NEAR, best[1])
+            # Only originals are indexed, so every group has a single representative.
+            if file_path not in self._originals:
+                self.lsh.add(file_path, signature)
+            return None
@@ -0,0 +1,120 @@
+import os
+import time
+import fnmatch
+import logging
+import telemetry
+from content_extractors import SUPPORTED_EXTENSIONS
+
+DEFAULT_MAX_DEPTH = 5
+# Hidden files and folders such as .git or .DS_Store are skipped unless overridden.
+DEFAULT_EXCLUDE = ('.*',)
+
+logger = logging.getLogger(__name__)
+
+
+def scan_directory(root, extensions=SUPPORTED_EXTENSIONS, max_depth=DEFAULT_MAX_DEPTH,
+                   exclude=DEFAULT_EXCLUDE, min_size=None, max_size=None, follow_symlinks=False):
+    """
+    Lazily yield the paths of files under ``root`` that can be processed.
+
+    Entries are filtered by extension and exclude rules before anything is
+    stat'ed; file sizes are only read when a size limit is set. Paths are
+    yielded as soon as they are found, so callers can start working before
+    the whole tree has been listed.
+
+    :param root: Directory to scan
+    :param extensions: Lowercase extensions (with dot) to include, or None for all
+    :param max_depth: How many levels of subdirectories to enter (0 = only ``root``)
+    :param exclude: Glob patterns matched against names and paths relative to ``root``
+    :param min_size: Skip files smaller than this many bytes
+    :param max_size: Skip files larger than this many bytes
+    :param follow_symlinks: Follow symlinked files and directories instead of skipping them
+    :return: Generator of file paths
+    """
+    extensions = {ext.lower() for ext in extensions} if extensions is not None else None
+    exclude = tuple(exclude or ())
+    visited = set()
+    if follow_symlinks:
+        st = os.stat(root)
+        visited.add((st.st_dev, st.st_ino))
+
+    stack = [(root, '', 0)]
+    # The scan span excludes the time the caller spends between yielded paths.
+    started = time.perf_counter()
+    suspended = 0.0
+    found = 0
+    try:
+        while stack:
+            directory, relative_dir, depth = stack.pop()
+            try:
+                iterator = os.scandir(directory)
+            except OSError as e:
+                logger.warning("Cannot scan '%s': %s", directory, e)
+                continue
+            subdirectories = []
+            with iterator:
+                for entry in iterator:
+                    relative_path = os.path.join(relative_dir, entry.name) if relative_dir else entry.name
+                    if _is_excluded(entry.name, relative_path, exclude):
+                        continue
+                    try:
+                        if entry.is_symlink() and not follow_symlinks:
+                            continue
+                        if entry.is_dir(follow_symlinks=follow_symlinks):
+                            if depth < max_depth:
+                                if follow_symlinks:
+                                    st = entry.stat()
+                                    if (st.st_dev, st.st_ino) in visited:
+                                        continue
+                                    visited.add((st.st_dev, st.st_ino))
+                                subdirectories.append((entry.path, relative_path, depth + 1))
+                            continue
+                        if extensions is not None and os.path.splitext(entry.name)[1].lower() not in extensions:
+                            continue
+                        if not entry.is_file(follow_symlinks=follow_symlinks):
+                            continue
+                        if min_size is not None or max_size is not None:
+                            size = entry.stat(follow_symlinks=follow_symlinks).st_size
+                            if (min_size is not None and size < min_size) or \
+                                    (max_size is not None and size > max_size):
+                                continue
+                    except OSError as e:
+                        logger.warning("Cannot read '%s': %s", entry.path, e)
+                        continue
+                    found += 1
+                    yielded_at = time.perf_counter()
+                    yield entry.path
+                    suspended += time.perf_counter() - yielded_at
+            # Push in reverse so subdirectories are visited in listing order.
+            stack.extend(reversed(subdirectories))
+    finally:
+        telemetry.observe('scan', time.perf_counter() - started - suspended)
+        telemetry.increment('files_scanned', found)
+
+
+def _is_excluded(name, relative_path, patterns):
+    for pattern in patterns:
+        if fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(relative_path, pattern):
+            return True
+    return False
+
+
+def scan_options_from_env():
+    """
+    Read scanner settings from the environment (.env).
+
+    ``scan_max_depth``, ``scan_exclude`` (comma-separated globs),
+    ``scan_min_size``, ``scan_max_size`` (bytes) and ``scan_follow_symlinks``.
+
+    :return: Keyword arguments for ``scan_directory``
+    """
+    exclude = os.getenv("scan_exclude")
+    min_size = os.getenv("scan_min_size")
+    max_size = os.getenv("scan_max_size")
+    return {
+        "max_depth": int(os.getenv("scan_max_depth", DEFAULT_MAX_DEPTH)),
+        "exclude": tuple(p.strip() for p in exclude.split(',') if p.strip()) if exclude is not None else DEFAULT_EXCLUDE,
+        "min_size": int(min_size) if min_size else None,
+        "max_size": int(max_size) if max_size else None,
+        "follow_symlinks": os.getenv("scan_follow_symlinks", "").lower() in ("1", "true", "yes"),
+    }
@@ -0,0 +1,146 @@
+import os
+import sqlite3
+import threading
+import telemetry
+from collections import OrderedDict
+
+DEFAULT_MEMORY_ENTRIES = 256
+
+
+def file_signature(file_path):
+    """
+    Identify a specific version of a file.
+
+    :param file_path: Path to the file
+    :return: (absolute path, size, mtime_ns, inode)
+    """
+    st = os.stat(file_path)
+    return os.path.abspath(file_path), st.st_size, st.st_mtime_ns, st.st_ino
+
+
+class ExtractionCache:
+    """
+    Two-tier cache of extracted file content.
+
+    Entries are keyed by the file's path, size, mtime and inode, so a file
+    is parsed again only after it changes. The in-memory tier is an LRU of
+    ``max_entries`` items; the optional on-disk tier is a SQLite database
+    that survives restarts.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MEMORY_ENTRIES, disk_path=None):
+        self.max_entries = max_entries
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.conn = None
+        if disk_path:
+            self.conn = sqlite3.connect(disk_path, check_same_thread=False, isolation_level=None)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS extractions (
+                    path TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    inode INTEGER NOT NULL,
+                    variant TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    PRIMARY KEY (path, variant)
+                )
+            """)
+
+    def get_or_extract(self, file_path, extract, variant=''):
+        """
+        Return the cached content for ``file_path`` or call ``extract(file_path)``.
+
+        :param file_path: Path to the file
+        :param extract: Function that extracts the content of the file
+        :param variant: Distinguishes extractions of the same file with different settings
+        :return: Extracted content
+        """
+        content = self.get(file_path, variant)
+        if content is None:
+            content = extract(file_path)
+            self.put(file_path, content, variant)
+        return content
+
+    def get(self, file_path, variant=''):
+        """
+        Return the cached content for the current version of ``file_path``, or None.
+        """
+        signature = file_signature(file_path)
+        key = signature + (variant,)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                telemetry.increment('cache_lookups', cache='extraction', result='memory_hit')
+                return self._entries[key]
+            content = self._load(signature, variant)
+            if content is not None:
+                self.disk_hits += 1
+                telemetry.increment('cache_lookups', cache='extraction', result='disk_hit')
+                self._remember(key, content)
+                return content
+            self.misses += 1
+        telemetry.increment('cache_lookups', cache='extraction', result='miss')
+        return None
+
+    def put(self, file_path, content, variant=''):
+        signature = file_signature(file_path)
+        with self._lock:
+            self._remember(signature + (variant,), content)
+            self._store(signature, variant, content)
+
+    def _remember(self, key, content):
+        self._entries[key] = content
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _load(self, signature, variant):
+        if self.conn is None:
+            return None
+        path, size, mtime_ns, inode = signature
+        row = self.conn.execute(
+            "SELECT size, mtime_ns, inode, content FROM extractions WHERE path = ? AND variant = ?",
+            (path, variant)
+        ).fetchone()
+        if row and tuple(row[:3]) == (size, mtime_ns, inode):
+            return row[3]
+        return None
+
+    def _store(self, signature, variant, content):
+        if self.conn is None or not isinstance(content, str):
+            return
+        path, size, mtime_ns, inode = signature
+        self.conn.execute(
+            "INSERT OR REPLACE INTO extractions (path, size, mtime_ns, inode, variant, content) VALUES (?, ?, ?, ?, ?, ?)",
+            (path, size, mtime_ns, inode, variant, content)
+        )
+
+    def invalidate(self, file_path=None):
+        with self._lock:
+            if file_path is None:
+                self._entries.clear()
+                if self.conn is not None:
+                    self.conn.execute("DELETE FROM extractions")
+                return
+            path = os.path.abspath(file_path)
+            for key in [k for k in self._entries if k[0] == path]:
+                del self._entries[key]
+            if self.conn is not None:
+                self.conn.execute("DELETE FROM extractions WHERE path = ?", (path,))
+
+    def stats(self):
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_entries": len(self._entries),
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
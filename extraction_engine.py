@@ -0,0 +1,124 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FuturesTimeout, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from content_extractors import extract_content
+
+DEFAULT_TIMEOUT = 60  # seconds per file
+
+# Formats whose parsing is CPU-bound pure Python. Everything else (plain text,
+# CSV headers, network-bound audio transcription) is cheap to run in-process.
+PROCESS_POOL_EXTENSIONS = {'.pdf', '.doc', '.docx', '.xls', '.xlsx'}
+
+
+class ExtractionError(RuntimeError):
+    pass
+
+
+class ExtractionTimeout(ExtractionError):
+    pass
+
+
+class ExtractionCrashed(ExtractionError):
+    pass
+
+
+def _terminate(pool):
+    # ProcessPoolExecutor cannot cancel a running task, so stop its workers directly.
+    for process in list((getattr(pool, '_processes', None) or {}).values()):
+        process.terminate()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+class ExtractionEngine:
+    """
+    Runs content extraction for CPU-bound formats in a process pool.
+
+    Each file gets ``timeout`` seconds. A worker that hangs or crashes (for
+    example on a pathological PDF) only fails that file: the pool is torn down
+    and recreated, and files that were caught in a crash are retried once in a
+    process of their own so the culprit cannot take them down again.
+    """
+
+    def __init__(self, max_workers=None, timeout=DEFAULT_TIMEOUT, max_chars=None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.max_chars = max_chars
+        self._lock = threading.Lock()
+        self._pool = None
+        self._generation = 0
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self._pool, self._generation
+
+    def _restart(self, generation):
+        with self._lock:
+            if generation != self._generation or self._pool is None:
+                return  # Another thread already replaced this pool.
+            pool = self._pool
+            self._pool = None
+            self._generation += 1
+        _terminate(pool)
+
+    def extract(self, file_path):
+        """
+        Extract one file, in a worker process for CPU-bound formats.
+
+        :raises ExtractionTimeout: If extraction takes longer than the timeout
+        :raises ExtractionCrashed: If the worker process dies twice on this file
+        """
+        if os.path.splitext(file_path)[1].lower() not in PROCESS_POOL_EXTENSIONS:
+            return extract_content(file_path, self.max_chars)
+
+        pool, generation = self._get_pool()
+        try:
+            return self._run(pool, file_path)
+        except ExtractionTimeout:
+            self._restart(generation)
+            raise
+        except BrokenProcessPool:
+            # The crash may have been caused by another file in the same pool.
+            # Errors raised by the extractor itself reach the caller unchanged.
+            self._restart(generation)
+
+        isolated = ProcessPoolExecutor(max_workers=1)
+        try:
+            return self._run(isolated, file_path)
+        except BrokenProcessPool:
+            raise ExtractionCrashed(f"Worker process crashed while extracting '{file_path}'")
+        finally:
+            _terminate(isolated)
+
+    def _run(self, pool, file_path):
+        try:
+            future = pool.submit(extract_content, file_path, self.max_chars)
+        except RuntimeError:
+            # Another thread shut the pool down after a crash or timeout.
+            raise BrokenProcessPool("The extraction pool was shut down")
+        try:
+            return future.result(timeout=self.timeout)
+        except FuturesTimeout:
+            raise ExtractionTimeout(f"Extracting '{file_path}' took longer than {self.timeout} seconds")
+
+    def extract_many(self, file_paths):
+        """
+        Extract files concurrently, yielding (file_path, content, error) in completion order.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="extract") as threads:
+            futures = {threads.submit(self.extract, file_path): file_path for file_path in file_paths}
+            for future in as_completed(futures):
+                file_path = futures[future]
+                try:
+                    yield file_path, future.result(), None
+                except Exception as e:
+                    yield file_path, None, e
+
+    def shutdown(self):
+        with self._lock:
+            pool = self._pool
+            self._pool = None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
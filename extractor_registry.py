@@ -0,0 +1,142 @@
+import os
+import logging
+import importlib
+import threading
+
+# Third-party packages can add or override extractors with entry points in this group, e.g.
+#   [project.entry-points."file_organizer.extractors"]
+#   epub = "my_package.extractors:extract_epub"
+# The entry point name is the file extension; the target is called as extract(file_path, max_chars).
+ENTRY_POINT_GROUP = 'file_organizer.extractors'
+
+# Built-in extractors as "module:function" so their dependencies are only imported on first use.
+BUILTIN_EXTRACTORS = {
+    '.pdf': 'content_extractors:extract_pdf_content',
+    '.doc': 'content_extractors:extract_word_content',
+    '.docx': 'content_extractors:extract_word_content',
+    '.txt': 'content_extractors:extract_text_content',
+    '.md': 'content_extractors:extract_text_content',
+    '.xls': 'content_extractors:extract_excel_content',
+    '.xlsx': 'content_extractors:extract_excel_content',
+    '.csv': 'content_extractors:extract_csv_content',
+    '.mp3': 'content_extractors:extract_audio_file',
+    '.wav': 'content_extractors:extract_audio_file',
+    '.m4a': 'content_extractors:extract_audio_file',
+    '.flac': 'content_extractors:extract_audio_file',
+}
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize(extension):
+    extension = extension.lower()
+    return extension if extension.startswith('.') else '.' + extension
+
+
+class ExtractorRegistry:
+    """
+    Maps file extensions to extractor functions.
+
+    Extractors are registered as callables or as ``"module:function"``
+    references that are imported the first time a file of that type is
+    extracted, so startup does not pay for PDF, Word or Excel libraries.
+    Entry points in ``ENTRY_POINT_GROUP`` are read on first lookup and take
+    precedence over the built-in extractors.
+    """
+
+    def __init__(self, builtins=BUILTIN_EXTRACTORS, load_entry_points=True):
+        self._targets = {_normalize(extension): target for extension, target in builtins.items()}
+        self._loaded = {}
+        self._lock = threading.Lock()
+        self._entry_points_loaded = not load_entry_points
+
+    def register(self, extension, target):
+        """
+        :param extension: File extension, with or without the dot
+        :param target: Callable ``extract(file_path, max_chars)`` or a ``"module:function"`` string
+        """
+        with self._lock:
+            extension = _normalize(extension)
+            self._targets[extension] = target
+            self._loaded.pop(extension, None)
+
+    def _load_entry_points(self):
+        # Reading installed distributions' metadata is deferred until the first extraction.
+        self._entry_points_loaded = True
+        try:
+            from importlib.metadata import entry_points
+            try:
+                found = entry_points(group=ENTRY_POINT_GROUP)
+            except TypeError:  # Python < 3.10
+                found = entry_points().get(ENTRY_POINT_GROUP, [])
+        except Exception as e:
+            logger.warning("Could not read extractor entry points: %s", e)
+            return
+        for entry_point in found:
+            self._targets[_normalize(entry_point.name)] = entry_point
+            self._loaded.pop(_normalize(entry_point.name), None)
+            logger.debug("Extractor for '%s' provided by %s", entry_point.name, entry_point.value)
+
+    def get(self, extension):
+        """
+        :return: The extractor for ``extension``, imported on first use
+        :raises ValueError: If no extractor handles the extension
+        """
+        extension = _normalize(extension)
+        with self._lock:
+            if not self._entry_points_loaded:
+                self._load_entry_points()
+            extractor = self._loaded.get(extension)
+            if extractor is not None:
+                return extractor
+            target = self._targets.get(extension)
+            if target is None:
+                raise ValueError(f"Unsupported file type: {extension}")
+            if isinstance(target, str):
+                module_name, _, attribute = target.partition(':')
+                extractor = getattr(importlib.import_module(module_name), attribute)
+            elif hasattr(target, 'load') and not callable(target):
+                extractor = target.load()
+            else:
+                extractor = target
+            self._loaded[extension] = extractor
+            return extractor
+
+    def extensions(self):
+        with self._lock:
+            if not self._entry_points_loaded:
+                self._load_entry_points()
+            return tuple(sorted(self._targets))
+
+    def supports(self, file_path):
+        return os.path.splitext(file_path)[1].lower() in self.extensions()
+
+
+_registry = ExtractorRegistry()
+
+
+class _RegisteredExtensions:
+    """The registered extensions, including plugins, read each time they are used."""
+
+    def __iter__(self):
+        return iter(_registry.extensions())
+
+    def __contains__(self, extension):
+        return extension.lower() in _registry.extensions()
+
+    def __len__(self):
+        return len(_registry.extensions())
+
+    def __repr__(self):
+        return repr(_registry.extensions())
+
+
+SUPPORTED_EXTENSIONS = _RegisteredExtensions()
+
+
+def get_registry():
+    return _registry
+
+
+def register_extractor(extension, target):
+    _registry.register(extension, target)
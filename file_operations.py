@@ -1,42 +1,123 @@
 import os
 import re
-import json
-from content_extractors import (
-    extract_pdf_content,
-    extract_word_content,
-    extract_text_content,
-    extract_excel_content,
-    extract_csv_content,
-    extract_audio_content,
-)
-import platform
-import subprocess
-
-LOG_FILE = 'renamed_files.json'
+import time
+import logging
+import threading
+import contextlib
+from content_extractors import extract_content
+from rename_log import open_rename_log, SQLiteRenameLog
+from extraction_cache import ExtractionCache
+from extraction_engine import ExtractionEngine
+from content_index import ContentIndex, INDEX_FILE
+from tag_storage import TagStorage
+from rename_journal import (RenameJournal, RenameOperation, JOURNAL_FILE, DEFAULT_CHUNK_SIZE, DEFAULT_MAX_ATTEMPTS,
+                            DEFAULT_RETRY_DELAY, PLANNED, RENAMED, DONE, DEFERRED, FAILED, SKIPPED, UNDONE,
+                            is_locked_error, unique_path, fsync_directories)
+import tag_query
+import telemetry
+
+LOG_FILE = 'renamed_files.db'
+LEGACY_LOG_FILE = 'renamed_files.json'
+# Extractors stop once this many characters are collected. It is larger than what is sent
+# for naming so the content sampler can include the middle and end of longer documents.
+CONTENT_BUDGET = 60000
+
+logger = logging.getLogger(__name__)
+
+
+def _same_file(first, second):
+    """True if both paths name the same file, e.g. a case-only rename on a case-insensitive filesystem."""
+    try:
+        return first == second or os.path.samefile(first, second)
+    except OSError:
+        return False
+
 
 class FileOperations:
-    def __init__(self):
-        self.log_file = LOG_FILE
+    def __init__(self, log_file=LOG_FILE, content_index_path=None):
+        self.log_file = log_file
+        self.rename_log = open_rename_log(log_file)
+        if isinstance(self.rename_log, SQLiteRenameLog) and os.path.exists(LEGACY_LOG_FILE):
+            imported = self.rename_log.import_json(LEGACY_LOG_FILE)
+            if imported:
+                logger.info("Imported %d entries from '%s' into '%s'", imported, LEGACY_LOG_FILE, log_file)
+        # Set extraction_cache_path to keep extracted content across sessions.
+        self.extraction_cache = ExtractionCache(disk_path=os.getenv("extraction_cache_path"))
+        self.content_budget = CONTENT_BUDGET
+        # Parsing runs in worker processes unless extraction_processes is set to 0.
+        processes = int(os.getenv("extraction_processes", os.cpu_count() or 1))
+        self.extraction_engine = ExtractionEngine(processes, max_chars=self.content_budget) if processes > 0 else None
+        # Renamed files are indexed for full-text search unless content_index_enabled is false.
+        self.content_index = None
+        if os.getenv("content_index_enabled", "true").lower() not in ("0", "false", "no"):
+            self.content_index = ContentIndex(content_index_path or os.getenv("content_index_path", INDEX_FILE))
+        # Renames go through a write-ahead journal so a crash never leaves files renamed but unlogged.
+        self.journal = RenameJournal(os.getenv("rename_journal_path", JOURNAL_FILE))
+        self.rename_chunk_size = int(os.getenv("rename_chunk_size", DEFAULT_CHUNK_SIZE))
+        self.rename_max_attempts = int(os.getenv("rename_max_attempts", DEFAULT_MAX_ATTEMPTS))
+        self.rename_retry_delay = float(os.getenv("rename_retry_delay", DEFAULT_RETRY_DELAY))
+        # Functions called with (old path, new path) right after a file was renamed or an undo restored it;
+        # files that keep their name are reported with both paths equal when they are logged.
+        self.rename_listeners = []
+        # Tags go to extended attributes where possible, otherwise to a sidecar database (tag_backend).
+        self.tag_storage = TagStorage()
+        self._tag_batch = None
+        self._tag_lock = threading.Lock()
+        self._rename_lock = threading.Lock()
+        self._retry_lock = threading.Lock()
 
     def detect_file_type_and_extract_content(self, file_path):
-        _, file_extension = os.path.splitext(file_path)
-        file_extension = file_extension.lower()
-
-        if file_extension == '.pdf':
-            return extract_pdf_content(file_path)
-        elif file_extension in ['.doc', '.docx']:
-            return extract_word_content(file_path)
-        elif file_extension in ['.txt', '.md']:
-            return extract_text_content(file_path)
-        elif file_extension in ['.xls', '.xlsx']:
-            return extract_excel_content(file_path)
-        elif file_extension == '.csv':
-            return extract_csv_content(file_path)
-        elif file_extension in ['.mp3', '.wav', '.m4a', '.flac']:
-            api_key = os.getenv("openai_api_key")  # Get the API key from environment variables
-            return extract_audio_content(file_path, api_key)
+        return self.extraction_cache.get_or_extract(file_path, self.extract_content,
+                                                    variant=str(self.content_budget))
+
+    def extract_many(self, file_paths):
+        """
+        Extract several files concurrently.
+
+        Yields (file_path, content, error) tuples in completion order; cached
+        files are yielded first.
+        """
+        variant = str(self.content_budget)
+        misses = []
+        for file_path in file_paths:
+            try:
+                content = self.extraction_cache.get(file_path, variant)
+            except OSError as e:
+                yield file_path, None, e
+                continue
+            if content is None:
+                misses.append(file_path)
+            else:
+                yield file_path, content, None
+
+        if self.extraction_engine:
+            results = self.extraction_engine.extract_many(misses)
         else:
-            raise ValueError(f"Unsupported file type: {file_extension}")
+            results = (self._extract_inline(file_path) for file_path in misses)
+        for file_path, content, error in results:
+            if error is None:
+                self.extraction_cache.put(file_path, content, variant)
+            yield file_path, content, error
+
+    def _extract_inline(self, file_path):
+        try:
+            return file_path, self.extract_content(file_path), None
+        except Exception as e:
+            return file_path, None, e
+
+    def extraction_cache_stats(self):
+        return self.extraction_cache.stats()
+
+    def extract_content(self, file_path):
+        # Only cache misses get here, so the span measures real parsing work.
+        file_type = os.path.splitext(file_path)[1].lower().lstrip('.') or 'none'
+        with telemetry.span('extract', file_type=file_type):
+            if self.extraction_engine:
+                content = self.extraction_engine.extract(file_path)
+            else:
+                content = extract_content(file_path, self.content_budget)
+        telemetry.increment('extracted_bytes', len(content.encode('utf-8')), file_type=file_type)
+        return content
 
     def sanitize_filename(self, filename):
         sanitized = re.sub(r'[^a-zA-Z0-9_.-]', '_', filename)
@@ -49,7 +130,13 @@ class FileOperations:
     def sanitize_tag(self, tag):
         return re.sub(r'[^a-zA-Z0-9_]', '_', tag).strip('_')
 
-    def log_rename(self, original_path, new_path, tags):
+    def log_rename(self, original_path, new_path, tags, content=None):
+        entry_id, sanitized_tags = self._log_entry(original_path, new_path, tags)
+        self.index_content(entry_id, original_path, new_path, sanitized_tags, content)
+        return entry_id
+
+    def _log_entry(self, original_path, new_path, tags):
+        """:return: (entry id, sanitized tags)"""
         log_entry = {
             "original_name": os.path.basename(original_path),
             "new_name": os.path.basename(new_path),
@@ -57,71 +144,323 @@ class FileOperations:
             "tags": [self.sanitize_tag(tag) for tag in tags]
         }
         
-        if os.path.exists(self.log_file):
-            with open(self.log_file, 'r') as f:
-                log_data = json.load(f)
-        else:
-            log_data = []
-        
-        log_data.append(log_entry)
+        entry_id = self.rename_log.add(log_entry)
         
-        with open(self.log_file, 'w') as f:
-            json.dump(log_data, f, indent=2)
-        
-        print(f"Logged rename: '{os.path.basename(original_path)}' to '{os.path.basename(new_path)}' with tags: {', '.join(tags)}")
+        logger.info("Logged rename: '%s' to '%s' with tags: %s",
+                    os.path.basename(original_path), os.path.basename(new_path), ', '.join(tags))
+        return entry_id, log_entry["tags"]
+
+    def index_content(self, entry_id, original_path, new_path, tags, content=None):
+        """Add a renamed file to the content index; ``content`` is extracted again when not given."""
+        if self.content_index is None:
+            return
+        try:
+            if content is None:
+                content = self.detect_file_type_and_extract_content(new_path)
+            self.content_index.add(entry_id, new_path, tags, content, previous_path=original_path)
+        except Exception as e:
+            # The rename itself succeeded; a missing index entry is fixed by rebuilding the index.
+            logger.warning("Could not index content of '%s': %s", new_path, e)
+
+    def _cached_content(self, file_path):
+        try:
+            return self.extraction_cache.get(file_path, str(self.content_budget))
+        except OSError:
+            return None
 
     def check_if_renamed(self, filename):
-        print(f"Checking if '{filename}' has been renamed before...")
-        if os.path.exists(self.log_file):
-            with open(self.log_file, 'r') as f:
-                log_data = json.load(f)
-            
-            for entry in log_data:
-                if entry["original_name"] == filename or entry["new_name"] == filename:
-                    print(f"'{filename}' has been renamed before.")
-                    return True
-        
-        print(f"'{filename}' has not been renamed before.")
-        return False
+        renamed = self.rename_log.was_renamed(filename)
+        logger.debug("'%s' %s been renamed before", filename, "has" if renamed else "has not")
+        return renamed
 
     def apply_tags(self, file_path, tags):
-        system = platform.system()
-        
-        if system == "Darwin":  # macOS
-            tags_arg = ','.join(f'"{tag}"' for tag in tags)
-            command = f"xattr -w com.apple.metadata:_kMDItemUserTags '{tags_arg}' '{file_path}'"
-            subprocess.run(command, shell=True, check=True)
-            print(f"Applied tags {tags} to '{file_path}'")
-        elif system == "Windows":
-            print(f"Tags for '{file_path}': {', '.join(tags)}")
-            print("Note: Windows doesn't support native file tagging. Consider using a third-party solution.")
-        else:
-            print(f"Tagging not supported on {system}. Tags for '{file_path}': {', '.join(tags)}")
+        self.apply_tags_many([(file_path, tags)])
 
-    def rename_with_retry(self, file_path, new_name, tags):
-        original_name = os.path.basename(file_path)
-        
-        if self.check_if_renamed(original_name):
-            print(f"File '{original_name}' has already been renamed. Skipping.")
-            return False
-        
-        directory = os.path.dirname(file_path)
-        new_path = os.path.join(directory, new_name)
-        
-        max_attempts = 5
-        for attempt in range(max_attempts):
+    def apply_tags_many(self, items):
+        """
+        Store the tags of several files (see tag_storage.py). Inside
+        ``tag_batch()`` they are collected and written when the batch ends.
+
+        :param items: List of (path, tags)
+        """
+        with self._tag_lock:
+            if self._tag_batch is not None:
+                self._tag_batch.extend(items)
+                return
+        with telemetry.span('tags.apply', backend=self.tag_storage.mode) as labels:
+            written = self.tag_storage.apply_many(items)
+            labels["files"] = len(items)
+        for path, tags in items:
+            if path in written:
+                logger.info("Applied tags %s to '%s' (%s)", tags, path, written[path])
+
+    @contextlib.contextmanager
+    def tag_batch(self):
+        """Defer tag writes until the block ends, then write them in chunks, e.g. after a bulk run."""
+        with self._tag_lock:
+            outermost = self._tag_batch is None
+            if outermost:
+                self._tag_batch = []
+        try:
+            yield self
+        finally:
+            if outermost:
+                with self._tag_lock:
+                    items, self._tag_batch = self._tag_batch, None
+                for start in range(0, len(items), self.rename_chunk_size):
+                    self.apply_tags_many(items[start:start + self.rename_chunk_size])
+
+    def apply_rename(self, file_path, new_name, tags, content=None):
+        """Rename and tag a file, or only log and tag it when the name is unchanged."""
+        return self.apply_renames([(file_path, new_name, tags, content)])[0].state == DONE
+
+    def apply_renames(self, renames, batch_id=None):
+        """
+        Rename, tag and log a batch of files through the rename journal.
+
+        The batch is journaled before any file is touched. Names that are
+        taken (on disk or earlier in the batch) get a ``_1``, ``_2``, ...
+        suffix. Files that are locked are deferred and retried by
+        ``retry_deferred`` instead of holding up the rest of the batch.
+
+        :param renames: Iterable of (file_path, new_name, tags) or (file_path, new_name, tags, content);
+                        content already extracted (e.g. ``Suggestion.content``) is indexed without parsing the file again
+        :param batch_id: Journal batch to add the renames to, so they are undone together; default: a new batch
+        :return: List of RenameOperation in input order; ``state`` is DONE,
+                 DEFERRED, FAILED or SKIPPED and ``target`` the final path
+        """
+        operations = []
+        planned = []
+        contents = []
+        taken = set()
+        for file_path, new_name, tags, *content in renames:
+            original_name = os.path.basename(file_path)
+            target = os.path.join(os.path.dirname(file_path), new_name)
+            if new_name != original_name:
+                if self.check_if_renamed(original_name):
+                    logger.info("File '%s' has already been renamed. Skipping.", original_name)
+                    operations.append(RenameOperation(None, None, file_path, file_path, tags, SKIPPED))
+                    continue
+                if not _same_file(file_path, target):
+                    target = unique_path(target, taken)
+            taken.add(target)
+            planned.append((file_path, target, tags))
+            contents.append(content[0] if content else None)
+            operations.append(None)
+
+        if planned:
+            _, journaled = self.journal.plan(planned, batch_id)
+            pending = iter(journaled)
+            operations = [op if op is not None else next(pending) for op in operations]
+            self._execute(journaled, {op.id: content for op, content in zip(journaled, contents)
+                                      if content is not None})
+        return operations
+
+    def _execute(self, operations, known_contents=None):
+        known_contents = known_contents or {}
+        for start in range(0, len(operations), self.rename_chunk_size):
+            chunk = operations[start:start + self.rename_chunk_size]
+            renamed = []
+            contents = {}
+            for op in chunk:
+                # Extracted content is cached by path, so it is looked up before the path changes.
+                content = known_contents.get(op.id)
+                if content is None:
+                    content = self._cached_content(op.source)
+                if op.source != op.target and not self._replace(op):
+                    continue
+                op.state = RENAMED
+                contents[op.id] = content
+                renamed.append(op)
+            # One directory fsync pass and one journal commit per chunk instead of per file.
+            fsync_directories([op.source for op in renamed] + [op.target for op in renamed])
+            self.journal.update(chunk)
+            self._finish(renamed, contents)
+
+    def _replace(self, op):
+        with self._rename_lock:
+            if op.source != op.target and os.path.lexists(op.target) and not _same_file(op.source, op.target):
+                # Another file took the name since the batch was planned.
+                op.target = unique_path(op.target)
+                self.journal.update([op])
             try:
-                os.rename(file_path, new_path)
-                self.apply_tags(new_path, tags)
-                self.log_rename(file_path, new_path, tags)
+                with telemetry.span('rename'):
+                    os.replace(op.source, op.target)
+                self._notify_renamed(op.source, op.target)
                 return True
             except OSError as e:
-                print(f"Error renaming file (attempt {attempt + 1}/{max_attempts}): {e}")
-                if attempt == max_attempts - 1:
-                    print(f"Failed to rename file after {max_attempts} attempts: {file_path}")
-                    return False
-                import time
-                time.sleep(1)  # Wait for 1 second before retrying
+                op.attempts += 1
+                op.error = str(e)
+                if is_locked_error(e) and op.attempts < self.rename_max_attempts:
+                    op.state = DEFERRED
+                    op.next_attempt = time.time() + self.rename_retry_delay * 2 ** (op.attempts - 1)
+                    telemetry.increment('rename_deferred')
+                    logger.warning("'%s' is locked (%s); retrying in %.0f seconds",
+                                   op.source, e, op.next_attempt - time.time())
+                else:
+                    op.state = FAILED
+                    logger.error("Failed to rename '%s' after %d attempts: %s", op.source, op.attempts, e)
+                return False
+
+    def _notify_renamed(self, old_path, new_path):
+        for listener in list(self.rename_listeners):
+            try:
+                listener(old_path, new_path)
+            except Exception as e:
+                logger.warning("Rename listener failed for '%s': %s", new_path, e)
+
+    def _finish(self, operations, contents):
+        """Tag, log and index renamed files, then record them as done in one journal commit."""
+        if not operations:
+            return
+        try:
+            self.apply_tags_many([(op.target, op.tags) for op in operations])
+        except Exception as e:
+            # The files keep their new names; tags can be written again with "python tag_storage.py push".
+            logger.warning("Could not apply tags: %s", e)
+        logged_tags = {}
+        with self.batch():
+            for op in operations:
+                if op.source == op.target:
+                    logger.info("Name unchanged. Logging and applying tags for '%s'", os.path.basename(op.source))
+                    self._notify_renamed(op.source, op.target)
+                op.entry_id, logged_tags[op.id] = self._log_entry(op.source, op.target, op.tags)
+            # Journaled before the log commits: recovery treats an op as logged only if its entry_id exists.
+            self.journal.update(operations)
+        for op in operations:
+            op.state = DONE
+            op.error = None
+        self.journal.update(operations)
+        if self.content_index is None:
+            return
+        # Files whose content is neither known nor cached are parsed here, after the log and
+        # journal commits, so no write transaction stays open while a document is parsed.
+        for op in operations:
+            if contents.get(op.id) is None:
+                try:
+                    contents[op.id] = self.detect_file_type_and_extract_content(op.target)
+                except Exception as e:
+                    logger.warning("Could not extract '%s' for the content index: %s", op.target, e)
+                    contents[op.id] = ''
+        with self._index_batch():
+            for op in operations:
+                self.index_content(op.entry_id, op.source, op.target, logged_tags[op.id], contents[op.id])
+
+    def _index_batch(self):
+        return self.content_index.batch() if self.content_index is not None else contextlib.nullcontext()
+
+    def retry_deferred(self, wait=False):
+        """
+        Retry deferred renames whose retry time has come.
+
+        :param wait: Keep retrying until no deferred renames are left
+        :return: Retried operations with their new state
+        """
+        retried = {}
+        while True:
+            with self._retry_lock:
+                due = self.journal.due_deferred()
+                if due:
+                    telemetry.increment('rename_retries', len(due))
+                    self._execute(due)
+                    retried.update((op.id, op) for op in due)
+            next_attempt = self.journal.next_deferred_at()
+            if not wait or next_attempt is None:
+                return list(retried.values())
+            time.sleep(max(0.0, next_attempt - time.time()))
+
+    def recover_renames(self):
+        """
+        Complete the batches a crash interrupted.
+
+        Called by the entry points that rename files (GUI, ``cli.py run``,
+        ``watch``, ``apply`` and ``undo``) before they start, never on
+        construction, so read-only tools do not touch files.
+
+        Renames that reached the disk are tagged, logged and indexed; renames
+        that never happened are marked failed. Due deferred renames are
+        retried once.
+
+        :return: Number of recovered operations
+        """
+        unfinished = self.journal.unfinished()
+        if not unfinished:
+            self.retry_deferred()
+            return 0
+        renamed = []
+        for op in unfinished:
+            if op.state == PLANNED:
+                if op.source == op.target or (not os.path.lexists(op.source) and os.path.lexists(op.target)):
+                    op.state = RENAMED
+                else:
+                    op.state, op.error = FAILED, "Interrupted before the rename"
+            if op.state == RENAMED:
+                # The entry id is journaled before the log commits, so an op whose entry exists
+                # was fully logged and tagged; this holds for tag-only updates (same name) too.
+                entry = self.rename_log.entries_by_ids([op.entry_id]) if op.entry_id is not None else []
+                if entry and entry[0]["full_path"] == op.target \
+                        and entry[0]["original_name"] == os.path.basename(op.source):
+                    op.state = DONE
+                else:
+                    op.entry_id = None
+                    renamed.append(op)
+        self.journal.update(unfinished)
+        self._finish(renamed, {})
+        logger.warning("Recovered %d interrupted renames (%d completed)", len(unfinished),
+                       sum(1 for op in unfinished if op.state == DONE))
+        self.retry_deferred()
+        return len(unfinished)
+
+    def undo_batch(self, batch_id=None):
+        """
+        Restore the original names of a batch (by default the latest one),
+        in reverse order, and remove its log and index entries. Renames of
+        the batch that are still deferred are cancelled.
+
+        :return: List of undone operations
+        """
+        if batch_id is None:
+            batch_id = self.journal.last_batch()
+            if batch_id is None:
+                return []
+        operations = self.journal.operations(batch_id, states=(DONE, RENAMED, DEFERRED))
+        undone = []
+        for op in reversed(operations):
+            if op.state == DEFERRED:
+                op.state, op.error = FAILED, "Cancelled by undo"
+                continue
+            if op.source != op.target:
+                with self._rename_lock:
+                    if os.path.lexists(op.source) and not _same_file(op.source, op.target):
+                        op.error = "The original name is taken"
+                        logger.warning("Cannot undo '%s': '%s' exists", op.target, op.source)
+                        continue
+                    try:
+                        os.replace(op.target, op.source)
+                    except OSError as e:
+                        op.error = str(e)
+                        logger.warning("Cannot undo '%s': %s", op.target, e)
+                        continue
+                    self._notify_renamed(op.target, op.source)
+            op.state = UNDONE
+            undone.append(op)
+
+        fsync_directories([op.source for op in undone] + [op.target for op in undone])
+        for op in undone:
+            try:
+                self.tag_storage.remove(op.source, previous_path=op.target)
+            except OSError as e:
+                logger.warning("Could not remove tags from '%s': %s", op.source, e)
+        with self.batch():
+            self.rename_log.remove_many([op.entry_id for op in undone if op.entry_id is not None])
+        if self.content_index is not None:
+            for op in undone:
+                self.content_index.remove(op.target)
+        self.journal.update(operations)
+        if not any(op.state in (DONE, RENAMED) for op in operations):
+            self.journal.mark_undone(batch_id)
+        logger.info("Undid %d of %d renames in batch %d", len(undone), len(operations), batch_id)
+        return undone
 
     def prepare_new_filename(self, new_name, original_file_path):
         new_name = self.sanitize_filename(new_name)
@@ -130,27 +469,40 @@ class FileOperations:
             new_name += file_extension
         return new_name
 
+    def batch(self):
+        """Group several log writes into a single transaction."""
+        return self.rename_log.batch()
+
     def search_files_by_tags(self, tags):
-        if os.path.exists(self.log_file):
-            with open(self.log_file, 'r') as f:
-                log_data = json.load(f)
-            
-            matching_files = []
-            for entry in log_data:
-                if all(self.sanitize_tag(tag).lower() in [self.sanitize_tag(t).lower() for t in entry["tags"]] for tag in tags):
-                    matching_files.append(entry)
-            
-            return matching_files
-        else:
+        node = ('and', [('tag', self.sanitize_tag(tag).lower()) for tag in tags])
+        return self.rename_log.entries_by_ids(tag_query.evaluate(node, self.rename_log))
+
+    def search_files_by_query(self, query, limit=None):
+        """
+        Search the rename log with a boolean tag query, e.g. ``invoice, 2023 | receipt -draft fin*``.
+        See tag_query.py for the syntax.
+        """
+        return tag_query.search(query, self.rename_log, limit=limit)
+
+    def search_content(self, text, tag_filter=None, limit=50):
+        """
+        Ranked full-text search over names, tags and extracted content, e.g.
+        ``"quarterly report" budget -draft``. See content_index.py for the syntax.
+
+        :param tag_filter: Optional tag query (tag_query.py syntax) that results must also match
+        :return: List of dicts with id, full_path, new_name, tags, snippet and score, best first
+        """
+        if self.content_index is None:
             return []
+        allowed = None
+        if tag_filter and tag_filter.strip():
+            node = tag_query.parse_query(tag_filter)
+            if node is not None:
+                allowed = set(tag_query.evaluate(node, self.rename_log))
+        return self.content_index.search(text, allowed, limit)
 
     def get_all_tags(self):
-        all_tags = set()
-        if os.path.exists(self.log_file):
-            with open(self.log_file, 'r') as f:
-                log_data = json.load(f)
-            
-            for entry in log_data:
-                all_tags.update(self.sanitize_tag(tag).lower() for tag in entry["tags"])
-        
-        return all_tags
\ No newline at end of file
+        return set(self.rename_log.tag_counts())
+
+    def get_tag_counts(self):
+        return self.rename_log.tag_counts()
@@ -0,0 +1,381 @@
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import sqlite3
+import logging
+import threading
+import telemetry
+from content_extractors import SUPPORTED_EXTENSIONS
+from directory_scanner import DEFAULT_MAX_DEPTH, DEFAULT_EXCLUDE, _is_excluded
+
+CURSOR_FILE = 'watch_cursor.db'
+DEFAULT_DEBOUNCE_SECONDS = 5.0
+DEFAULT_POLL_INTERVAL = 10.0
+
+# Cursor states of a file.
+PENDING = 'pending'      # Seen, waiting to stop changing.
+QUEUED = 'queued'        # Handed to the pipeline, outcome not recorded yet.
+PROCESSED = 'processed'  # Done; only a new size or mtime brings it back.
+
+# inotify(7) constants.
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE_SELF | IN_ONLYDIR
+EVENT_HEADER = struct.Struct('iIII')
+
+logger = logging.getLogger(__name__)
+
+
+class WatchCursor:
+    """
+    Persistent record of what the watcher has seen.
+
+    Directory mtimes let a restarted watcher list only the directories that
+    gained or lost entries while it was stopped; file signatures tell new
+    and changed files apart from ones that were already processed.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS directories (
+            path TEXT PRIMARY KEY,
+            parent TEXT,
+            depth INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_directories_parent ON directories(parent);
+        CREATE TABLE IF NOT EXISTS files (
+            path TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            updated_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_files_status ON files(status);
+    """
+
+    def __init__(self, path=CURSOR_FILE):
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+
+    def directory_mtime(self, path):
+        with self._lock:
+            row = self.conn.execute("SELECT mtime_ns FROM directories WHERE path = ?", (path,)).fetchone()
+        return row[0] if row else None
+
+    def set_directory(self, path, parent, depth, mtime_ns):
+        with self._lock:
+            self.conn.execute("INSERT OR REPLACE INTO directories (path, parent, depth, mtime_ns) VALUES (?, ?, ?, ?)",
+                              (path, parent, depth, mtime_ns))
+
+    def subdirectories(self, path):
+        with self._lock:
+            return [row[0] for row in self.conn.execute("SELECT path FROM directories WHERE parent = ?", (path,))]
+
+    def forget_directory(self, path):
+        with self._lock:
+            self.conn.execute("DELETE FROM directories WHERE path = ? OR path LIKE ?",
+                              (path, path.rstrip(os.sep) + os.sep + '%'))
+
+    def file_state(self, path):
+        """:return: (size, mtime_ns, status) or None"""
+        with self._lock:
+            return self.conn.execute("SELECT size, mtime_ns, status FROM files WHERE path = ?", (path,)).fetchone()
+
+    def set_file(self, path, signature, status):
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO files (path, size, mtime_ns, status, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (path, signature[0], signature[1], status, time.time())
+            )
+
+    def unfinished(self):
+        """Paths that were pending or queued when the watcher last stopped."""
+        with self._lock:
+            return [row[0] for row in self.conn.execute(
+                "SELECT path FROM files WHERE status IN (?, ?)", (PENDING, QUEUED))]
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+class Inotify:
+    """Minimal ctypes binding for Linux inotify."""
+
+    def __init__(self):
+        import ctypes
+        import ctypes.util
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._ctypes = ctypes
+        self.watches = {}
+
+    def add_watch(self, directory):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            error = self._ctypes.get_errno()
+            raise OSError(error, f"Cannot watch '{directory}': {os.strerror(error)}")
+        self.watches[wd] = directory
+        return wd
+
+    def read(self, timeout):
+        """
+        Wait up to ``timeout`` seconds for events.
+
+        :return: List of (directory, name, mask); name is '' for events on the directory itself
+        """
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            data = os.read(self.fd, 256 * 1024)
+        except OSError as e:
+            if e.errno == errno.EAGAIN:
+                return []
+            raise
+        events = []
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            directory = self.watches.get(wd)
+            if mask & IN_IGNORED:
+                self.watches.pop(wd, None)
+            elif directory is not None or mask & IN_Q_OVERFLOW:
+                events.append((directory, name, mask))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class FolderWatcher:
+    """
+    Yields files that appear or change under one or more directories.
+
+    Uses inotify on Linux and falls back to polling directory mtimes
+    elsewhere (or with ``use_inotify=False``): only directories whose
+    mtime changed are listed again, never the whole tree. A file is yielded
+    once its size and mtime have not changed for ``debounce_seconds``, so
+    scans that are still being written are left alone. The cursor
+    remembers processed files and directory mtimes, so a restarted watcher
+    resumes without a full rescan.
+
+    Iterate over the watcher (e.g. as the input of ``SuggestionPipeline``)
+    and report outcomes with ``mark_processed``; ``stop`` ends the iteration.
+    """
+
+    def __init__(self, roots, extensions=SUPPORTED_EXTENSIONS, exclude=DEFAULT_EXCLUDE, max_depth=DEFAULT_MAX_DEPTH,
+                 min_size=None, max_size=None, debounce_seconds=None, poll_interval=None, cursor_path=CURSOR_FILE,
+                 use_inotify=None):
+        self.roots = [os.path.abspath(root) for root in roots]
+        self.extensions = {ext.lower() for ext in extensions} if extensions is not None else None
+        self.exclude = tuple(exclude or ())
+        self.max_depth = max_depth
+        self.min_size = min_size
+        self.max_size = max_size
+        self.debounce_seconds = debounce_seconds if debounce_seconds is not None else \
+            float(os.getenv("watch_debounce_seconds", DEFAULT_DEBOUNCE_SECONDS))
+        self.poll_interval = poll_interval or float(os.getenv("watch_poll_interval", DEFAULT_POLL_INTERVAL))
+        self.cursor = WatchCursor(cursor_path)
+        self._pending = {}  # path -> (signature, monotonic time of the last change)
+        self._stopped = threading.Event()
+        self._inotify = None
+        if use_inotify is None:
+            use_inotify = sys.platform.startswith('linux')
+        if use_inotify:
+            try:
+                self._inotify = Inotify()
+            except (OSError, AttributeError) as e:
+                logger.warning("inotify unavailable (%s); polling every %.0fs instead", e, self.poll_interval)
+
+    @property
+    def mode(self):
+        return 'inotify' if self._inotify else 'polling'
+
+    def stop(self):
+        self._stopped.set()
+
+    def mark_processed(self, file_path):
+        """Record that ``file_path`` (in its current state) needs no further processing."""
+        signature = self._signature(file_path)
+        if signature is not None:
+            self.cursor.set_file(os.path.abspath(file_path), signature, PROCESSED)
+
+    def __iter__(self):
+        for path in self.cursor.unfinished():
+            self._consider(path)
+        for root in self.roots:
+            self._refresh(root, None, 0)
+        last_poll = time.monotonic()
+
+        while not self._stopped.is_set():
+            for path in self._settle():
+                self.cursor.set_file(path, self._pending_signature(path), QUEUED)
+                self._pending.pop(path, None)
+                telemetry.increment('watch_files_ready')
+                yield path
+            if self._stopped.is_set():
+                return
+
+            timeout = self.poll_interval
+            if self._pending:
+                timeout = min(timeout, self.debounce_seconds / 2 or 0.1)
+            if self._inotify:
+                self._handle_events(self._inotify.read(timeout))
+            else:
+                self._stopped.wait(timeout)
+                if time.monotonic() - last_poll >= self.poll_interval:
+                    for root in self.roots:
+                        self._refresh(root, None, 0)
+                    last_poll = time.monotonic()
+
+    def close(self):
+        self.stop()
+        if self._inotify:
+            self._inotify.close()
+        self.cursor.close()
+
+    def _signature(self, path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_size, st.st_mtime_ns
+
+    def _pending_signature(self, path):
+        entry = self._pending.get(path)
+        return entry[0] if entry else self._signature(path) or (0, 0)
+
+    def _wanted(self, name, relative_path):
+        if _is_excluded(name, relative_path, self.exclude):
+            return False
+        return self.extensions is None or os.path.splitext(name)[1].lower() in self.extensions
+
+    def _relative(self, path):
+        for root in self.roots:
+            if path == root or path.startswith(root.rstrip(os.sep) + os.sep):
+                return os.path.relpath(path, root)
+        return os.path.basename(path)
+
+    def _consider(self, path):
+        """Start debouncing ``path`` unless it was already processed in its current state."""
+        signature = self._signature(path)
+        if signature is None:
+            self._pending.pop(path, None)
+            return
+        size = signature[0]
+        if (self.min_size is not None and size < self.min_size) or (self.max_size is not None and size > self.max_size):
+            return
+        state = self.cursor.file_state(path)
+        if state and state[2] == PROCESSED and (state[0], state[1]) == signature:
+            return
+        if path not in self._pending:
+            self.cursor.set_file(path, signature, PENDING)
+        if path not in self._pending or self._pending[path][0] != signature:
+            self._pending[path] = (signature, time.monotonic())
+
+    def _settle(self):
+        """:return: Pending paths that have not changed for ``debounce_seconds``"""
+        now = time.monotonic()
+        ready = []
+        for path, (signature, changed_at) in list(self._pending.items()):
+            current = self._signature(path)
+            if current is None:
+                del self._pending[path]
+            elif current != signature:
+                self._pending[path] = (current, now)
+            elif now - changed_at >= self.debounce_seconds:
+                state = self.cursor.file_state(path)
+                if state and state[2] == PROCESSED and (state[0], state[1]) == current:
+                    # Processed in the meantime, e.g. the new name of a file the pipeline just renamed.
+                    del self._pending[path]
+                else:
+                    ready.append(path)
+        return ready
+
+    def _refresh(self, directory, parent, depth):
+        """List ``directory`` if it changed since the cursor last saw it, then recurse into subdirectories."""
+        try:
+            mtime_ns = os.stat(directory).st_mtime_ns
+        except OSError:
+            self.cursor.forget_directory(directory)
+            return
+        if self._inotify and directory not in self._inotify.watches.values():
+            try:
+                self._inotify.add_watch(directory)
+            except OSError as e:
+                logger.warning("%s", e)
+
+        if self.cursor.directory_mtime(directory) == mtime_ns:
+            subdirectories = self.cursor.subdirectories(directory) if depth < self.max_depth else []
+        else:
+            subdirectories = self._list(directory, depth)
+            # Stored after listing with the mtime read before it, so entries added meanwhile are seen next time.
+            self.cursor.set_directory(directory, parent, depth, mtime_ns)
+        for subdirectory in subdirectories:
+            self._refresh(subdirectory, directory, depth + 1)
+
+    def _list(self, directory, depth):
+        subdirectories = []
+        with telemetry.span('watch.list'):
+            try:
+                with os.scandir(directory) as iterator:
+                    for entry in iterator:
+                        relative_path = self._relative(entry.path)
+                        try:
+                            if entry.is_symlink():
+                                continue
+                            if entry.is_dir():
+                                if depth < self.max_depth and not _is_excluded(entry.name, relative_path, self.exclude):
+                                    subdirectories.append(entry.path)
+                            elif self._wanted(entry.name, relative_path):
+                                self._consider(entry.path)
+                        except OSError as e:
+                            logger.warning("Cannot read '%s': %s", entry.path, e)
+            except OSError as e:
+                logger.warning("Cannot scan '%s': %s", directory, e)
+        return subdirectories
+
+    def _depth(self, directory):
+        relative = self._relative(directory)
+        return 0 if relative == '.' else relative.count(os.sep) + 1
+
+    def _handle_events(self, events):
+        for directory, name, mask in events:
+            if mask & IN_Q_OVERFLOW:
+                # Events were dropped; compare every directory with the cursor again.
+                logger.warning("inotify queue overflowed; rescanning changed directories")
+                for root in self.roots:
+                    self._refresh(root, None, 0)
+                continue
+            if mask & IN_DELETE_SELF:
+                self.cursor.forget_directory(directory)
+                continue
+            path = os.path.join(directory, name) if name else directory
+            if mask & IN_ISDIR:
+                depth = self._depth(path)
+                if mask & (IN_CREATE | IN_MOVED_TO) and depth <= self.max_depth \
+                        and not _is_excluded(name, self._relative(path), self.exclude):
+                    self._refresh(path, directory, depth)
+                continue
+            if name and self._wanted(name, self._relative(path)):
+                self._consider(path)
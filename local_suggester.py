@@ -0,0 +1,370 @@
+import os
+import re
+import math
+import time
+import logging
+import threading
+import unicodedata
+from collections import Counter
+from content_sampler import strip_boilerplate
+
+# Local suggestions at or above this confidence are used without asking OpenAI.
+DEFAULT_THRESHOLD = 0.75
+MAX_NAME_WORDS = 6
+MIN_TAGS = 3
+MAX_TAGS = 5
+# Only the leading lines are considered for a title, and only this much text is scored.
+TITLE_LINES = 10
+MAX_CHARS = 20000
+# Documents with fewer words are too short to judge; their confidence is halved.
+MIN_WORDS = 30
+# Keyword weights are trusted fully once the corpus has this many documents.
+CORPUS_SIZE_TRUSTED = 20
+# Seconds before the tag vocabulary is read from the rename log again.
+VOCABULARY_REFRESH = 300
+
+# Confidence contributed by each kind of evidence
+TITLE_CONFIDENCE = 0.45
+WEAK_TITLE_CONFIDENCE = 0.3
+KEYWORD_CONFIDENCE = 0.2
+DATE_CONFIDENCE = 0.1
+VOCABULARY_TAG_CONFIDENCE = 0.05
+MAX_CONFIDENCE = 0.95
+
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being below between both
+but by can could did do does doing down during each few for from further had has have having he her here hers him
+his how i if in into is it its itself just me more most my no nor not now of off on once only or other our ours out
+over own same she should so some such than that the their theirs them then there these they this those through to
+too under until up very was we were what when where which while who whom why will with would you your yours
+page pages table tables figure sheet sheets header headers column columns row rows sample data file files document
+version draft copy new final untitled total integer number date boolean text empty delimiter encoding utf tab
+""".split())
+
+_WORD = re.compile(r"[^\W\d_]{3,}", re.UNICODE)
+_YEAR = re.compile(r'\b(19[5-9]\d|20\d\d)\b')
+_ISO_DATE = re.compile(r'\b((?:19|20)\d\d)-(0[1-9]|1[0-2])-(0[1-9]|[12]\d|3[01])\b')
+_MONTH_DATE = re.compile(
+    r'\b(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?\s+(?:\d{1,2},?\s+)?((?:19|20)\d\d)\b', re.IGNORECASE)
+_MONTHS = ('jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec')
+# Lines of the spreadsheet and CSV summaries from tabular_extractor.py
+_TABLE_LINE = re.compile(r"^(Headers|Rows|Sample data): ?|^Sheet '(.*)':$")
+_COLUMN_TYPE = re.compile(r' \((?:empty|boolean|integer|number|date|text)\)')
+_DEFAULT_SHEET = re.compile(r'^(sheet|tabelle|feuil|hoja)\s*\d*$', re.IGNORECASE)
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize(word):
+    """Lowercase and strip diacritics, the way the content index tokenizes."""
+    word = unicodedata.normalize('NFKD', word.lower())
+    return ''.join(char for char in word if not unicodedata.combining(char))
+
+
+def _tag_key(tag):
+    """Key under which spellings of a tag match, e.g. 'Annual-Reports' and 'annual_report'."""
+    key = re.sub(r'[^a-z0-9]', '', _normalize(tag))
+    return key[:-1] if key.endswith('s') and len(key) > 3 else key
+
+
+def terms(text):
+    """
+    :return: Counter of keyword candidates: words that are not stopwords and
+             pairs of such words that follow each other on a line
+    """
+    counts = Counter()
+    for line in text.splitlines():
+        previous = None
+        for word in _WORD.findall(line):
+            word = _normalize(word)
+            if word in STOPWORDS:
+                previous = None
+                continue
+            counts[word] += 1
+            if previous:
+                counts[f"{previous} {word}"] += 1
+            previous = word
+    return counts
+
+
+def find_date(lines):
+    """
+    :return: The most specific date in the leading lines ('2023-03-15', '2023-03' or '2023'),
+             else a year mentioned at least twice in ``lines``, else None
+    """
+    head = '\n'.join(lines[:TITLE_LINES])
+    match = _ISO_DATE.search(head)
+    if match:
+        return '-'.join(match.groups())
+    match = _MONTH_DATE.search(head)
+    if match:
+        return f"{match.group(2)}-{_MONTHS.index(match.group(1).lower()[:3]) + 1:02d}"
+    match = _YEAR.search(head)
+    if match:
+        return match.group(1)
+    years = Counter(_YEAR.findall('\n'.join(lines)))
+    if years:
+        year, count = years.most_common(1)[0]
+        if count >= 2:
+            return year
+    return None
+
+
+def find_title(lines):
+    """
+    Find the title of a document: a short line near the top that reads like
+    a heading rather than a sentence.
+
+    :return: (title words, strong) or (None, False); ``strong`` if it is title-cased or in capitals
+    """
+    for position, line in enumerate(lines[:TITLE_LINES]):
+        if line.endswith(('.', ',', ';', ':')) or len(line) > 100:
+            continue
+        words = line.split()
+        letters = [word for word in words if _WORD.search(word)]
+        if not 2 <= len(words) <= 12 or len(letters) < 0.6 * len(words):
+            continue
+        significant = [word for word in _WORD.findall(line) if _normalize(word) not in STOPWORDS]
+        if len(significant) < 2:
+            continue
+        capitalized = sum(1 for word in significant if word[0].isupper())
+        strong = position < 3 and capitalized == len(significant)
+        return significant[:MAX_NAME_WORDS], strong
+    return None, False
+
+
+def _split_table(lines):
+    """
+    Reduce a tabular_extractor summary to the text worth scoring: sheet
+    names and column headers without their types. Sample values would
+    drown out the headers.
+
+    :return: (lines to score, named sheets)
+    """
+    text, sheets = [], []
+    for line in lines:
+        match = _TABLE_LINE.match(line)
+        if not match:
+            continue
+        if match.group(2) is not None:
+            if not _DEFAULT_SHEET.match(match.group(2)):
+                sheets.append(match.group(2))
+                text.append(match.group(2))
+        elif match.group(1) == 'Headers':
+            text.extend(_COLUMN_TYPE.sub('', line[match.end():]).split(', '))
+    return text, sheets
+
+
+class LocalSuggestion:
+    def __init__(self, filename, tags, confidence, reasons):
+        self.filename = filename
+        self.tags = tags
+        self.confidence = confidence
+        # Evidence behind the confidence, e.g. ['title', 'date'], for logging
+        self.reasons = reasons
+
+
+class LocalSuggester:
+    """
+    Names and tags files from their extracted text without calling OpenAI.
+
+    Keywords are ranked by TF-IDF: term counts of the document against
+    document frequencies from the content index plus the documents seen in
+    this session. A title line near the top and a date are used when the
+    document has them. Tags prefer the spelling of tags already in the
+    rename log. The confidence reflects how much of this evidence was
+    found; callers ask OpenAI for files below ``threshold``.
+
+    Runs on the CPU in pure Python; sparse term counts keep scoring a
+    document proportional to its length.
+    """
+
+    def __init__(self, file_ops, threshold=None):
+        self.file_ops = file_ops
+        self.threshold = threshold if threshold is not None else float(
+            os.getenv("local_suggestion_threshold", DEFAULT_THRESHOLD))
+        self._lock = threading.Lock()
+        # Document frequencies of this session's documents, which are not indexed until renamed
+        self._session_df = Counter()
+        self._session_documents = 0
+        # Terms each session document contributed, so they are taken back once it is indexed
+        self._session_terms = {}
+        self._vocabulary = None
+        self._compound_tags = []
+        self._vocabulary_loaded_at = 0
+
+    def vocabulary(self):
+        """:return: Dict of tag key to (tag, use count), read from the rename log at most every VOCABULARY_REFRESH seconds"""
+        with self._lock:
+            self._refresh_vocabulary()
+            return self._vocabulary
+
+    def _refresh_vocabulary(self):
+        # Called with the lock held
+        if self._vocabulary is not None and time.monotonic() - self._vocabulary_loaded_at <= VOCABULARY_REFRESH:
+            return
+        vocabulary = {}
+        for tag, count in self.file_ops.get_tag_counts().items():
+            key = _tag_key(tag)
+            if key and count > vocabulary.get(key, (None, 0))[1]:
+                vocabulary[key] = (tag, count)
+        # Tags of several words, most used first, with the keys of their parts; sorted once per refresh.
+        compound = []
+        for tag, count in sorted(vocabulary.values(), key=lambda item: -item[1]):
+            parts = frozenset(_tag_key(part) for part in re.split(r'[_\-\s]+', tag) if part)
+            if len(parts) > 1:
+                compound.append((tag, parts))
+        self._vocabulary = vocabulary
+        self._compound_tags = compound
+        self._vocabulary_loaded_at = time.monotonic()
+
+    def indexed(self, file_path, new_path=None):
+        """
+        Stop counting a session document once it is in the content index
+        (FileOperations.rename_listeners calls this), so its terms are not
+        counted twice.
+        """
+        with self._lock:
+            counted = self._session_terms.pop(file_path, None)
+            if counted is None:
+                return
+            self._session_documents -= 1
+            self._session_df.subtract(counted)
+            for term in counted:
+                if self._session_df[term] <= 0:
+                    del self._session_df[term]
+
+    def _idf(self, counts, file_path=None):
+        """:return: Dict of term to inverse document frequency, counting the current document once"""
+        index = self.file_ops.content_index
+        words = [term for term in counts if ' ' not in term]
+        indexed = index.document_frequencies(words) if index is not None else {}
+        indexed_documents = index.count() if index is not None else 0
+        with self._lock:
+            if file_path is None or file_path not in self._session_terms:
+                self._session_documents += 1
+                self._session_df.update(counts.keys())
+                if file_path is not None:
+                    self._session_terms[file_path] = tuple(counts)
+            documents = indexed_documents + self._session_documents
+            frequencies = {term: indexed.get(term, 0) + self._session_df[term] for term in words}
+            for term in counts:
+                if ' ' in term:
+                    # Phrases are not in the index; there they are at most as common as their rarest word.
+                    first, second = term.split(' ')
+                    frequencies[term] = self._session_df[term] + min(indexed.get(first, 0), indexed.get(second, 0))
+        idf = {term: math.log((documents + 1) / (frequency + 1)) + 1 for term, frequency in frequencies.items()}
+        return idf, documents
+
+    def keywords(self, text, limit=10, file_path=None):
+        """
+        :param file_path: File the text belongs to; it stops counting towards document frequencies once indexed
+        :return: (list of (term, score, count) best first, corpus size)
+        """
+        counts = terms(text)
+        if not counts:
+            return [], 0
+        idf, documents = self._idf(counts, file_path)
+        scores = {term: (1 + math.log(count)) * idf[term] * (1.5 if ' ' in term else 1.0)
+                  for term, count in counts.items()}
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        # A word already covered by a better-ranked phrase adds nothing.
+        selected = []
+        for term, score in ranked:
+            if any(term in chosen.split(' ') or chosen in term.split(' ') for chosen, _, _ in selected):
+                continue
+            selected.append((term, score, counts[term]))
+            if len(selected) >= limit:
+                break
+        return selected, documents
+
+    def suggest(self, file_path, content):
+        """
+        :return: LocalSuggestion; its filename is None if the content gives nothing to name the file after
+        """
+        content = (content or '')[:MAX_CHARS]
+        tabular = bool(_TABLE_LINE.match(content.split('\n', 1)[0]))
+        if tabular:
+            # Every sheet has the same summary lines, which strip_boilerplate would take for page headers.
+            lines = [line.strip() for line in content.splitlines() if line.strip()]
+            table_text, sheets = _split_table(lines)
+            text = '\n'.join(table_text)
+        else:
+            lines = strip_boilerplate(content)
+            text = '\n'.join(lines)
+        keywords, documents = self.keywords(text, file_path=file_path)
+        reasons = []
+        confidence = 0.0
+
+        if tabular:
+            # A named sheet is the table's title; descriptive column names are a weaker one.
+            if sheets:
+                title, strong = _WORD.findall(sheets[0])[:MAX_NAME_WORDS] or None, True
+            else:
+                columns = [word for term, _, _ in keywords[:3] for word in term.split(' ')]
+                title, strong = (columns[:MAX_NAME_WORDS], False) if len(keywords) >= 3 else (None, False)
+        else:
+            title, strong = find_title(lines)
+        if title:
+            confidence += TITLE_CONFIDENCE if strong else WEAK_TITLE_CONFIDENCE
+            reasons.append('title' if strong else 'weak title')
+
+        # Recurring keywords (or column names, which occur once) are evidence once the
+        # corpus is big enough for document frequencies to mean something.
+        frequent = [term for term, _, count in keywords[:5] if tabular or count >= 2]
+        if len(frequent) >= 3:
+            confidence += KEYWORD_CONFIDENCE * min(1.0, documents / CORPUS_SIZE_TRUSTED)
+            reasons.append('keywords')
+
+        # Dates in sample rows describe a record, not the table.
+        date = find_date(sheets if tabular else lines)
+        if date:
+            confidence += DATE_CONFIDENCE
+            reasons.append('date')
+
+        tags, known = self._tags(keywords, date)
+        if known:
+            confidence += VOCABULARY_TAG_CONFIDENCE * min(known, 3)
+            reasons.append('known tags')
+
+        if not tabular and len(_WORD.findall(text)) < MIN_WORDS:
+            confidence /= 2
+            reasons.append('short')
+
+        words = title or [word for term, _, _ in keywords[:3] for word in term.split(' ')][:MAX_NAME_WORDS]
+        if not words:
+            return LocalSuggestion(None, [], 0.0, reasons)
+        name = '-'.join(word[:1].upper() + word[1:] for word in words)
+        if date and date[:4] not in name:
+            name = f"{date}-{name}"
+        return LocalSuggestion(name, tags, round(min(confidence, MAX_CONFIDENCE), 2), reasons)
+
+    def _tags(self, keywords, date):
+        """:return: (tags, number of tags taken from the existing vocabulary)"""
+        with self._lock:
+            self._refresh_vocabulary()
+            vocabulary, compound_tags = self._vocabulary, self._compound_tags
+        known, new = [], []
+        for term, _, _ in keywords:
+            key = _tag_key(term)
+            if key in vocabulary:
+                known.append(vocabulary[key][0])
+            elif key:
+                new.append(term.replace(' ', '_'))
+        # Existing tags made of several keywords, e.g. 'annual_report' from 'annual' and 'report'
+        words = {_tag_key(word) for term, _, _ in keywords for word in term.split(' ')}
+        for tag, parts in compound_tags:
+            if parts <= words and tag not in known:
+                known.append(tag)
+        tags = list(dict.fromkeys(known))[:MAX_TAGS]
+        known_count = len(tags)
+        if date and len(tags) < MAX_TAGS:
+            year = vocabulary.get(date[:4], (date[:4], 0))[0]
+            if year not in tags:
+                tags.append(year)
+        for tag in new:
+            if len(tags) >= max(MIN_TAGS, MAX_TAGS - 1):
+                break
+            if tag not in tags:
+                tags.append(tag)
+        return tags, known_count
@@ -1,14 +1,20 @@
 import sys
 import os
 from PyQt6.QtWidgets import (QApplication, QWidget, QPushButton, QVBoxLayout, QLabel, 
-                             QFileDialog, QMessageBox, QInputDialog, QLineEdit, 
+                             QFileDialog, QMessageBox, QLineEdit, 
                              QListWidget, QHBoxLayout, QDialog, QDialogButtonBox, QTextEdit,
-                             QListWidget, QListWidgetItem)
-from PyQt6.QtCore import Qt, QUrl
+                             QListWidget, QListWidgetItem, QTableView, QAbstractItemView,
+                             QProgressBar, QComboBox)
+from PyQt6.QtCore import Qt, QUrl, QThread, QThreadPool, QTimer, QItemSelection, QItemSelectionModel
 from PyQt6.QtGui import QDesktopServices, QFont
 from file_operations import FileOperations
+from content_index import ContentIndexError
+from tag_query import TagQueryError
 from openai_integration import OpenAIIntegration
+from review_table import (SuggestionTableModel, SuggestionWorker, RenameTask, RetryTask, UndoTask, RecoveryTask,
+                          PENDING, RENAMING, RENAMED, REJECTED, FAILED, DEFERRED, NAME_COLUMN, TAGS_COLUMN)
 from dotenv import load_dotenv
+import telemetry
 
 class TagDialog(QDialog):
     def __init__(self, suggested_tags, file_summary, parent=None):
@@ -85,13 +91,290 @@ class TagDialog(QDialog):
     def get_tags(self):
         return [self.tag_list.item(i).text() for i in range(self.tag_list.count())]
 
+class ReviewWindow(QDialog):
+    def __init__(self, renamer, directory):
+        super().__init__(renamer)
+        self.renamer = renamer
+        self.file_ops = renamer.file_ops
+        self.setWindowTitle(f"Review Suggestions - {directory}")
+        self.resize(1000, 600)
+
+        layout = QVBoxLayout(self)
+
+        self.status_label = QLabel("Scanning files and generating suggestions...")
+        layout.addWidget(self.status_label)
+
+        self.progress_bar = QProgressBar(self)
+        self.progress_bar.setRange(0, 0)  # Busy indicator; the total is unknown while scanning.
+        layout.addWidget(self.progress_bar)
+
+        self.model = SuggestionTableModel(self)
+        self.table = QTableView(self)
+        self.table.setModel(self.model)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        self.table.setEditTriggers(QAbstractItemView.EditTrigger.DoubleClicked |
+                                   QAbstractItemView.EditTrigger.EditKeyPressed)
+        # Fixed row heights keep scrolling cheap with many thousands of rows.
+        self.table.verticalHeader().setDefaultSectionSize(24)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.setColumnWidth(0, 250)
+        self.table.setColumnWidth(NAME_COLUMN, 300)
+        self.table.setColumnWidth(TAGS_COLUMN, 220)
+        layout.addWidget(self.table)
+
+        button_layout = QHBoxLayout()
+        approve_btn = QPushButton("Approve Selected")
+        approve_btn.clicked.connect(self.approve_selected)
+        button_layout.addWidget(approve_btn)
+
+        reject_btn = QPushButton("Reject Selected")
+        reject_btn.clicked.connect(self.reject_selected)
+        button_layout.addWidget(reject_btn)
+
+        edit_tags_btn = QPushButton("Summary and Tags...")
+        edit_tags_btn.clicked.connect(self.edit_tags)
+        button_layout.addWidget(edit_tags_btn)
+
+        approve_all_btn = QPushButton("Approve All Pending")
+        approve_all_btn.clicked.connect(self.approve_all)
+        button_layout.addWidget(approve_all_btn)
+
+        select_group_btn = QPushButton("Select Duplicate Group")
+        select_group_btn.clicked.connect(self.select_group)
+        button_layout.addWidget(select_group_btn)
+
+        reject_duplicates_btn = QPushButton("Reject All Duplicates")
+        reject_duplicates_btn.clicked.connect(self.reject_duplicates)
+        button_layout.addWidget(reject_duplicates_btn)
+
+        self.undo_btn = QPushButton("Undo Last Batch")
+        self.undo_btn.clicked.connect(self.undo_last_batch)
+        self.undo_btn.setEnabled(False)
+        button_layout.addWidget(self.undo_btn)
+
+        self.stop_btn = QPushButton("Stop")
+        self.stop_btn.clicked.connect(self.stop)
+        button_layout.addWidget(self.stop_btn)
+
+        layout.addLayout(button_layout)
+
+        # Suggestions are buffered and inserted a batch at a time so the view is not re-laid out per row.
+        self.incoming = []
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setInterval(200)
+        self.flush_timer.timeout.connect(self.flush_incoming)
+        self.flush_timer.start()
+
+        self.rename_pool = QThreadPool(self)
+        self.rename_pool.setMaxThreadCount(4)
+        self.rename_tasks = set()
+        # Journal batches approved in this window, and the row of each journaled rename.
+        self.batches = []
+        self.batch_rows = {}
+        # Locked files are retried in the background until they can be renamed.
+        self.retry_timer = QTimer(self)
+        self.retry_timer.setInterval(5000)
+        self.retry_timer.timeout.connect(self.retry_deferred)
+        self.retry_timer.start()
+        self.retrying = False
+        self.generating = True
+        self.skipped = 0
+
+        self.worker_thread = QThread(self)
+        self.worker = SuggestionWorker(self.file_ops, renamer.openai_integration, directory)
+        self.worker.moveToThread(self.worker_thread)
+        self.worker_thread.started.connect(self.worker.run)
+        self.worker.suggestion_ready.connect(self.queue_suggestion)
+        self.worker.failed.connect(self.generation_failed)
+        self.worker.finished.connect(self.generation_finished)
+        self.worker.finished.connect(self.worker_thread.quit)
+        self.worker_thread.start()
+
+    def queue_suggestion(self, suggestion):
+        self.incoming.append(suggestion)
+
+    def flush_incoming(self):
+        if self.incoming:
+            batch, self.incoming = self.incoming, []
+            self.model.add_suggestions(batch)
+            self.update_status()
+
+    def update_status(self):
+        state = "Generating suggestions..." if self.generating else "All suggestions generated."
+        self.status_label.setText(
+            f"{state} {self.model.rowCount()} ready, {self.model.count_status(PENDING)} pending, "
+            f"{self.model.count_status(RENAMED)} renamed, {self.model.count_status(DEFERRED)} waiting for locked files, "
+            f"{self.model.count_status(REJECTED)} rejected, "
+            f"{self.model.count_status(FAILED)} failed, {self.skipped} already renamed before, "
+            f"{len(self.model.duplicate_rows())} duplicates."
+        )
+
+    def generation_failed(self, message):
+        QMessageBox.critical(self, "Error", f"An error occurred during the renaming process: {message}")
+
+    def generation_finished(self, skipped):
+        self.skipped = skipped
+        self.generating = False
+        self.flush_incoming()
+        self.progress_bar.setRange(0, 1)
+        self.progress_bar.setValue(1)
+        self.stop_btn.setEnabled(False)
+        self.update_status()
+
+    def selected_rows(self):
+        return sorted({index.row() for index in self.table.selectionModel().selectedRows()})
+
+    def approve_selected(self):
+        self.approve_rows(self.selected_rows())
+
+    def approve_all(self):
+        self.approve_rows(range(self.model.rowCount()))
+
+    def approve_rows(self, row_indexes):
+        rows = []
+        for row_index in row_indexes:
+            row = self.model.rows[row_index]
+            if row.status != PENDING:
+                continue
+            self.model.set_status(row_index, RENAMING)
+            rows.append((row_index, row.file_path, row.new_name, row.tags))
+        if rows:
+            # One task per approval, so the approved files are renamed, fsynced and undone as one batch.
+            self.start_task(RenameTask(self.file_ops, rows))
+        self.update_status()
+
+    def start_task(self, task):
+        task.signals.done.connect(self.rename_done)
+        task.signals.journaled.connect(self.journaled)
+        task.signals.failed.connect(self.task_failed)
+        task.signals.finished.connect(lambda: self.rename_tasks.discard(task))
+        self.rename_tasks.add(task)
+        self.rename_pool.start(task)
+
+    def journaled(self, operation_id, batch_id, row_index):
+        if batch_id not in self.batch_rows:
+            self.batches.append(batch_id)
+            self.batch_rows[batch_id] = {}
+        self.batch_rows[batch_id][operation_id] = row_index
+        self.undo_btn.setEnabled(True)
+
+    def rename_done(self, row_index, status, error):
+        self.model.set_status(row_index, status, error or None)
+        self.update_status()
+
+    def task_failed(self, message):
+        QMessageBox.warning(self, "Warning", message)
+
+    def retry_deferred(self):
+        if self.retrying or not self.model.count_status(DEFERRED):
+            return
+        row_by_operation = {}
+        for rows in self.batch_rows.values():
+            row_by_operation.update(rows)
+        self.retrying = True
+        task = RetryTask(self.file_ops, row_by_operation)
+        task.signals.finished.connect(lambda: setattr(self, 'retrying', False))
+        self.start_task(task)
+
+    def undo_last_batch(self):
+        if not self.batches:
+            return
+        batch_id = self.batches[-1]
+        rows = self.batch_rows[batch_id]
+        answer = QMessageBox.question(self, "Undo Last Batch",
+                                      f"Restore the original names of the {len(rows)} files in the last batch?")
+        if answer != QMessageBox.StandardButton.Yes:
+            return
+        self.batches.pop()
+        del self.batch_rows[batch_id]
+        self.undo_btn.setEnabled(bool(self.batches))
+        for row_index in rows.values():
+            if self.model.rows[row_index].status == DEFERRED:
+                # Undo cancels renames that are still waiting for a locked file.
+                self.model.set_status(row_index, FAILED, "Cancelled by undo")
+        self.start_task(UndoTask(self.file_ops, batch_id, rows))
+
+    def reject_selected(self):
+        self.reject_rows(self.selected_rows())
+
+    def reject_rows(self, row_indexes):
+        for row_index in row_indexes:
+            if self.model.rows[row_index].status == PENDING:
+                self.model.set_status(row_index, REJECTED)
+        self.update_status()
+
+    def select_group(self):
+        """Extend the selection to every copy and revision of the selected files."""
+        rows = self.model.group_rows(self.selected_rows())
+        selection = QItemSelection()
+        last_column = self.model.columnCount() - 1
+        for row_index in rows:
+            selection.select(self.model.index(row_index, 0), self.model.index(row_index, last_column))
+        self.table.selectionModel().select(selection, QItemSelectionModel.SelectionFlag.ClearAndSelect)
+
+    def reject_duplicates(self):
+        """Keep only the first file of each duplicate group."""
+        self.reject_rows(self.model.duplicate_rows())
+
+    def edit_tags(self):
+        rows = self.selected_rows()
+        if len(rows) != 1:
+            QMessageBox.warning(self, "Warning", "Please select a single file.")
+            return
+        row_index = rows[0]
+        row = self.model.rows[row_index]
+        # Built from the row's preview: parsing the file again would block the table.
+        tag_dialog = TagDialog(row.tags, self.renamer.generate_file_summary(row.file_path, row.preview), self)
+        if tag_dialog.exec() == QDialog.DialogCode.Accepted and row.status == PENDING:
+            self.model.set_tags(row_index, tag_dialog.get_tags())
+
+    def stop(self):
+        self.worker.cancel()
+
+    def shutdown(self):
+        self.worker.cancel()
+        self.worker_thread.quit()
+        self.worker_thread.wait(5000)
+        self.retry_timer.stop()
+        self.rename_pool.waitForDone()
+        self.flush_timer.stop()
+
+    def closeEvent(self, event):
+        self.shutdown()
+        super().closeEvent(event)
+
+    def reject(self):
+        # Escape hides the dialog without a closeEvent, so stop the workers here too.
+        self.shutdown()
+        super().reject()
+
 class FileRenamer(QWidget):
     def __init__(self):
         super().__init__()
         self.file_ops = FileOperations()
         self.openai_integration = OpenAIIntegration()
         self.search_results = []
+        self.review_window = None
         self.initUI()
+        self.start_recovery()
+
+    def start_recovery(self):
+        # Renames an earlier session left unfinished are completed in the background, so the
+        # window shows at once; renaming is enabled only afterwards.
+        self.rename_btn.setEnabled(False)
+        self.recovery_pool = QThreadPool(self)
+        self.recovery_task = RecoveryTask(self.file_ops)
+        self.recovery_task.signals.failed.connect(self.recovery_failed)
+        self.recovery_task.signals.finished.connect(self.recovery_finished)
+        self.recovery_pool.start(self.recovery_task)
+
+    def recovery_failed(self, message):
+        QMessageBox.warning(self, "Warning", message)
+
+    def recovery_finished(self):
+        self.recovery_task = None
+        self.rename_btn.setEnabled(True)
 
     def initUI(self):
         self.setWindowTitle('File Renamer and Tag Search')
@@ -134,12 +417,16 @@ class FileRenamer(QWidget):
 
         layout.addSpacing(20)
 
-        search_label = QLabel('Search files by tags:')
+        search_label = QLabel('Search files by tags or content:')
         layout.addWidget(search_label)
 
         search_layout = QHBoxLayout()
+        self.search_mode = QComboBox(self)
+        self.search_mode.addItems(["Tags", "Content"])
+        self.search_mode.currentTextChanged.connect(self.update_search_mode)
+        search_layout.addWidget(self.search_mode)
+
         self.search_input = QLineEdit(self)
-        self.search_input.setPlaceholderText("Enter tags separated by commas")
         search_layout.addWidget(self.search_input)
 
         self.search_btn = QPushButton('Search', self)
@@ -148,6 +435,11 @@ class FileRenamer(QWidget):
 
         layout.addLayout(search_layout)
 
+        self.tag_filter_input = QLineEdit(self)
+        self.tag_filter_input.setPlaceholderText("Optional tag filter, e.g. invoice, 2023 -draft")
+        layout.addWidget(self.tag_filter_input)
+        self.update_search_mode(self.search_mode.currentText())
+
         self.results_list = QListWidget(self)
         self.results_list.itemDoubleClicked.connect(self.open_file)
         layout.addWidget(self.results_list)
@@ -171,88 +463,21 @@ class FileRenamer(QWidget):
     def select_directory(self):
         directory = QFileDialog.getExistingDirectory(self, "Select Directory")
         if directory:
-            try:
-                renamed_count = self.rename_files_based_on_content(directory)
-                QMessageBox.information(self, "Success", f"File renaming process completed. {renamed_count} files renamed.")
-            except Exception as e:
-                QMessageBox.critical(self, "Error", f"An error occurred during the renaming process: {str(e)}")
+            if self.review_window is not None:
+                self.review_window.close()
+            # Suggestions are generated in the background and reviewed in a table as they arrive.
+            self.review_window = ReviewWindow(self, directory)
+            self.review_window.show()
         else:
             QMessageBox.warning(self, "Warning", "No directory selected.")
 
-    def rename_files_based_on_content(self, directory_path):
-        client = self.openai_integration.create_client()
-        assistant = self.openai_integration.create_assistant(client)
-        renamed_count = 0
-        
-        for filename in os.listdir(directory_path):
-            file_path = os.path.join(directory_path, filename)
-            
-            if os.path.isfile(file_path):
-                try:
-                    if not self.file_ops.check_if_renamed(filename):
-                        new_name, tags = self.process_file(file_path, client, assistant)
-                        if new_name and self.rename_with_confirmation(file_path, new_name, tags or []):
-                            renamed_count += 1
-                    else:
-                        print(f"File '{filename}' has already been renamed. Skipping.")
-                except Exception as e:
-                    print(f"Error processing file '{filename}': {str(e)}")
-        
-        return renamed_count
-
-    def process_file(self, file_path, client, assistant):
-        try:
-            content = self.file_ops.detect_file_type_and_extract_content(file_path)
-            new_name, tags = self.openai_integration.generate_name_from_content(file_path, client, assistant, content)
-            if new_name:
-                return self.file_ops.prepare_new_filename(new_name, file_path), tags
-        except Exception as e:
-            print(f"Error processing file '{file_path}': {str(e)}")
-        return None, None
-
-    def rename_with_confirmation(self, file_path, suggested_name, suggested_tags):
-        original_name = os.path.basename(file_path)
-        message = f"Do you want to rename '{original_name}' to '{suggested_name}'?"
-        
-        if suggested_name == original_name:
-            message += " (Note: The suggested name is the same as the original name)"
-        
-        reply = QMessageBox.question(self, 'Confirm Rename', message, 
-                                     QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No, QMessageBox.StandardButton.No)
-        
-        if reply == QMessageBox.StandardButton.Yes:
-            new_name = suggested_name
-        else:
-            custom_name, ok = QInputDialog.getText(self, "Custom Name", "Enter a custom name for the file:", text=suggested_name)
-            if ok and custom_name:
-                new_name = self.file_ops.prepare_new_filename(custom_name, file_path)
-            else:
-                print(f"Renaming cancelled for '{original_name}'")
-                return False
-
-        # Generate file summary
-        file_summary = self.generate_file_summary(file_path)
-
-        # Ask user to confirm or modify tags
-        tag_dialog = TagDialog(suggested_tags, file_summary, self)
-        if tag_dialog.exec() == QDialog.DialogCode.Accepted:
-            tags = tag_dialog.get_tags()
-        else:
-            print(f"Tagging cancelled for '{original_name}'")
-            return False
-
-        # Proceed with renaming and tagging
-        if new_name != original_name:
-            return self.file_ops.rename_with_retry(file_path, new_name, tags)
-        else:
-            print(f"Name unchanged. Logging and applying tags for '{original_name}'")
-            self.file_ops.log_rename(file_path, file_path, tags)
-            self.file_ops.apply_tags(file_path, tags)
-            return True
-
-    def generate_file_summary(self, file_path):
+    def generate_file_summary(self, file_path, content_preview=None):
         try:
-            content = self.file_ops.detect_file_type_and_extract_content(file_path)
+            if content_preview is None:
+                content = self.file_ops.detect_file_type_and_extract_content(file_path)
+                # Truncate the content if it's too long
+                max_content_length = 500
+                content_preview = content[:max_content_length] + "..." if len(content) > max_content_length else content
             # Generate a more structured summary
             file_name = os.path.basename(file_path)
             file_size = os.path.getsize(file_path)
@@ -262,30 +487,43 @@ class FileRenamer(QWidget):
             summary += f"File Type: {file_type}\n"
             summary += f"File Size: {file_size} bytes\n\n"
             summary += "Content Preview:\n"
-            
-            # Truncate the content if it's too long
-            max_content_length = 500
-            content_preview = content[:max_content_length] + "..." if len(content) > max_content_length else content
             summary += content_preview
             
             return summary
         except Exception as e:
             return f"Error generating summary: {str(e)}"
 
+    def update_search_mode(self, mode):
+        if mode == "Content":
+            self.search_input.setPlaceholderText('Words or "phrases" in names, tags and text; -word to exclude')
+        else:
+            self.search_input.setPlaceholderText("Tags separated by commas; use | for OR, -tag to exclude, tag* for prefix")
+        self.tag_filter_input.setVisible(mode == "Content")
+
     def search_files(self):
-        tags = [tag.strip().replace(" ", "_") for tag in self.search_input.text().split(',') if tag.strip()]
-        if not tags:
-            QMessageBox.warning(self, "Warning", "Please enter at least one tag to search.")
+        query = self.search_input.text().strip()
+        content_mode = self.search_mode.currentText() == "Content"
+        if not query:
+            QMessageBox.warning(self, "Warning", "Please enter some words to search for." if content_mode
+                                else "Please enter at least one tag to search.")
             return
 
         try:
-            self.search_results = self.file_ops.search_files_by_tags(tags)
+            if content_mode:
+                self.search_results = self.file_ops.search_content(query, self.tag_filter_input.text())
+            else:
+                self.search_results = self.file_ops.search_files_by_query(query)
             self.results_list.clear()
             if self.search_results:
                 for result in self.search_results:
-                    self.results_list.addItem(f"{result['new_name']} (Tags: {', '.join(result['tags'])})")
+                    if content_mode:
+                        self.results_list.addItem(f"{result['new_name']}: {' '.join(result['snippet'].split())}")
+                    else:
+                        self.results_list.addItem(f"{result['new_name']} (Tags: {', '.join(result['tags'])})")
             else:
                 self.results_list.addItem("No matching files found.")
+        except (ContentIndexError, TagQueryError) as e:
+            QMessageBox.warning(self, "Invalid Search", str(e))
         except Exception as e:
             QMessageBox.critical(self, "Error", f"An error occurred during the search: {str(e)}")
 
@@ -302,17 +540,25 @@ class FileRenamer(QWidget):
 
     def show_available_tags(self):
         try:
-            all_tags = self.file_ops.get_all_tags()
-            if all_tags:
-                tags_str = ", ".join(sorted(all_tags))
+            tag_counts = self.file_ops.get_tag_counts()
+            if tag_counts:
+                tags_str = ", ".join(f"{tag} ({count})" for tag, count in sorted(tag_counts.items()))
                 QMessageBox.information(self, "Available Tags", f"Available tags:\n\n{tags_str}")
             else:
                 QMessageBox.information(self, "Available Tags", "No tags available. Rename some files first.")
         except Exception as e:
             QMessageBox.critical(self, "Error", f"An error occurred while retrieving tags: {str(e)}")
 
+    def closeEvent(self, event):
+        if self.review_window is not None:
+            self.review_window.close()
+        # Let a running recovery finish its journal and log writes.
+        self.recovery_pool.waitForDone()
+        super().closeEvent(event)
+
 def main():
     load_dotenv()
+    telemetry.configure_from_env()
     app = QApplication(sys.argv)
     ex = FileRenamer()
     ex.show()
@@ -1,21 +1,17 @@
 import os
-from openai import OpenAI
-from file_operations import FileOperations
+import json
+import hashlib
+import logging
+import telemetry
+from suggestion_cache import SuggestionCache, make_cache_key
+from request_scheduler import get_scheduler, PRIORITY_INTERACTIVE
+from content_sampler import sample_content, count_tokens
 import re
 import time
 
-class OpenAIIntegration:
-    def __init__(self):
-        self.file_ops = FileOperations()
-
-    def create_client(self):
-        api_key = os.getenv("openai_api_key")
-        return OpenAI(api_key=api_key)
-
-    def create_assistant(self, client):
-        assistant = client.beta.assistants.create(
-            name="File Naming and Tagging Assistant",
-            instructions="""You are an expert file naming and tagging assistant that generates concise, descriptive, and SEO-friendly filenames based on file content and context, as well as relevant tags. Your task is to create:
+ASSISTANT_NAME = "File Naming and Tagging Assistant"
+ASSISTANT_MODEL = "gpt-3.5-turbo-16k"
+ASSISTANT_INSTRUCTIONS = """You are an expert file naming and tagging assistant that generates concise, descriptive, and SEO-friendly filenames based on file content and context, as well as relevant tags. Your task is to create:
 
 1. Filenames that are:
    [existing filename criteria]
@@ -26,52 +22,306 @@ class OpenAIIntegration:
    - Informative: Provide additional context not captured in the filename.
    - Limited: Provide 3-5 tags per file.
 
-Always enclose your suggested filename in quotes and provide a comma-separated list of tags enclosed in square brackets.
+Always enclose your suggested filename in quotes and provide a comma-separated list of tags enclosed in square brackets. Finish with your confidence that the filename accurately describes the file, as a number between 0 and 1 in parentheses.
 
 Example response:
-"2023-Annual-Marketing-Strategy-v2.1" [marketing, strategy, annual-report, 2023]""",
-            model="gpt-3.5-turbo-16k"
+"2023-Annual-Marketing-Strategy-v2.1" [marketing, strategy, annual-report, 2023] (confidence: 0.85)"""
+
+NAMING_PROMPT = 'Generate a concise and descriptive filename for this file based on its content and the original filename, without file extension. Enclose the filename in quotes. Original filename: "{original_filename}" Content: "{content}"'
+
+# Several small files are named in one request; the reply must be a JSON array with one object per file id.
+BATCH_NAMING_PROMPT = 'Generate a concise and descriptive filename (without file extension) and 3-5 tags for each of the following files, based on its content and original filename. Respond only with a JSON array containing one object per file, in the form {{"id": <file id>, "filename": "...", "tags": ["...", "..."], "confidence": <0 to 1>}}. Files: {files}'
+
+# Cached suggestions are only valid for the prompt and instructions that produced them.
+PROMPT_VERSION = hashlib.sha256(
+    f"{ASSISTANT_INSTRUCTIONS}\n{NAMING_PROMPT}\n{BATCH_NAMING_PROMPT}".encode('utf-8')).hexdigest()[:16]
+
+# The assistant id is stored here so later sessions reuse it instead of creating a new one.
+ASSISTANT_CACHE_FILE = 'assistant_id.json'
+
+RUN_TIMEOUT = 120  # seconds
+RUN_POLL_INITIAL = 0.2
+RUN_POLL_MAX = 2.0
+RUN_POLL_BACKOFF = 1.5
+RUN_FAILED_STATUSES = ('failed', 'expired', 'cancelled', 'incomplete', 'requires_action')
+
+logger = logging.getLogger(__name__)
+
+
+class RunFailedError(RuntimeError):
+    pass
+
+
+def parse_suggestion(message):
+    """
+    Extract the filename and tags from the assistant's reply.
+
+    Accepts a JSON object with ``filename`` and ``tags`` keys as well as the
+    quoted-filename / bracketed-tags format the assistant is instructed to use.
+
+    :param message: Assistant reply text
+    :return: (filename, tags) or (None, None)
+    """
+    try:
+        data = json.loads(message)
+        if isinstance(data, dict) and data.get("filename"):
+            return str(data["filename"]), [str(tag).strip() for tag in data.get("tags") or []]
+    except ValueError:
+        pass
+
+    filename_match = re.search(r'"([^"]*)"', message)
+    tags_match = re.search(r'\[(.*?)\]', message)
+    if filename_match and tags_match:
+        filename = filename_match.group(1)
+        tags = [tag.strip() for tag in tags_match.group(1).split(',')]
+        return filename, tags
+    return None, None
+
+
+def parse_confidence(message):
+    """
+    Extract the assistant's self-reported confidence from its reply.
+
+    :param message: Assistant reply text
+    :return: Confidence between 0 and 1, or None if the reply has none
+    """
+    try:
+        data = json.loads(message)
+        if isinstance(data, dict) and data.get("confidence") is not None:
+            return min(max(float(data["confidence"]), 0.0), 1.0)
+    except (ValueError, TypeError):
+        pass
+
+    match = re.search(r'confidence\W*([01](?:\.\d+)?|\.\d+)', message, re.IGNORECASE)
+    if match:
+        return min(max(float(match.group(1)), 0.0), 1.0)
+    return None
+
+
+def parse_batch_suggestions(message, ids):
+    """
+    Extract and validate the per-file suggestions of a batched reply.
+
+    Items with an unknown or repeated id, an empty filename or malformed
+    tags are dropped, so their files can be requested on their own.
+
+    :param message: Assistant reply text, a JSON array (optionally in a code fence)
+    :param ids: File ids that were sent
+    :return: Dict of file id to (filename, tags, confidence)
+    """
+    start, end = message.find('['), message.rfind(']')
+    if start == -1 or end < start:
+        return {}
+    try:
+        items = json.loads(message[start:end + 1])
+    except ValueError:
+        return {}
+    if not isinstance(items, list):
+        return {}
+
+    results = {}
+    repeated = set()
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        file_id = item.get("id")
+        if isinstance(file_id, str) and file_id.isdigit():
+            file_id = int(file_id)
+        if file_id not in ids:
+            continue
+        if file_id in results or file_id in repeated:
+            # Two answers for one file: trust neither
+            repeated.add(file_id)
+            results.pop(file_id, None)
+            continue
+        filename = item.get("filename")
+        tags = item.get("tags") or []
+        if not isinstance(filename, str) or not filename.strip() or not isinstance(tags, list):
+            continue
+        try:
+            confidence = item.get("confidence")
+            confidence = None if confidence is None else min(max(float(confidence), 0.0), 1.0)
+        except (TypeError, ValueError):
+            confidence = None
+        results[file_id] = (filename.strip(), [str(tag).strip() for tag in tags if str(tag).strip()], confidence)
+    return results
+
+
+class OpenAIIntegration:
+    def __init__(self):
+        self.assistant = None
+        self.suggestion_cache = SuggestionCache()
+        # Every API call goes through the shared scheduler for rate limiting and retries.
+        self.scheduler = get_scheduler()
+
+    def create_client(self):
+        # Imported here so the GUI window opens without loading the OpenAI client library.
+        from openai import OpenAI
+        api_key = os.getenv("openai_api_key")
+        # The scheduler is the only retry layer; SDK retries would multiply its attempts and ignore its pauses.
+        return OpenAI(api_key=api_key, max_retries=0)
+
+    def create_assistant(self, client):
+        if self.assistant is not None:
+            return self.assistant
+
+        fingerprint = hashlib.sha256(f"{ASSISTANT_MODEL}\n{ASSISTANT_INSTRUCTIONS}".encode('utf-8')).hexdigest()
+        assistant_id = os.getenv("openai_assistant_id")
+        if not assistant_id and os.path.exists(ASSISTANT_CACHE_FILE):
+            with open(ASSISTANT_CACHE_FILE, 'r') as f:
+                cached = json.load(f)
+            if cached.get("fingerprint") == fingerprint:
+                assistant_id = cached.get("id")
+
+        if assistant_id:
+            try:
+                self.assistant = client.beta.assistants.retrieve(assistant_id)
+                return self.assistant
+            except Exception as e:
+                logger.warning("Could not reuse assistant '%s', creating a new one: %s", assistant_id, e)
+
+        self.assistant = client.beta.assistants.create(
+            name=ASSISTANT_NAME,
+            instructions=ASSISTANT_INSTRUCTIONS,
+            model=ASSISTANT_MODEL
         )
-        return assistant
+        with open(ASSISTANT_CACHE_FILE, 'w') as f:
+            json.dump({"id": self.assistant.id, "fingerprint": fingerprint}, f)
+        return self.assistant
+
+    def wait_for_run(self, client, run, timeout=RUN_TIMEOUT, priority=PRIORITY_INTERACTIVE):
+        """
+        Poll a run until it completes, backing off from RUN_POLL_INITIAL to RUN_POLL_MAX seconds.
+
+        :raises RunFailedError: If the run ends in a failed state
+        :raises TimeoutError: If the run does not finish within ``timeout`` seconds
+        """
+        with telemetry.span('llm.poll') as labels:
+            run = self._poll_run(client, run, timeout, priority)
+            labels["status"] = run.status
+        return run
+
+    def _poll_run(self, client, run, timeout, priority):
+        deadline = time.monotonic() + timeout
+        delay = RUN_POLL_INITIAL
+        while run.status != 'completed':
+            if run.status in RUN_FAILED_STATUSES:
+                error = getattr(run, 'last_error', None)
+                raise RunFailedError(f"Run {run.id} ended with status '{run.status}': {error}")
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                try:
+                    client.beta.threads.runs.cancel(thread_id=run.thread_id, run_id=run.id)
+                except Exception:
+                    pass
+                raise TimeoutError(f"Run {run.id} did not complete within {timeout} seconds")
+            time.sleep(min(delay, remaining))
+            delay = min(delay * RUN_POLL_BACKOFF, RUN_POLL_MAX)
+            run = self.scheduler.call(client.beta.threads.runs.retrieve, thread_id=run.thread_id, run_id=run.id,
+                                      priority=priority)
+            telemetry.increment('llm_polls')
+        return run
+
+    def ask(self, client, assistant, prompt, priority=PRIORITY_INTERACTIVE):
+        """
+        Send ``prompt`` in a new thread and wait for the assistant's reply.
+
+        :return: Reply text
+        """
+        # Creating the thread, posting the message and starting the run is a single request.
+        tokens = count_tokens(ASSISTANT_INSTRUCTIONS, ASSISTANT_MODEL) + count_tokens(prompt, ASSISTANT_MODEL)
+        telemetry.increment('llm_tokens_sent', tokens)
+        with telemetry.span('llm.request', endpoint='create_and_run'):
+            run = self.scheduler.call(
+                client.beta.threads.create_and_run,
+                assistant_id=assistant.id,
+                thread={"messages": [{"role": "user", "content": prompt}]},
+                priority=priority,
+                tokens=tokens
+            )
+        run = self.wait_for_run(client, run, priority=priority)
+        
+        with telemetry.span('llm.request', endpoint='messages'):
+            messages = self.scheduler.call(client.beta.threads.messages.list, thread_id=run.thread_id,
+                                           order='desc', limit=1, priority=priority)
+        return messages.data[0].content[0].text.value
 
-    def generate_name_from_content(self, file_path, client, assistant, content):
+    def generate_name_from_content(self, file_path, client, assistant, content, priority=PRIORITY_INTERACTIVE):
+        filename, tags, _ = self.generate_suggestion(file_path, client, assistant, content, priority)
+        return filename, tags
+
+    def generate_suggestion(self, file_path, client, assistant, content, priority=PRIORITY_INTERACTIVE):
+        """
+        Ask the assistant for a filename, tags and its confidence in the filename.
+
+        ``priority`` orders the request in the shared scheduler; bulk runs pass
+        PRIORITY_BULK so single interactive requests are served first.
+
+        :return: (filename, tags, confidence); (None, None, None) on failure
+        """
         try:
             original_filename = os.path.basename(file_path)
-            thread = client.beta.threads.create()
-            
-            # Truncate content if it's too long
-            max_content_length = 15000  # Reduced from 25000
-            truncated_content = content[:max_content_length] if len(content) > max_content_length else content
             
-            client.beta.threads.messages.create(
-                thread_id=thread.id,
-                role="user",
-                content=f'Generate a concise and descriptive filename for this file based on its content and the original filename, without file extension. Enclose the filename in quotes. Original filename: "{original_filename}" Content: "{truncated_content}"'
-            )
-            
-            run = client.beta.threads.runs.create(
-                thread_id=thread.id,
-                assistant_id=assistant.id
-            )
+            # Boilerplate-free title page, headings and start/middle/end windows within the model's token budget
+            sampled_content = sample_content(content, ASSISTANT_MODEL)
             
-            while run.status != 'completed':
-                time.sleep(1)
-                run = client.beta.threads.runs.retrieve(thread_id=thread.id, run_id=run.id)
+            cache_key = make_cache_key(sampled_content, PROMPT_VERSION, ASSISTANT_MODEL)
+            cached = self.suggestion_cache.get(cache_key)
+            if cached:
+                logger.debug("Using cached suggestion for '%s'", original_filename)
+                return cached
             
-            messages = client.beta.threads.messages.list(thread_id=thread.id)
-            assistant_message = messages.data[0].content[0].text.value
+            prompt = NAMING_PROMPT.format(original_filename=original_filename, content=sampled_content)
+            assistant_message = self.ask(client, assistant, prompt, priority)
             
             # Extract the actual filename and tags from the assistant's response
-            filename_match = re.search(r'"([^"]*)"', assistant_message)
-            tags_match = re.search(r'\[(.*?)\]', assistant_message)
-            
-            if filename_match and tags_match:
-                filename = filename_match.group(1)
-                tags = [tag.strip() for tag in tags_match.group(1).split(',')]
-                return filename, tags
-            else:
-                return None, None
+            filename, tags = parse_suggestion(assistant_message)
+            if not filename:
+                return None, None, None
+            confidence = parse_confidence(assistant_message)
+            self.suggestion_cache.put(cache_key, filename, tags, confidence)
+            return filename, tags, confidence
         
         except Exception as e:
-            print(f"Error generating name and tags: {e}")
-            return None, None
\ No newline at end of file
+            logger.error("Error generating name and tags for '%s': %s", file_path, e)
+            return None, None, None
+
+    def generate_batch_suggestions(self, items, client, assistant, priority=PRIORITY_INTERACTIVE):
+        """
+        Name several files with a single request.
+
+        :param items: List of (file_path, sampled_content); content must already be reduced with ``sample_content``
+        :return: List with (filename, tags, confidence) per item, or None for items whose
+                 suggestion was missing or invalid and must be requested on their own
+        """
+        results = [None] * len(items)
+        pending = {}
+        for index, (file_path, sampled_content) in enumerate(items):
+            cache_key = make_cache_key(sampled_content, PROMPT_VERSION, ASSISTANT_MODEL)
+            cached = self.suggestion_cache.get(cache_key)
+            if cached:
+                logger.debug("Using cached suggestion for '%s'", os.path.basename(file_path))
+                results[index] = cached
+            else:
+                pending[index + 1] = (index, file_path, sampled_content, cache_key)
+        if not pending:
+            return results
+
+        files = json.dumps([{"id": file_id, "original_filename": os.path.basename(file_path), "content": content}
+                            for file_id, (_, file_path, content, _) in pending.items()], ensure_ascii=False)
+        try:
+            assistant_message = self.ask(client, assistant, BATCH_NAMING_PROMPT.format(files=files), priority)
+        except Exception as e:
+            logger.error("Error generating names and tags for a batch of %d files: %s", len(pending), e)
+            return results
+
+        suggestions = parse_batch_suggestions(assistant_message, set(pending))
+        telemetry.increment('llm_batched_files', len(suggestions))
+        if len(suggestions) < len(pending):
+            logger.warning("%d of %d files in a batched reply were missing or invalid",
+                           len(pending) - len(suggestions), len(pending))
+        for file_id, (filename, tags, confidence) in suggestions.items():
+            index, _, _, cache_key = pending[file_id]
+            self.suggestion_cache.put(cache_key, filename, tags, confidence)
+            results[index] = (filename, tags, confidence)
+        return results
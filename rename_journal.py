@@ -0,0 +1,247 @@
+import os
+import json
+import time
+import errno
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+JOURNAL_FILE = 'rename_journal.db'
+# Renames are made durable (one directory fsync pass and one journal commit) this many at a time.
+DEFAULT_CHUNK_SIZE = 200
+DEFAULT_MAX_ATTEMPTS = 5
+# Seconds before a locked file is tried again; doubled after every further attempt.
+DEFAULT_RETRY_DELAY = 2.0
+
+# Operation states
+PLANNED = 'planned'
+RENAMED = 'renamed'      # The file has its new name; tags, log and index are not written yet
+DONE = 'done'
+DEFERRED = 'deferred'    # The file was locked; it is retried later instead of blocking the batch
+FAILED = 'failed'
+SKIPPED = 'skipped'      # Already renamed before; never journaled
+UNDONE = 'undone'
+
+# Windows sharing and lock violations
+_LOCKED_WINERRORS = {32, 33}
+# Windows also reports files opened by another process as access denied; on POSIX
+# EACCES and EPERM are permission problems that retrying does not fix.
+_LOCKED_ERRNO_NAMES = ('EACCES', 'EPERM', 'EBUSY') if os.name == 'nt' else ('EBUSY', 'ETXTBSY')
+_LOCKED_ERRNOS = {getattr(errno, name) for name in _LOCKED_ERRNO_NAMES if hasattr(errno, name)}
+
+
+def is_locked_error(error):
+    """:return: True if a failed rename may succeed later (file in use or locked)"""
+    if getattr(error, 'winerror', None) in _LOCKED_WINERRORS:
+        return True
+    return isinstance(error, OSError) and error.errno in _LOCKED_ERRNOS
+
+
+def unique_path(path, taken=()):
+    """
+    :return: ``path``, or ``name_1.ext``, ``name_2.ext``, ... if it exists or is in ``taken``
+    """
+    base, extension = os.path.splitext(path)
+    candidate = path
+    counter = 1
+    while candidate in taken or os.path.lexists(candidate):
+        candidate = f"{base}_{counter}{extension}"
+        counter += 1
+    return candidate
+
+
+def fsync_directories(paths):
+    """
+    Flush the directory entries of ``paths`` to disk, once per directory.
+    Windows has no directory fsync; NTFS journals metadata itself.
+    """
+    if os.name == 'nt':
+        return
+    for directory in {os.path.dirname(os.path.abspath(path)) for path in paths}:
+        try:
+            fd = os.open(directory, os.O_RDONLY)
+        except OSError:
+            continue
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+
+class RenameOperation:
+    def __init__(self, op_id, batch_id, source, target, tags, state=PLANNED, attempts=0,
+                 next_attempt=None, entry_id=None, error=None):
+        self.id = op_id
+        self.batch_id = batch_id
+        self.source = source
+        self.target = target
+        self.tags = list(tags)
+        self.state = state
+        self.attempts = attempts
+        self.next_attempt = next_attempt
+        self.entry_id = entry_id
+        self.error = error
+
+
+class RenameJournal:
+    """
+    Write-ahead journal of renames.
+
+    Every rename of a batch is recorded as ``planned`` before any file is
+    touched, and its state is advanced (``renamed``, ``done``, ``deferred``,
+    ``failed``, ``undone``) in chunked commits. After a crash the journal
+    shows which renames happened but were never tagged or logged, so they
+    can be completed; finished batches can be undone as a whole.
+
+    Commits use ``synchronous=FULL``, so a state is on disk once it is
+    committed.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS batches (
+            id INTEGER PRIMARY KEY,
+            created_at REAL NOT NULL,
+            undone_at REAL
+        );
+        CREATE TABLE IF NOT EXISTS operations (
+            id INTEGER PRIMARY KEY,
+            batch_id INTEGER NOT NULL,
+            source TEXT NOT NULL,
+            target TEXT NOT NULL,
+            tags TEXT NOT NULL DEFAULT '[]',
+            state TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt REAL,
+            entry_id INTEGER,
+            error TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_operations_batch ON operations(batch_id);
+        CREATE INDEX IF NOT EXISTS idx_operations_state ON operations(state, next_attempt);
+    """
+
+    def __init__(self, path=JOURNAL_FILE):
+        self.path = path
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=FULL")
+        self.conn.executescript(self.SCHEMA)
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self.conn.execute("BEGIN")
+            try:
+                yield
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            else:
+                self.conn.execute("COMMIT")
+
+    def new_batch(self):
+        with self._lock:
+            return self.conn.execute("INSERT INTO batches (created_at) VALUES (?)", (time.time(),)).lastrowid
+
+    def plan(self, renames, batch_id=None):
+        """
+        Record renames in one commit.
+
+        :param renames: Iterable of (source, target, tags)
+        :param batch_id: Existing batch to add to; default: a new batch
+        :return: (batch id, list of RenameOperation)
+        """
+        with self._transaction():
+            if batch_id is None:
+                batch_id = self.conn.execute("INSERT INTO batches (created_at) VALUES (?)",
+                                             (time.time(),)).lastrowid
+            operations = []
+            for source, target, tags in renames:
+                op_id = self.conn.execute(
+                    "INSERT INTO operations (batch_id, source, target, tags, state) VALUES (?, ?, ?, ?, ?)",
+                    (batch_id, source, target, json.dumps(list(tags)), PLANNED)
+                ).lastrowid
+                operations.append(RenameOperation(op_id, batch_id, source, target, tags))
+        return batch_id, operations
+
+    def update(self, operations):
+        """Write the current state of ``operations`` in one commit."""
+        operations = [op for op in operations if op.id is not None]
+        if not operations:
+            return
+        with self._transaction():
+            self.conn.executemany(
+                "UPDATE operations SET target = ?, state = ?, attempts = ?, next_attempt = ?, entry_id = ?, error = ? "
+                "WHERE id = ?",
+                [(op.target, op.state, op.attempts, op.next_attempt, op.entry_id, op.error, op.id)
+                 for op in operations]
+            )
+
+    def operations(self, batch_id=None, states=None, due_before=None):
+        query = "SELECT * FROM operations WHERE 1 = 1"
+        params = []
+        if batch_id is not None:
+            query += " AND batch_id = ?"
+            params.append(batch_id)
+        if states:
+            query += f" AND state IN ({','.join('?' * len(states))})"
+            params.extend(states)
+        if due_before is not None:
+            query += " AND next_attempt <= ?"
+            params.append(due_before)
+        with self._lock:
+            rows = self.conn.execute(query + " ORDER BY id", params).fetchall()
+        return [self._to_operation(row) for row in rows]
+
+    def unfinished(self):
+        """:return: Operations a crash left planned or renamed-but-not-logged"""
+        return self.operations(states=(PLANNED, RENAMED))
+
+    def due_deferred(self, now=None):
+        return self.operations(states=(DEFERRED,), due_before=time.time() if now is None else now)
+
+    def next_deferred_at(self):
+        """:return: Time of the next deferred retry, or None if nothing is deferred"""
+        with self._lock:
+            row = self.conn.execute("SELECT MIN(next_attempt) FROM operations WHERE state = ?",
+                                    (DEFERRED,)).fetchone()
+        return row[0]
+
+    def last_batch(self):
+        """:return: Id of the latest batch that has renames to undo, or None"""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT MAX(batch_id) FROM operations WHERE state IN (?, ?)", (DONE, RENAMED)
+            ).fetchone()
+        return row[0]
+
+    def batches(self, limit=20):
+        """:return: Latest batches as dicts with id, created_at, undone_at and per-state counts"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT * FROM batches ORDER BY id DESC LIMIT ?", (limit,)
+            ).fetchall()
+            batches = []
+            for row in rows:
+                counts = dict(self.conn.execute(
+                    "SELECT state, COUNT(*) FROM operations WHERE batch_id = ? GROUP BY state", (row["id"],)
+                ).fetchall())
+                batches.append({"id": row["id"], "created_at": row["created_at"],
+                                "undone_at": row["undone_at"], "counts": counts})
+        return batches
+
+    def mark_undone(self, batch_id):
+        with self._transaction():
+            self.conn.execute("UPDATE batches SET undone_at = ? WHERE id = ?", (time.time(), batch_id))
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    @staticmethod
+    def _to_operation(row):
+        return RenameOperation(row["id"], row["batch_id"], row["source"], row["target"], json.loads(row["tags"]),
+                               row["state"], row["attempts"], row["next_attempt"], row["entry_id"], row["error"])
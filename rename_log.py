@@ -0,0 +1,547 @@
+import os
+import re
+import json
+import bisect
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+
+def normalize_tag(tag):
+    """
+    Normalize a tag for indexing and lookups (sanitized, lowercase).
+
+    :param tag: Raw tag text
+    :return: Normalized tag
+    """
+    return re.sub(r'[^a-zA-Z0-9_]', '_', tag).strip('_').lower()
+
+
+class RenameLogBackend:
+    """
+    Storage interface for the rename log.
+
+    Entries are dictionaries with the keys ``original_name``, ``new_name``,
+    ``full_path`` and ``tags``, matching the layout of the legacy
+    ``renamed_files.json`` file.
+
+    Backends also keep an inverted tag index: every entry has an integer id
+    and each normalized tag maps to the ascending list of ids carrying it.
+    """
+
+    def add(self, entry):
+        """:return: Id of the new entry"""
+        return self.add_many([entry])[0]
+
+    def add_many(self, entries):
+        """:return: Ids of the new entries"""
+        raise NotImplementedError
+
+    def remove_many(self, ids):
+        """Remove entries, e.g. when their renames are undone."""
+        raise NotImplementedError
+
+    def update_tags(self, entry_id, tags):
+        """Replace the tags of an entry, e.g. after they were edited on disk."""
+        raise NotImplementedError
+
+    def was_renamed(self, filename):
+        raise NotImplementedError
+
+    def find_by_path(self, full_path):
+        raise NotImplementedError
+
+    def find_id_by_path(self, full_path):
+        """:return: Id of the latest entry for ``full_path``, or None"""
+        raise NotImplementedError
+
+    def entries(self):
+        raise NotImplementedError
+
+    def count(self):
+        raise NotImplementedError
+
+    def postings(self, tag):
+        raise NotImplementedError
+
+    def prefix_postings(self, prefix):
+        raise NotImplementedError
+
+    def all_ids(self):
+        raise NotImplementedError
+
+    def entries_by_ids(self, ids):
+        raise NotImplementedError
+
+    def tag_counts(self):
+        raise NotImplementedError
+
+    @contextmanager
+    def batch(self):
+        yield self
+
+    def close(self):
+        pass
+
+
+class JsonRenameLog(RenameLogBackend):
+    """
+    Legacy JSON backend. The file is parsed once and kept in memory together
+    with name and path indexes; it is rewritten when a batch completes.
+
+    Removed entries leave a gap in memory so the ids of later entries stay
+    valid for the rest of the session; the gaps are not written to the file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._batch_depth = 0
+        self._dirty = False
+        self._entries = []
+        self._names = set()
+        self._paths = {}
+        self._postings = {}
+        self._sorted_tags = []
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                for entry in json.load(f):
+                    self._index(entry)
+
+    def _index(self, entry):
+        entry_id = len(self._entries)
+        self._entries.append(entry)
+        self._names.add(entry["original_name"])
+        self._names.add(entry["new_name"])
+        self._paths[entry["full_path"]] = entry_id
+        for tag in {normalize_tag(t) for t in entry["tags"]}:
+            if not tag:
+                continue
+            if tag not in self._postings:
+                self._postings[tag] = []
+                bisect.insort(self._sorted_tags, tag)
+            self._postings[tag].append(entry_id)
+        return entry_id
+
+    def add_many(self, entries):
+        with self._lock, self.batch():
+            ids = [self._index(dict(entry)) for entry in entries]
+            self._dirty = True
+        return ids
+
+    def remove_many(self, ids):
+        with self._lock, self.batch():
+            for entry_id in ids:
+                entry = self._entries[entry_id]
+                if entry is None:
+                    continue
+                self._entries[entry_id] = None
+                if self._paths.get(entry["full_path"]) == entry_id:
+                    del self._paths[entry["full_path"]]
+                for tag in {normalize_tag(t) for t in entry["tags"]}:
+                    postings = self._postings.get(tag)
+                    if postings and entry_id in postings:
+                        postings.remove(entry_id)
+                        if not postings:
+                            del self._postings[tag]
+                            self._sorted_tags.remove(tag)
+                self._dirty = True
+            self._names = set()
+            for entry in self.entries():
+                self._names.add(entry["original_name"])
+                self._names.add(entry["new_name"])
+
+    def update_tags(self, entry_id, tags):
+        with self._lock, self.batch():
+            entry = self._entries[entry_id]
+            for tag in {normalize_tag(t) for t in entry["tags"]}:
+                postings = self._postings.get(tag)
+                if postings and entry_id in postings:
+                    postings.remove(entry_id)
+                    if not postings:
+                        del self._postings[tag]
+                        self._sorted_tags.remove(tag)
+            entry["tags"] = list(tags)
+            for tag in {normalize_tag(t) for t in tags}:
+                if not tag:
+                    continue
+                if tag not in self._postings:
+                    self._postings[tag] = []
+                    bisect.insort(self._sorted_tags, tag)
+                bisect.insort(self._postings[tag], entry_id)
+            self._dirty = True
+
+    def was_renamed(self, filename):
+        return filename in self._names
+
+    def find_by_path(self, full_path):
+        entry_id = self._paths.get(full_path)
+        return None if entry_id is None else self._entries[entry_id]
+
+    def find_id_by_path(self, full_path):
+        return self._paths.get(full_path)
+
+    def entries(self):
+        return [entry for entry in self._entries if entry is not None]
+
+    def count(self):
+        return len(self.entries())
+
+    def postings(self, tag):
+        return list(self._postings.get(tag, ()))
+
+    def prefix_postings(self, prefix):
+        start = bisect.bisect_left(self._sorted_tags, prefix)
+        ids = set()
+        for tag in self._sorted_tags[start:]:
+            if not tag.startswith(prefix):
+                break
+            ids.update(self._postings[tag])
+        return sorted(ids)
+
+    def all_ids(self):
+        return [entry_id for entry_id, entry in enumerate(self._entries) if entry is not None]
+
+    def entries_by_ids(self, ids):
+        return [self._entries[i] for i in ids]
+
+    def tag_counts(self):
+        return {tag: len(ids) for tag, ids in self._postings.items()}
+
+    @contextmanager
+    def batch(self):
+        # The lock is not held while the caller's block runs, so other threads
+        # can keep reading the log during a long batch.
+        with self._lock:
+            self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                if self._batch_depth == 0 and self._dirty:
+                    self._flush()
+
+    def _flush(self):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.entries(), f, indent=2)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+
+class SQLiteRenameLog(RenameLogBackend):
+    """
+    SQLite backend with indexes on original name, new name and full path.
+    Writes inside ``batch()`` are committed in a single transaction.
+
+    Tag postings live in a ``(tag, entry_id)`` clustered table, so each
+    posting list is a sorted range scan; per-tag counts are maintained on
+    insert for the "Show Available Tags" view.
+    """
+
+    SCHEMA_VERSION = 2
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS renames (
+            id INTEGER PRIMARY KEY,
+            original_name TEXT NOT NULL,
+            new_name TEXT NOT NULL,
+            full_path TEXT NOT NULL,
+            tags TEXT NOT NULL DEFAULT '[]'
+        );
+        CREATE INDEX IF NOT EXISTS idx_renames_original_name ON renames(original_name);
+        CREATE INDEX IF NOT EXISTS idx_renames_new_name ON renames(new_name);
+        CREATE INDEX IF NOT EXISTS idx_renames_full_path ON renames(full_path);
+        CREATE TABLE IF NOT EXISTS imported_sources (
+            path TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            entries INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS entry_tags (
+            tag TEXT NOT NULL,
+            entry_id INTEGER NOT NULL,
+            PRIMARY KEY (tag, entry_id)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS tag_counts (
+            tag TEXT PRIMARY KEY,
+            count INTEGER NOT NULL
+        ) WITHOUT ROWID;
+    """
+
+    def __init__(self, path):
+        self.path = path
+        # _lock serializes statements; _write_lock is always taken first and held for whole batches.
+        self._lock = threading.RLock()
+        self._write_lock = threading.RLock()
+        self._batch_depth = 0
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # Entries are committed alongside the journal's DONE states, so they are made as durable.
+        self.conn.execute("PRAGMA synchronous=FULL")
+        self.conn.executescript(self.SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version >= self.SCHEMA_VERSION:
+            return
+        with self.batch():
+            if version < 2:
+                # Logs written before the tag index existed need their postings backfilled.
+                self.conn.execute("DELETE FROM entry_tags")
+                self.conn.execute("DELETE FROM tag_counts")
+                rows = self.conn.execute("SELECT id, tags FROM renames").fetchall()
+                self._index_tags((row["id"], json.loads(row["tags"])) for row in rows)
+            self.conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+
+    def _index_tags(self, id_tags):
+        postings = []
+        counts = {}
+        for entry_id, tags in id_tags:
+            for tag in {normalize_tag(t) for t in tags}:
+                if tag:
+                    postings.append((tag, entry_id))
+                    counts[tag] = counts.get(tag, 0) + 1
+        self.conn.executemany("INSERT OR IGNORE INTO entry_tags (tag, entry_id) VALUES (?, ?)", postings)
+        self.conn.executemany("INSERT OR IGNORE INTO tag_counts (tag, count) VALUES (?, 0)",
+                              [(tag,) for tag in counts])
+        self.conn.executemany("UPDATE tag_counts SET count = count + ? WHERE tag = ?",
+                              [(n, tag) for tag, n in counts.items()])
+
+    def _unindex_tags(self, id_tags):
+        postings = []
+        counts = {}
+        for entry_id, tags in id_tags:
+            for tag in {normalize_tag(t) for t in tags}:
+                if tag:
+                    postings.append((tag, entry_id))
+                    counts[tag] = counts.get(tag, 0) + 1
+        self.conn.executemany("DELETE FROM entry_tags WHERE tag = ? AND entry_id = ?", postings)
+        self.conn.executemany("UPDATE tag_counts SET count = count - ? WHERE tag = ?",
+                              [(n, tag) for tag, n in counts.items()])
+
+    @contextmanager
+    def batch(self):
+        # The connection is shared: the write lock is held until the batch ends, so
+        # other threads' writes cannot join its transaction and be rolled back with
+        # it, while reads only wait for the statement in progress.
+        with self._write_lock:
+            with self._lock:
+                if self._batch_depth == 0:
+                    self.conn.execute("BEGIN")
+                self._batch_depth += 1
+            try:
+                yield self
+            except BaseException:
+                with self._lock:
+                    self._batch_depth -= 1
+                    if self._batch_depth == 0:
+                        self.conn.execute("ROLLBACK")
+                raise
+            else:
+                with self._lock:
+                    self._batch_depth -= 1
+                    if self._batch_depth == 0:
+                        self.conn.execute("COMMIT")
+
+    def add_many(self, entries):
+        with self.batch(), self._lock:
+            id_tags = []
+            for e in entries:
+                tags = list(e.get("tags", []))
+                cursor = self.conn.execute(
+                    "INSERT INTO renames (original_name, new_name, full_path, tags) VALUES (?, ?, ?, ?)",
+                    (e["original_name"], e["new_name"], e["full_path"], json.dumps(tags))
+                )
+                id_tags.append((cursor.lastrowid, tags))
+            self._index_tags(id_tags)
+        return [entry_id for entry_id, _ in id_tags]
+
+    def remove_many(self, ids):
+        ids = list(ids)
+        with self.batch(), self._lock:
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                placeholders = ','.join('?' * len(chunk))
+                rows = self.conn.execute(
+                    f"SELECT id, tags FROM renames WHERE id IN ({placeholders})", chunk
+                ).fetchall()
+                self._unindex_tags((row["id"], json.loads(row["tags"])) for row in rows)
+                self.conn.execute(f"DELETE FROM renames WHERE id IN ({placeholders})", chunk)
+
+    def update_tags(self, entry_id, tags):
+        with self.batch(), self._lock:
+            row = self.conn.execute("SELECT tags FROM renames WHERE id = ?", (entry_id,)).fetchone()
+            if row is None:
+                return
+            self._unindex_tags([(entry_id, json.loads(row["tags"]))])
+            self.conn.execute("UPDATE renames SET tags = ? WHERE id = ?", (json.dumps(list(tags)), entry_id))
+            self._index_tags([(entry_id, tags)])
+
+    def was_renamed(self, filename):
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT 1 FROM renames WHERE original_name = ? "
+                "UNION ALL SELECT 1 FROM renames WHERE new_name = ? LIMIT 1",
+                (filename, filename)
+            ).fetchone()
+        return row is not None
+
+    def find_by_path(self, full_path):
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT * FROM renames WHERE full_path = ? ORDER BY id DESC LIMIT 1", (full_path,)
+            ).fetchone()
+        return self._to_entry(row) if row else None
+
+    def find_id_by_path(self, full_path):
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT id FROM renames WHERE full_path = ? ORDER BY id DESC LIMIT 1", (full_path,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def entries(self):
+        with self._lock:
+            rows = self.conn.execute("SELECT * FROM renames ORDER BY id").fetchall()
+        return [self._to_entry(row) for row in rows]
+
+    def count(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM renames").fetchone()[0]
+
+    def postings(self, tag):
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT entry_id FROM entry_tags WHERE tag = ? ORDER BY entry_id", (tag,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def prefix_postings(self, prefix):
+        if not prefix:
+            return self.all_ids()
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT DISTINCT entry_id FROM entry_tags WHERE tag >= ? AND tag < ? ORDER BY entry_id",
+                (prefix, prefix + '\uffff')
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def all_ids(self):
+        with self._lock:
+            rows = self.conn.execute("SELECT id FROM renames ORDER BY id").fetchall()
+        return [row[0] for row in rows]
+
+    def entries_by_ids(self, ids):
+        entries = []
+        ids = list(ids)
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit.
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                placeholders = ','.join('?' * len(chunk))
+                rows = self.conn.execute(
+                    f"SELECT * FROM renames WHERE id IN ({placeholders}) ORDER BY id", chunk
+                ).fetchall()
+                entries.extend(self._to_entry(row) for row in rows)
+        return entries
+
+    def tag_counts(self):
+        with self._lock:
+            rows = self.conn.execute("SELECT tag, count FROM tag_counts WHERE count > 0").fetchall()
+        return {row["tag"]: row["count"] for row in rows}
+
+    def import_json(self, json_path):
+        """
+        Import a legacy ``renamed_files.json`` log.
+
+        The source is remembered by size, modification time and entry count:
+        calling this again for an unchanged file is a no-op, and a file that
+        grew (the legacy app appends) only has its new entries imported. A
+        file that shrank was rewritten, so it is read again from the start,
+        skipping entries that are already in the log.
+
+        :param json_path: Path to the JSON log
+        :return: Number of entries imported
+        """
+        if not os.path.exists(json_path):
+            return 0
+        source = os.path.abspath(json_path)
+        st = os.stat(json_path)
+        with self._write_lock, self._lock:
+            row = self.conn.execute(
+                "SELECT size, mtime_ns, entries FROM imported_sources WHERE path = ?", (source,)
+            ).fetchone()
+            if row and row["size"] == st.st_size and row["mtime_ns"] == st.st_mtime_ns:
+                return 0
+            with open(json_path, 'r') as f:
+                log_data = json.load(f)
+            if row is None:
+                new_entries = log_data
+            elif len(log_data) >= row["entries"]:
+                new_entries = log_data[row["entries"]:]
+            else:
+                logged = {(r["original_name"], r["new_name"], r["full_path"]) for r in self.conn.execute(
+                    "SELECT original_name, new_name, full_path FROM renames")}
+                new_entries = [e for e in log_data
+                               if (e["original_name"], e["new_name"], e["full_path"]) not in logged]
+            with self.batch():
+                self.add_many(new_entries)
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO imported_sources (path, size, mtime_ns, entries) VALUES (?, ?, ?, ?)",
+                    (source, st.st_size, st.st_mtime_ns, len(log_data))
+                )
+        return len(new_entries)
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    @staticmethod
+    def _to_entry(row):
+        return {
+            "original_name": row["original_name"],
+            "new_name": row["new_name"],
+            "full_path": row["full_path"],
+            "tags": json.loads(row["tags"]),
+        }
+
+
+def open_rename_log(path):
+    """
+    Open the rename log backend matching the file extension of ``path``.
+
+    :param path: ``.json`` for the legacy backend, anything else for SQLite
+    :return: A RenameLogBackend instance
+    """
+    if path.lower().endswith('.json'):
+        return JsonRenameLog(path)
+    return SQLiteRenameLog(path)
+
+
+def import_json_log(json_path, db_path):
+    """
+    One-shot import of an existing JSON rename log into a SQLite log.
+
+    :param json_path: Path to the legacy JSON log
+    :param db_path: Path to the SQLite log
+    :return: Number of entries imported
+    """
+    log = SQLiteRenameLog(db_path)
+    try:
+        return log.import_json(json_path)
+    finally:
+        log.close()
+
+
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) != 3:
+        print("Usage: python rename_log.py <renamed_files.json> <renamed_files.db>")
+        sys.exit(1)
+    count = import_json_log(sys.argv[1], sys.argv[2])
+    print(f"Imported {count} entries from '{sys.argv[1]}' into '{sys.argv[2]}'")
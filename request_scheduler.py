@@ -0,0 +1,213 @@
+import os
+import time
+import heapq
+import random
+import logging
+import itertools
+import threading
+import telemetry
+from concurrent.futures import Future
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 10
+
+DEFAULT_RPM = 500
+DEFAULT_TPM = 150000
+DEFAULT_CONCURRENCY = 8
+DEFAULT_MAX_RETRIES = 5
+BACKOFF_BASE = 1.0  # seconds
+BACKOFF_MAX = 60.0
+
+RETRYABLE_STATUS_CODES = (408, 409, 429, 500, 502, 503, 504)
+RETRYABLE_ERRORS = ('RateLimitError', 'APIConnectionError', 'APITimeoutError', 'InternalServerError')
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at ``rate_per_minute``.
+    """
+
+    def __init__(self, rate_per_minute):
+        self.capacity = float(rate_per_minute)
+        self.rate = rate_per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount):
+        """
+        Take ``amount`` tokens, going into debt if necessary.
+
+        :return: Seconds the caller must wait before using the tokens
+        """
+        # Requests larger than the bucket would never fit, so cap them at the capacity.
+        amount = min(float(amount), self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+def retry_after(error):
+    """
+    Read the server's requested delay from an API error, if it has one.
+
+    :return: Seconds to wait, or None
+    """
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    try:
+        if headers.get('retry-after-ms'):
+            return float(headers['retry-after-ms']) / 1000.0
+        if headers.get('retry-after'):
+            return float(headers['retry-after'])
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+def is_retryable(error):
+    status = getattr(error, 'status_code', None)
+    if status is None:
+        status = getattr(getattr(error, 'response', None), 'status_code', None)
+    if status in RETRYABLE_STATUS_CODES:
+        return True
+    return type(error).__name__ in RETRYABLE_ERRORS or isinstance(error, (ConnectionError, TimeoutError))
+
+
+class RequestScheduler:
+    """
+    Shared scheduler for OpenAI requests.
+
+    Requests are dispatched by priority (interactive before bulk), limited
+    by request-per-minute and token-per-minute buckets and a concurrency cap,
+    and retried on 429/5xx/connection errors with jittered exponential
+    backoff. A 429 with Retry-After pauses every worker, not only the one
+    that hit it.
+    """
+
+    def __init__(self, rpm=None, tpm=None, max_concurrency=None, max_retries=None):
+        self.requests = TokenBucket(rpm or int(os.getenv("openai_rpm", DEFAULT_RPM)))
+        self.tokens = TokenBucket(tpm or int(os.getenv("openai_tpm", DEFAULT_TPM)))
+        self.max_concurrency = max_concurrency or int(os.getenv("openai_max_concurrency", DEFAULT_CONCURRENCY))
+        self.max_retries = max_retries if max_retries is not None else \
+            int(os.getenv("openai_max_retries", DEFAULT_MAX_RETRIES))
+        self._queue = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._paused_until = 0.0
+        self._workers = []
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "submitted": 0, "completed": 0, "failed": 0, "retries": 0,
+            "rate_limited": 0, "throttle_seconds": 0.0, "in_flight": 0,
+        }
+
+    def submit(self, fn, *args, priority=PRIORITY_INTERACTIVE, tokens=0, **kwargs):
+        """
+        Schedule ``fn(*args, **kwargs)``.
+
+        :param priority: Lower values run first (PRIORITY_INTERACTIVE, PRIORITY_BULK)
+        :param tokens: Estimated tokens the request consumes, for the TPM limit
+        :return: concurrent.futures.Future with the call's result
+        """
+        future = Future()
+        with self._condition:
+            self._start_workers()
+            heapq.heappush(self._queue, (priority, next(self._sequence), fn, args, kwargs, tokens, future))
+            self._condition.notify()
+        self._count("submitted")
+        return future
+
+    def call(self, fn, *args, priority=PRIORITY_INTERACTIVE, tokens=0, **kwargs):
+        """Run ``fn`` through the scheduler and wait for its result."""
+        return self.submit(fn, *args, priority=priority, tokens=tokens, **kwargs).result()
+
+    def metrics(self):
+        with self._condition:
+            depth = len(self._queue)
+            paused_for = max(0.0, self._paused_until - time.monotonic())
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["queue_depth"] = depth
+        stats["paused_seconds_remaining"] = paused_for
+        return stats
+
+    def _count(self, name, amount=1):
+        with self._stats_lock:
+            self._stats[name] += amount
+
+    def _start_workers(self):
+        while len(self._workers) < self.max_concurrency:
+            worker = threading.Thread(target=self._work, name=f"openai-{len(self._workers)}", daemon=True)
+            self._workers.append(worker)
+            worker.start()
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while not self._queue:
+                    self._condition.wait()
+                _, _, fn, args, kwargs, tokens, future = heapq.heappop(self._queue)
+            if not future.set_running_or_notify_cancel():
+                continue
+            self._count("in_flight")
+            try:
+                future.set_result(self._run(fn, args, kwargs, tokens))
+                self._count("completed")
+            except BaseException as e:
+                future.set_exception(e)
+                self._count("failed")
+            finally:
+                self._count("in_flight", -1)
+
+    def _run(self, fn, args, kwargs, tokens):
+        attempt = 0
+        while True:
+            self._throttle(tokens)
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                delay = retry_after(e)
+                if delay is None:
+                    delay = min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)) * random.uniform(0.5, 1.0)
+                if getattr(e, 'status_code', None) == 429 or type(e).__name__ == 'RateLimitError':
+                    self._count("rate_limited")
+                    telemetry.increment('llm_rate_limited')
+                    with self._condition:
+                        self._paused_until = max(self._paused_until, time.monotonic() + delay)
+                attempt += 1
+                self._count("retries")
+                telemetry.increment('llm_retries')
+                logger.warning("OpenAI request failed (%s); retry %d/%d in %.1fs", e, attempt, self.max_retries, delay)
+                time.sleep(delay)
+
+    def _throttle(self, tokens):
+        with self._condition:
+            pause = self._paused_until - time.monotonic()
+        wait = max(pause, self.requests.reserve(1), self.tokens.reserve(tokens) if tokens else 0.0)
+        if wait > 0:
+            self._count("throttle_seconds", wait)
+            telemetry.observe('llm.throttle', wait)
+            time.sleep(wait)
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """
+    Return the process-wide scheduler, creating it on first use.
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RequestScheduler()
+        return _scheduler
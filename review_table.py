@@ -0,0 +1,288 @@
+import os
+import time
+import telemetry
+import rename_journal
+from PyQt6.QtCore import Qt, QObject, QRunnable, QAbstractTableModel, QModelIndex, pyqtSignal
+from suggestion_pipeline import SuggestionPipeline
+from directory_scanner import scan_directory, scan_options_from_env
+
+PENDING = 'Pending'
+RENAMING = 'Renaming'
+RENAMED = 'Renamed'
+REJECTED = 'Rejected'
+FAILED = 'Failed'
+ERROR = 'Error'
+DEFERRED = 'Deferred'
+
+COLUMNS = ('Original Name', 'Suggested Name', 'Tags', 'Confidence', 'Status', 'Duplicate Of')
+NAME_COLUMN = 1
+TAGS_COLUMN = 2
+STATUS_COLUMN = 4
+DUPLICATE_COLUMN = 5
+# Characters of extracted text kept per row for the tag dialog's summary.
+PREVIEW_CHARS = 500
+
+
+class ReviewRow:
+    def __init__(self, suggestion):
+        self.file_path = suggestion.file_path
+        self.original_name = os.path.basename(suggestion.file_path)
+        self.new_name = suggestion.new_name or ''
+        self.tags = list(suggestion.tags)
+        content = suggestion.content or ''
+        self.preview = content[:PREVIEW_CHARS] + "..." if len(content) > PREVIEW_CHARS else content
+        self.confidence = suggestion.confidence
+        self.status = PENDING if suggestion.new_name else ERROR
+        self.error = suggestion.error
+        self.duplicate_of = suggestion.duplicate_of
+        self.duplicate_kind = suggestion.duplicate_kind
+        # Rows of a duplicate group share the original's path as their group.
+        self.group = suggestion.duplicate_of or suggestion.file_path
+        self.added_at = time.monotonic()
+
+
+class SuggestionTableModel(QAbstractTableModel):
+    """
+    Table of pending suggestions. Names and tags are editable in place; rows
+    are appended in batches as suggestions arrive.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.rows = []
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return COLUMNS[section]
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self.rows[index.row()]
+        column = index.column()
+        if role in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.EditRole):
+            if column == 0:
+                return row.original_name
+            if column == NAME_COLUMN:
+                return row.new_name
+            if column == TAGS_COLUMN:
+                return ', '.join(row.tags)
+            if column == 3:
+                return '' if row.confidence is None else f"{row.confidence:.2f}"
+            if column == STATUS_COLUMN:
+                return row.status
+            if column == DUPLICATE_COLUMN and row.duplicate_of:
+                return f"{os.path.basename(row.duplicate_of)} ({row.duplicate_kind})"
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return row.error if row.error else row.file_path
+        return None
+
+    def flags(self, index):
+        flags = super().flags(index)
+        if index.isValid() and index.column() in (NAME_COLUMN, TAGS_COLUMN) \
+                and self.rows[index.row()].status == PENDING:
+            flags |= Qt.ItemFlag.ItemIsEditable
+        return flags
+
+    def setData(self, index, value, role=Qt.ItemDataRole.EditRole):
+        if not index.isValid() or role != Qt.ItemDataRole.EditRole:
+            return False
+        row = self.rows[index.row()]
+        if index.column() == NAME_COLUMN:
+            value = value.strip()
+            if not value:
+                return False
+            row.new_name = value
+        elif index.column() == TAGS_COLUMN:
+            row.tags = [tag.strip() for tag in value.split(',') if tag.strip()]
+        else:
+            return False
+        self.dataChanged.emit(index, index)
+        return True
+
+    def add_suggestions(self, suggestions):
+        if not suggestions:
+            return
+        first = len(self.rows)
+        self.beginInsertRows(QModelIndex(), first, first + len(suggestions) - 1)
+        self.rows.extend(ReviewRow(suggestion) for suggestion in suggestions)
+        self.endInsertRows()
+
+    def set_status(self, row_index, status, error=None):
+        row = self.rows[row_index]
+        if row.status == PENDING and status != PENDING:
+            # Time from the suggestion appearing to the reviewer's decision.
+            telemetry.observe('review.wait', time.monotonic() - row.added_at, decision=status)
+        row.status = status
+        row.error = error
+        self.dataChanged.emit(self.index(row_index, 0), self.index(row_index, len(COLUMNS) - 1))
+
+    def set_tags(self, row_index, tags):
+        self.rows[row_index].tags = list(tags)
+        index = self.index(row_index, TAGS_COLUMN)
+        self.dataChanged.emit(index, index)
+
+    def count_status(self, status):
+        return sum(1 for row in self.rows if row.status == status)
+
+    def group_rows(self, row_indexes):
+        """:return: Indexes of every row in the same duplicate groups as ``row_indexes``"""
+        groups = {self.rows[row_index].group for row_index in row_indexes}
+        return [row_index for row_index, row in enumerate(self.rows) if row.group in groups]
+
+    def duplicate_rows(self):
+        return [row_index for row_index, row in enumerate(self.rows) if row.duplicate_of]
+
+
+class SuggestionWorker(QObject):
+    """
+    Runs the suggestion pipeline for a directory off the GUI thread.
+    Meant to be moved to a QThread; ``run`` is connected to ``QThread.started``.
+    """
+
+    suggestion_ready = pyqtSignal(object)
+    failed = pyqtSignal(str)
+    finished = pyqtSignal(int)
+
+    def __init__(self, file_ops, openai_integration, directory):
+        super().__init__()
+        self.file_ops = file_ops
+        self.openai_integration = openai_integration
+        self.directory = directory
+        self.pipeline = None
+        self.cancelled = False
+
+    def run(self):
+        skipped = 0
+        try:
+            client = self.openai_integration.create_client()
+            assistant = self.openai_integration.create_assistant(client)
+            if self.cancelled:
+                return
+            file_paths = scan_directory(self.directory, **scan_options_from_env())
+            self.pipeline = SuggestionPipeline(self.file_ops, self.openai_integration, client, assistant)
+            for suggestion in self.pipeline.start(file_paths):
+                if suggestion.skipped:
+                    skipped += 1
+                    continue
+                self.suggestion_ready.emit(suggestion)
+        except Exception as e:
+            self.failed.emit(str(e))
+        finally:
+            self.finished.emit(skipped)
+
+    def cancel(self):
+        self.cancelled = True
+        if self.pipeline:
+            self.pipeline.cancel()
+
+
+class RenameSignals(QObject):
+    done = pyqtSignal(int, str, str)
+    # Operation id, journal batch id and row index of every journaled rename
+    journaled = pyqtSignal(int, int, int)
+    failed = pyqtSignal(str)
+    finished = pyqtSignal()
+
+
+def _row_status(op):
+    if op.state == rename_journal.DONE:
+        return RENAMED, ''
+    if op.state == rename_journal.DEFERRED:
+        return DEFERRED, f"Locked, retrying: {op.error}"
+    if op.state == rename_journal.SKIPPED:
+        return FAILED, "Already renamed before"
+    return FAILED, op.error or "Rename failed"
+
+
+class RenameTask(QRunnable):
+    """Applies approved renames as one journaled batch on a QThreadPool thread."""
+
+    def __init__(self, file_ops, rows):
+        """:param rows: List of (row index, file path, new name, tags)"""
+        super().__init__()
+        self.signals = RenameSignals()
+        self.file_ops = file_ops
+        self.rows = rows
+
+    def run(self):
+        try:
+            # Rows do not keep the extracted text; apply_renames looks it up in the extraction cache.
+            operations = self.file_ops.apply_renames([
+                (file_path, self.file_ops.prepare_new_filename(new_name, file_path), tags)
+                for _, file_path, new_name, tags in self.rows
+            ])
+            for (row_index, *_), op in zip(self.rows, operations):
+                if op.id is not None:
+                    self.signals.journaled.emit(op.id, op.batch_id, row_index)
+                self.signals.done.emit(row_index, *_row_status(op))
+        except Exception as e:
+            for row_index, *_ in self.rows:
+                self.signals.done.emit(row_index, FAILED, str(e))
+        finally:
+            self.signals.finished.emit()
+
+
+class RetryTask(QRunnable):
+    """Retries deferred renames that are due and reports the rows of ``row_by_operation``."""
+
+    def __init__(self, file_ops, row_by_operation):
+        super().__init__()
+        self.signals = RenameSignals()
+        self.file_ops = file_ops
+        self.row_by_operation = dict(row_by_operation)
+
+    def run(self):
+        try:
+            for op in self.file_ops.retry_deferred():
+                if op.id in self.row_by_operation:
+                    self.signals.done.emit(self.row_by_operation[op.id], *_row_status(op))
+        except Exception as e:
+            self.signals.failed.emit(f"Retrying locked files failed: {e}")
+        finally:
+            self.signals.finished.emit()
+
+
+class RecoveryTask(QRunnable):
+    """Completes the renames an earlier session left unfinished (see FileOperations.recover_renames)."""
+
+    def __init__(self, file_ops):
+        super().__init__()
+        self.signals = RenameSignals()
+        self.file_ops = file_ops
+
+    def run(self):
+        try:
+            self.file_ops.recover_renames()
+        except Exception as e:
+            self.signals.failed.emit(f"Completing interrupted renames failed: {e}")
+        finally:
+            self.signals.finished.emit()
+
+
+class UndoTask(QRunnable):
+    """Undoes a journal batch; rows whose original names are restored become pending again."""
+
+    def __init__(self, file_ops, batch_id, row_by_operation):
+        super().__init__()
+        self.signals = RenameSignals()
+        self.file_ops = file_ops
+        self.batch_id = batch_id
+        self.row_by_operation = dict(row_by_operation)
+
+    def run(self):
+        try:
+            for op in self.file_ops.undo_batch(self.batch_id):
+                if op.id in self.row_by_operation:
+                    self.signals.done.emit(self.row_by_operation[op.id], PENDING, '')
+        except Exception as e:
+            self.signals.failed.emit(f"Undo failed: {e}")
+        finally:
+            self.signals.finished.emit()
@@ -0,0 +1,113 @@
+import os
+import logging
+import threading
+import telemetry
+from concurrent.futures import Future
+from content_sampler import sample_content, count_tokens
+from openai_integration import ASSISTANT_MODEL
+from request_scheduler import PRIORITY_INTERACTIVE
+
+# Prompt tokens of file content per batched request; 0 turns batching off.
+DEFAULT_BATCH_TOKENS = 3000
+# Files whose sampled content is larger than this are always named on their own.
+DEFAULT_FILE_TOKENS = 300
+DEFAULT_BATCH_FILES = 20
+# Seconds a partial batch waits for more files before it is sent.
+DEFAULT_BATCH_WAIT = 0.5
+
+logger = logging.getLogger(__name__)
+
+
+class SuggestionBatcher:
+    """
+    Collects small files from concurrent workers and names them in one request.
+
+    ``suggest`` blocks until the file's batch is answered. A batch is sent
+    when the next file would exceed ``max_tokens`` of content, when it holds
+    ``max_files`` files, or ``wait`` seconds after its first file arrived.
+    Files that are too large, or whose part of the reply is missing or
+    invalid, are handed back to the caller to be requested on their own.
+    """
+
+    def __init__(self, openai_integration, client, assistant, priority=PRIORITY_INTERACTIVE,
+                 max_tokens=None, file_tokens=None, max_files=None, wait=None):
+        self.openai_integration = openai_integration
+        self.client = client
+        self.assistant = assistant
+        self.priority = priority
+        self.max_tokens = max_tokens if max_tokens is not None else int(
+            os.getenv("suggestion_batch_tokens", DEFAULT_BATCH_TOKENS))
+        self.file_tokens = min(file_tokens or int(os.getenv("suggestion_batch_file_tokens", DEFAULT_FILE_TOKENS)),
+                               self.max_tokens)
+        self.max_files = max_files or int(os.getenv("suggestion_batch_files", DEFAULT_BATCH_FILES))
+        self.wait = wait if wait is not None else float(os.getenv("suggestion_batch_wait", DEFAULT_BATCH_WAIT))
+        self._lock = threading.Lock()
+        self._pending = []
+        self._pending_tokens = 0
+        self._generation = 0
+        self._closed = False
+
+    @property
+    def enabled(self):
+        return self.max_tokens > 0 and self.max_files > 1
+
+    def suggest(self, file_path, content):
+        """
+        :return: (filename, tags, confidence), or None if the file must be requested on its own
+        """
+        sampled_content = sample_content(content, ASSISTANT_MODEL)
+        tokens = count_tokens(sampled_content, ASSISTANT_MODEL)
+        if tokens > self.file_tokens:
+            return None
+        future = Future()
+        with self._lock:
+            if self._closed:
+                return None
+            if self._pending and self._pending_tokens + tokens > self.max_tokens:
+                self._send_pending()
+            self._pending.append((file_path, sampled_content, future))
+            self._pending_tokens += tokens
+            if len(self._pending) >= self.max_files:
+                self._send_pending()
+            elif len(self._pending) == 1:
+                timer = threading.Timer(self.wait, self._send_due, args=(self._generation,))
+                timer.daemon = True
+                timer.start()
+        return future.result()
+
+    def close(self):
+        """Give up on waiting batches; their files get no suggestion."""
+        with self._lock:
+            self._closed = True
+            pending, self._pending = self._pending, []
+            self._generation += 1
+        for _, _, future in pending:
+            future.set_result((None, None, None))
+
+    def _send_due(self, generation):
+        with self._lock:
+            if generation == self._generation and self._pending:
+                self._send_pending()
+
+    def _send_pending(self):
+        # Called with the lock held; the request itself runs on its own thread.
+        items, self._pending, self._pending_tokens = self._pending, [], 0
+        self._generation += 1
+        threading.Thread(target=self._send, args=(items,), name="suggest-batch", daemon=True).start()
+
+    def _send(self, items):
+        try:
+            if len(items) == 1:
+                # A single file gains nothing from the batch format.
+                results = [None]
+            else:
+                telemetry.increment('llm_batches')
+                with telemetry.span('llm.batch'):
+                    results = self.openai_integration.generate_batch_suggestions(
+                        [(file_path, sampled_content) for file_path, sampled_content, _ in items],
+                        self.client, self.assistant, self.priority)
+        except Exception as e:
+            logger.error("Error naming a batch of %d files: %s", len(items), e)
+            results = [None] * len(items)
+        for (_, _, future), result in zip(items, results):
+            future.set_result(result)
@@ -0,0 +1,152 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import telemetry
+
+CACHE_FILE = 'suggestion_cache.db'
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_TTL = 30 * 24 * 3600  # seconds
+
+
+def make_cache_key(content, prompt_version, model):
+    """
+    Build the cache key for a naming request.
+
+    :param content: The (truncated) content that is sent to the model
+    :param prompt_version: Identifier of the prompt and instructions in use
+    :param model: Model name
+    :return: Hex digest identifying the request
+    """
+    digest = hashlib.sha256()
+    digest.update(model.encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(prompt_version.encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(content.encode('utf-8', 'surrogatepass'))
+    return digest.hexdigest()
+
+
+class SuggestionCache:
+    """
+    Persistent cache of AI filename/tag suggestions keyed by content hash.
+
+    Entries expire after ``ttl`` seconds and the least recently used entries
+    are evicted once more than ``max_entries`` are stored.
+    """
+
+    def __init__(self, path=CACHE_FILE, max_entries=None, ttl=None):
+        self.path = path
+        self.max_entries = max_entries or int(os.getenv("suggestion_cache_size", DEFAULT_MAX_ENTRIES))
+        self.ttl = ttl if ttl is not None else float(os.getenv("suggestion_cache_ttl", DEFAULT_TTL))
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS suggestions (
+                key TEXT PRIMARY KEY,
+                filename TEXT NOT NULL,
+                tags TEXT NOT NULL,
+                confidence REAL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_suggestions_last_used ON suggestions(last_used);
+        """)
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(suggestions)")]
+        if 'confidence' not in columns:
+            self.conn.execute("ALTER TABLE suggestions ADD COLUMN confidence REAL")
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT filename, tags, confidence, created_at FROM suggestions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                telemetry.increment('cache_lookups', cache='suggestion', result='miss')
+                return None
+            filename, tags, confidence, created_at = row
+            if self.ttl and now - created_at > self.ttl:
+                self.conn.execute("DELETE FROM suggestions WHERE key = ?", (key,))
+                self.misses += 1
+                telemetry.increment('cache_lookups', cache='suggestion', result='expired')
+                return None
+            self.conn.execute("UPDATE suggestions SET last_used = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        telemetry.increment('cache_lookups', cache='suggestion', result='hit')
+        return filename, json.loads(tags), confidence
+
+    def put(self, key, filename, tags, confidence=None):
+        now = time.time()
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO suggestions (key, filename, tags, confidence, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, filename, json.dumps(list(tags or [])), confidence, now, now)
+            )
+            self._evict()
+
+    def _evict(self):
+        count = self.conn.execute("SELECT COUNT(*) FROM suggestions").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self.conn.execute(
+                "DELETE FROM suggestions WHERE key IN "
+                "(SELECT key FROM suggestions ORDER BY last_used LIMIT ?)", (excess,)
+            )
+
+    def invalidate(self, key=None):
+        """
+        Remove one cached suggestion, or every suggestion when ``key`` is None.
+
+        :return: Number of removed entries
+        """
+        with self._lock:
+            if key is None:
+                cursor = self.conn.execute("DELETE FROM suggestions")
+            else:
+                cursor = self.conn.execute("DELETE FROM suggestions WHERE key = ?", (key,))
+        return cursor.rowcount
+
+    def purge_expired(self):
+        if not self.ttl:
+            return 0
+        with self._lock:
+            cursor = self.conn.execute("DELETE FROM suggestions WHERE created_at < ?", (time.time() - self.ttl,))
+        return cursor.rowcount
+
+    def stats(self):
+        with self._lock:
+            size = self.conn.execute("SELECT COUNT(*) FROM suggestions").fetchone()[0]
+        return {"entries": size, "max_entries": self.max_entries, "hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Manage the AI suggestion cache.")
+    parser.add_argument('--path', default=CACHE_FILE, help="Cache database path")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--clear', action='store_true', help="Remove every cached suggestion")
+    group.add_argument('--purge-expired', action='store_true', help="Remove suggestions older than the TTL")
+    group.add_argument('--stats', action='store_true', help="Show the number of cached suggestions")
+    args = parser.parse_args()
+
+    cache = SuggestionCache(args.path)
+    if args.clear:
+        print(f"Removed {cache.invalidate()} cached suggestions")
+    elif args.purge_expired:
+        print(f"Removed {cache.purge_expired()} expired suggestions")
+    else:
+        print(cache.stats())
+    cache.close()
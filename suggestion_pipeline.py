@@ -0,0 +1,267 @@
+import os
+import time
+import queue
+import logging
+import threading
+import telemetry
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dedup import DuplicateDetector, DEFAULT_MAX_FILES
+from request_scheduler import PRIORITY_INTERACTIVE
+from suggestion_batcher import SuggestionBatcher
+from local_suggester import LocalSuggester
+
+DEFAULT_WORKERS = 4
+DEFAULT_PREFETCH = 8
+
+_DONE = object()
+
+logger = logging.getLogger(__name__)
+
+
+class Suggestion:
+    """
+    A ready-to-review rename suggestion produced by the pipeline.
+
+    ``new_name`` is None when the file was skipped or failed; ``error`` then
+    holds the reason. Suggestions for duplicates are derived from their
+    original's; ``duplicate_of`` is then the original's path and
+    ``duplicate_kind`` 'exact' or 'near'.
+    """
+
+    def __init__(self, file_path, new_name=None, tags=None, content=None, error=None, skipped=False,
+                 confidence=None, duplicate_of=None, duplicate_kind=None, similarity=None):
+        self.file_path = file_path
+        self.new_name = new_name
+        self.tags = tags or []
+        self.confidence = confidence
+        self.content = content
+        self.error = error
+        self.skipped = skipped
+        self.duplicate_of = duplicate_of
+        self.duplicate_kind = duplicate_kind
+        self.similarity = similarity
+        self.ready_at = time.monotonic()
+
+
+class SuggestionPipeline:
+    """
+    Producer/consumer pipeline that extracts content and asks OpenAI for names
+    ahead of the reviewer.
+
+    A feeder thread submits files to a bounded thread pool. At most
+    ``prefetch`` suggestions are in flight or waiting for review at any time,
+    so a slow reviewer never causes unbounded API spending. Iterating over the
+    pipeline yields suggestions in completion order.
+
+    Unless ``dedup`` (or ``dedup_enabled`` in .env) is off, exact copies are
+    recognised before extraction and near-duplicates after it; both reuse
+    the first file's suggestion instead of sending another request.
+
+    Unless ``batch`` is off (or ``suggestion_batch_tokens`` is 0), files with
+    little content are named several at a time in one request; the pool then
+    has extra workers to wait for the batches.
+
+    If ``local`` (or ``local_suggestions_enabled`` in .env) is on, each file
+    is first named by the offline LocalSuggester; only files below its
+    confidence threshold are sent to OpenAI. Its confidence is a heuristic
+    score, not comparable to the assistant's, so the mode is opt-in.
+    """
+
+    def __init__(self, file_ops, openai_integration, client, assistant,
+                 max_workers=None, prefetch=None, priority=PRIORITY_INTERACTIVE, dedup=None, batch=True,
+                 local=None):
+        self.file_ops = file_ops
+        self.priority = priority
+        self.openai_integration = openai_integration
+        self.client = client
+        self.assistant = assistant
+        self.max_workers = max_workers or int(os.getenv("suggestion_workers", DEFAULT_WORKERS))
+        self.batcher = SuggestionBatcher(openai_integration, client, assistant, priority) if batch else None
+        if self.batcher is not None and not self.batcher.enabled:
+            self.batcher = None
+        self.prefetch = prefetch or int(os.getenv("suggestion_prefetch", DEFAULT_PREFETCH))
+        if self.prefetch < self.max_workers:
+            # Only prefetch files are ever in flight, so further workers would stay idle.
+            logger.warning("suggestion_prefetch (%d) is below suggestion_workers (%d); using %d workers",
+                           self.prefetch, self.max_workers, self.prefetch)
+            self.max_workers = self.prefetch
+        # Workers waiting for a batch do not extract or request anything meanwhile.
+        self._pool_size = self.max_workers + (self.batcher.max_files if self.batcher else 0)
+        if dedup is None:
+            dedup = os.getenv("dedup_enabled", "true").lower() not in ("0", "false", "no")
+        self.detector = DuplicateDetector() if dedup else None
+        if self.detector:
+            # Originals renamed while the run goes on can still be hashed for later duplicates.
+            file_ops.rename_listeners.append(self.detector.moved)
+        # Files whose suggestions are kept for later duplicates; older ones are forgotten, as in the detector.
+        self.max_remembered = self.detector.max_files if self.detector else DEFAULT_MAX_FILES
+        if local is None:
+            local = os.getenv("local_suggestions_enabled", "false").lower() not in ("0", "false", "no")
+        self.local_suggester = LocalSuggester(file_ops) if local else None
+        if self.local_suggester:
+            # Renamed files are in the content index from then on; their session counts are dropped.
+            file_ops.rename_listeners.append(self.local_suggester.indexed)
+        # (new_name, tags, confidence) of files in progress or done, so duplicates can wait for their original's.
+        self._results = OrderedDict()
+        self._group_sizes = {}
+        self._results_lock = threading.Lock()
+        self._ready = queue.Queue()
+        self._slots = threading.Semaphore(self.prefetch)
+        self._cancelled = threading.Event()
+        self._executor = None
+        self._feeder = None
+
+    def start(self, file_paths):
+        self._executor = ThreadPoolExecutor(max_workers=self._pool_size, thread_name_prefix="suggest")
+        self._feeder = threading.Thread(target=self._feed, args=(file_paths,), daemon=True)
+        self._feeder.start()
+        return self
+
+    def cancel(self):
+        self._cancelled.set()
+        if self.detector and self.detector.moved in self.file_ops.rename_listeners:
+            self.file_ops.rename_listeners.remove(self.detector.moved)
+        if self.local_suggester and self.local_suggester.indexed in self.file_ops.rename_listeners:
+            self.file_ops.rename_listeners.remove(self.local_suggester.indexed)
+        if self.batcher:
+            self.batcher.close()
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self._ready.put(_DONE)
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def __iter__(self):
+        while True:
+            item = self._ready.get()
+            if item is _DONE or self._cancelled.is_set():
+                return
+            self._slots.release()
+            telemetry.observe('pipeline.wait', time.monotonic() - item.ready_at)
+            yield item
+
+    def _feed(self, file_paths):
+        # Only unfinished work is tracked, so a long-running watch does not accumulate futures.
+        pending = set()
+        try:
+            for file_path in file_paths:
+                while not self._slots.acquire(timeout=0.1):
+                    if self._cancelled.is_set():
+                        return
+                if self._cancelled.is_set():
+                    return
+                future = self._executor.submit(self._run, file_path)
+                pending.add(future)
+                future.add_done_callback(pending.discard)
+            for future in list(pending):
+                if self._cancelled.is_set():
+                    return
+                future.exception()
+        except RuntimeError:
+            # The executor was shut down by cancel() while submitting.
+            return
+        finally:
+            self._ready.put(_DONE)
+
+    def _run(self, file_path):
+        if self._cancelled.is_set():
+            return
+        try:
+            suggestion = self.suggest(file_path)
+        except Exception as e:
+            # Every submitted file must yield a suggestion, or its slot is never released.
+            logger.error("Error processing file '%s': %s", file_path, e)
+            suggestion = Suggestion(file_path, error=str(e))
+        self._ready.put(suggestion)
+
+    def suggest(self, file_path):
+        with telemetry.span('suggest') as labels:
+            suggestion = self._suggest(file_path)
+            labels["outcome"] = 'skipped' if suggestion.skipped else 'error' if suggestion.error else 'ok'
+        return suggestion
+
+    def _suggest(self, file_path):
+        filename = os.path.basename(file_path)
+        if self.file_ops.check_if_renamed(filename):
+            return Suggestion(file_path, skipped=True, error="already renamed")
+        # Registered before the duplicate checks, so any later duplicate finds it.
+        done = Future()
+        with self._results_lock:
+            self._results[file_path] = done
+            while len(self._results) > self.max_remembered:
+                forgotten, _ = self._results.popitem(last=False)
+                self._group_sizes.pop(forgotten, None)
+        suggestion = None
+        try:
+            suggestion = self._suggest_new(file_path)
+            return suggestion
+        finally:
+            # Only what duplicates need is kept; the content leaves with the yielded Suggestion.
+            done.set_result((suggestion.new_name, suggestion.tags, suggestion.confidence)
+                            if suggestion is not None and suggestion.new_name else None)
+
+    def _suggest_new(self, file_path):
+        try:
+            match = self.detector.check_exact(file_path) if self.detector else None
+            if match:
+                derived = self._from_original(file_path, match)
+                if derived:
+                    return derived
+            content = self.file_ops.detect_file_type_and_extract_content(file_path)
+            if self.detector and not match:
+                match = self.detector.check_near(file_path, content)
+                if match:
+                    derived = self._from_original(file_path, match, content)
+                    if derived:
+                        return derived
+            new_name, tags, confidence = self._generate(file_path, content)
+            if not new_name:
+                return Suggestion(file_path, content=content, error="no suggestion returned")
+            return Suggestion(file_path, self.file_ops.prepare_new_filename(new_name, file_path),
+                              tags, content, confidence=confidence)
+        except Exception as e:
+            logger.error("Error processing file '%s': %s", file_path, e)
+            return Suggestion(file_path, error=str(e))
+
+    def _generate(self, file_path, content):
+        if self.local_suggester:
+            local = self.local_suggester.suggest(file_path, content)
+            if local.filename and local.confidence >= self.local_suggester.threshold:
+                telemetry.increment('local_suggestions', outcome='accepted')
+                logger.debug("Named '%s' locally (confidence %.2f: %s)", os.path.basename(file_path),
+                             local.confidence, ', '.join(local.reasons))
+                return local.filename, local.tags, local.confidence
+            telemetry.increment('local_suggestions', outcome='escalated')
+        if self.batcher:
+            result = self.batcher.suggest(file_path, content)
+            if result is not None:
+                return result
+        return self.openai_integration.generate_suggestion(
+            file_path, self.client, self.assistant, content, self.priority)
+
+    def _from_original(self, file_path, match, content=None):
+        """
+        Derive a suggestion from the original of a duplicate group, numbering
+        copies so they do not collide with the original's new name.
+
+        :return: Suggestion, or None if the original has no usable suggestion
+        """
+        with self._results_lock:
+            done = self._results.get(match.original)
+        # The original was registered by a worker that started earlier, so this wait always ends.
+        original = done.result() if done else None
+        if original is None:
+            return None
+        new_name, tags, confidence = original
+        with self._results_lock:
+            number = self._group_sizes[match.original] = self._group_sizes.get(match.original, 1) + 1
+        base, _ = os.path.splitext(new_name)
+        telemetry.increment('duplicates', kind=match.kind)
+        logger.info("'%s' is a duplicate (%s) of '%s'", os.path.basename(file_path), match.kind,
+                    os.path.basename(match.original))
+        return Suggestion(file_path, self.file_ops.prepare_new_filename(f"{base}_{number}", file_path),
+                          tags, content, confidence=confidence, duplicate_of=match.original,
+                          duplicate_kind=match.kind, similarity=match.similarity)
@@ -0,0 +1,221 @@
+import io
+import os
+import re
+import csv
+import codecs
+import numbers
+import datetime
+
+# Leading bytes of a CSV file used to detect its encoding and dialect and to estimate its row count.
+SNIFF_BYTES = 64 * 1024
+# Rows read after the header to infer column types; only the first SAMPLE_ROWS are shown.
+INFERENCE_ROWS = 20
+SAMPLE_ROWS = 3
+MAX_CELL_CHARS = 40
+CSV_DELIMITERS = ',;\t|'
+
+# Column types, most specific first
+EMPTY = 'empty'
+BOOLEAN = 'boolean'
+INTEGER = 'integer'
+NUMBER = 'number'
+DATE = 'date'
+TEXT = 'text'
+
+_BOOLEANS = {'true', 'false', 'yes', 'no'}
+_INTEGER = re.compile(r'^[+-]?\d+$')
+_NUMBER = re.compile(r'^[+-]?[$€£]?(\d{1,3}(,\d{3})+|\d*)(\.\d+)?%?$')
+_DATE = re.compile(r'^(\d{4}[-/.]\d{1,2}[-/.]\d{1,2}|\d{1,2}[-/.]\d{1,2}[-/.]\d{2,4})([ T]\d{1,2}:\d{2}(:\d{2})?)?$')
+
+
+class Table:
+    """Header, sample rows and inferred column types of a sheet or CSV file."""
+
+    def __init__(self, name, headers, rows, row_count=None, exact=True, details=None):
+        self.name = name
+        self.headers = headers
+        # Cells right of the last header are formatting leftovers
+        self.rows = [list(row[:len(headers)]) for row in rows] if headers else rows
+        # Data rows below the header; an estimate unless ``exact``, None if unknown
+        self.row_count = row_count
+        self.exact = exact
+        self.details = details or {}
+        self.types = infer_column_types(len(headers), self.rows)
+
+    def describe(self, sample_rows=SAMPLE_ROWS):
+        """:return: Text summary with the column names and types, the row count and sample rows"""
+        columns = ', '.join(f"{header} ({column_type})" for header, column_type in zip(self.headers, self.types))
+        lines = [f"Headers: {columns}"]
+        if self.row_count is not None:
+            count = f"{self.row_count:,}" if self.exact else f"~{self.row_count:,}"
+            details = ''.join(f", {key} {value}" for key, value in self.details.items())
+            lines.append(f"Rows: {count}{details}")
+        sample = [', '.join(_cell(value) for value in row) for row in self.rows[:sample_rows]]
+        if sample:
+            lines.append(f"Sample data: {' | '.join(sample)}")
+        return '\n'.join(lines)
+
+
+def _cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime.datetime) and value.time() == datetime.time():
+        value = value.date()
+    text = str(value).strip()
+    return text if len(text) <= MAX_CELL_CHARS else text[:MAX_CELL_CHARS] + '...'
+
+
+def value_type(value):
+    """:return: Type of a single cell, or None if it is empty"""
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return BOOLEAN
+    if isinstance(value, numbers.Integral):
+        return INTEGER
+    if isinstance(value, numbers.Real):
+        # NaN marks an empty cell in pandas
+        if value != value:
+            return None
+        return INTEGER if float(value).is_integer() else NUMBER
+    if isinstance(value, (datetime.date, datetime.time)):
+        return DATE
+    text = str(value).strip()
+    if not text:
+        return None
+    if text.lower() in _BOOLEANS:
+        return BOOLEAN
+    if _INTEGER.match(text):
+        return INTEGER
+    if any(char.isdigit() for char in text) and _NUMBER.match(text):
+        return NUMBER
+    if _DATE.match(text):
+        return DATE
+    return TEXT
+
+
+def infer_column_types(column_count, rows):
+    """
+    Infer a type per column from sample rows. A column is ``integer``,
+    ``number``, ``date`` or ``boolean`` only if every non-empty sample
+    value is; columns mixing integers and decimals are ``number``.
+
+    :return: List of type names, one per column
+    """
+    types = []
+    for column in range(column_count):
+        found = {value_type(row[column]) for row in rows if column < len(row)} - {None}
+        if not found:
+            types.append(EMPTY)
+        elif len(found) == 1:
+            types.append(found.pop())
+        elif found == {INTEGER, NUMBER}:
+            types.append(NUMBER)
+        else:
+            types.append(TEXT)
+    return types
+
+
+def _headers(first_row):
+    headers = [_cell(value) for value in first_row]
+    # Drop trailing empty header cells (formatted but unused columns)
+    while headers and not headers[-1]:
+        headers.pop()
+    return [header or f"column {i}" for i, header in enumerate(headers, 1)]
+
+
+def _sniff_dialect(sample):
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=CSV_DELIMITERS)
+    except csv.Error:
+        # Single-column files and other ambiguous samples
+        return csv.excel
+
+
+def read_csv_table(file_path, detect_encoding):
+    """
+    Read the header and sample rows of a CSV file from a bounded prefix.
+
+    The encoding and dialect (delimiter, quoting) are detected on the first
+    ``SNIFF_BYTES`` bytes. Files that fit in the prefix are counted exactly;
+    for larger files the row count is extrapolated from the prefix, so the
+    cost does not grow with the file size.
+
+    :param file_path: Path to the CSV file
+    :param detect_encoding: Function that returns the codec name of a byte prefix
+    :return: Table, or None if the file is empty
+    """
+    size = os.path.getsize(file_path)
+    with open(file_path, 'rb') as file:
+        raw = file.read(SNIFF_BYTES)
+    complete = len(raw) >= size
+    encoding = detect_encoding(raw)
+    text = codecs.getincrementaldecoder(encoding)(errors='replace').decode(raw, final=complete)
+    if not complete:
+        # Drop the partial last line
+        text = text[:text.rfind('\n') + 1] or text
+    dialect = _sniff_dialect(text[:16 * 1024])
+    rows = [row for row in csv.reader(io.StringIO(text, newline=''), dialect) if any(cell.strip() for cell in row)]
+    if not rows:
+        return None
+    headers = _headers(rows[0])
+    data = rows[1:]
+    if complete:
+        row_count = len(data)
+    else:
+        parsed_bytes = len(text.encode(encoding, errors='replace'))
+        row_count = round(len(data) * size / parsed_bytes) if parsed_bytes else None
+    delimiter = {'\t': 'tab', ' ': 'space'}.get(dialect.delimiter, repr(dialect.delimiter))
+    return Table(os.path.basename(file_path), headers, data[:INFERENCE_ROWS], row_count, exact=complete,
+                 details={"delimiter": delimiter, "encoding": encoding})
+
+
+def read_xlsx_tables(file_path):
+    """
+    Yield a Table per sheet of an .xlsx workbook.
+
+    The workbook is opened once in read-only mode, which streams rows from
+    the archive, and only the header and ``INFERENCE_ROWS`` rows of each
+    sheet are parsed. Sheets that end within those rows are counted
+    exactly; larger ones report the row count of the sheet's stored
+    dimensions as an estimate.
+    """
+    from openpyxl import load_workbook
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            read = list(sheet.iter_rows(max_row=INFERENCE_ROWS + 1, values_only=True))
+            rows = [row for row in read if any(value is not None for value in row)]
+            if not rows:
+                yield Table(sheet.title, [], [], 0)
+                continue
+            complete = len(read) <= INFERENCE_ROWS
+            if complete:
+                row_count = len(rows) - 1
+            else:
+                try:
+                    # Dimensions are written by the application that saved the file and may be missing or stale.
+                    row_count = max((sheet.max_row or 0) - 1, len(rows) - 1)
+                except (TypeError, ValueError):
+                    row_count = None
+            yield Table(sheet.title, _headers(rows[0]), rows[1:], row_count, exact=complete)
+    finally:
+        workbook.close()
+
+
+def read_xls_tables(file_path):
+    """Yield a Table per sheet of a legacy .xls workbook, opened once through pandas."""
+    import pandas as pd
+    with pd.ExcelFile(file_path) as xl:
+        for sheet_name in xl.sheet_names:
+            frame = xl.parse(sheet_name, header=None, nrows=INFERENCE_ROWS + 1)
+            rows = [row for row in frame.astype(object).where(frame.notna(), None).values.tolist()
+                    if any(value is not None for value in row)]
+            if not rows:
+                yield Table(sheet_name, [], [], 0)
+                continue
+            try:
+                row_count = xl.book.sheet_by_name(sheet_name).nrows - 1
+            except AttributeError:
+                row_count = None
+            yield Table(sheet_name, _headers(rows[0]), rows[1:], row_count)
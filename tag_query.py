@@ -0,0 +1,251 @@
+import re
+from rename_log import normalize_tag
+
+# Query syntax (operators are case-sensitive keywords or symbols):
+#   invoice, 2023          both tags (a comma, "&" or AND means AND)
+#   invoice | receipt      either tag (OR)
+#   -draft / NOT draft     exclude a tag
+#   fin*                   any tag starting with "fin"
+#   (a | b), c             parentheses group sub-expressions
+# Words that follow each other without an operator form one tag, so
+# "annual report" searches for the tag "annual_report".
+
+TOKEN_RE = re.compile(r'\s*(\(|\)|\||,|&|-(?=\S)|[^\s()|,&]+)')
+
+
+class TagQueryError(ValueError):
+    pass
+
+
+def intersect_sorted(a, b):
+    """
+    Intersect two ascending id lists by merging them.
+
+    :param a: Ascending list of ids
+    :param b: Ascending list of ids
+    :return: Ascending list of ids present in both
+    """
+    if len(a) > len(b):
+        a, b = b, a
+    result = []
+    i = j = 0
+    len_a, len_b = len(a), len(b)
+    while i < len_a and j < len_b:
+        x, y = a[i], b[j]
+        if x == y:
+            result.append(x)
+            i += 1
+            j += 1
+        elif x < y:
+            i += 1
+        else:
+            j += 1
+    return result
+
+
+def union_sorted(a, b):
+    """
+    Merge two ascending id lists without duplicates.
+
+    :param a: Ascending list of ids
+    :param b: Ascending list of ids
+    :return: Ascending list of ids present in either
+    """
+    result = []
+    i = j = 0
+    len_a, len_b = len(a), len(b)
+    while i < len_a and j < len_b:
+        x, y = a[i], b[j]
+        if x == y:
+            result.append(x)
+            i += 1
+            j += 1
+        elif x < y:
+            result.append(x)
+            i += 1
+        else:
+            result.append(y)
+            j += 1
+    result.extend(a[i:])
+    result.extend(b[j:])
+    return result
+
+
+def difference_sorted(a, b):
+    """
+    Remove the ids of one ascending list from another.
+
+    :param a: Ascending list of ids
+    :param b: Ascending list of ids to remove
+    :return: Ascending list of ids in ``a`` but not in ``b``
+    """
+    result = []
+    i = j = 0
+    len_a, len_b = len(a), len(b)
+    while i < len_a:
+        if j >= len_b:
+            result.extend(a[i:])
+            break
+        x, y = a[i], b[j]
+        if x == y:
+            i += 1
+            j += 1
+        elif x < y:
+            result.append(x)
+            i += 1
+        else:
+            j += 1
+    return result
+
+
+def tokenize(query):
+    tokens = []
+    position = 0
+    query = query.strip()
+    while position < len(query):
+        match = TOKEN_RE.match(query, position)
+        if not match:
+            break
+        tokens.append(match.group(1))
+        position = match.end()
+    return tokens
+
+
+def parse_query(query):
+    """
+    Parse a tag query into a tree of tuples.
+
+    Nodes are ``('tag', name)``, ``('prefix', name)``, ``('not', node)``,
+    ``('and', [nodes])`` and ``('or', [nodes])``.
+
+    :param query: Query text
+    :return: Root node, or None for an empty query
+    """
+    tokens = tokenize(query)
+    if not tokens:
+        return None
+    parser = _Parser(tokens)
+    node = parser.parse_or()
+    if parser.position != len(tokens):
+        raise TagQueryError(f"Unexpected '{tokens[parser.position]}' in tag query")
+    return node
+
+
+class _Parser:
+    OPERATORS = {'(', ')', '|', ',', '&', '-', 'AND', 'OR', 'NOT'}
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def take(self):
+        token = self.peek()
+        self.position += 1
+        return token
+
+    def parse_or(self):
+        nodes = [self.parse_and()]
+        while self.peek() in ('|', 'OR'):
+            self.take()
+            nodes.append(self.parse_and())
+        return nodes[0] if len(nodes) == 1 else ('or', nodes)
+
+    def parse_and(self):
+        nodes = [self.parse_not()]
+        while True:
+            token = self.peek()
+            if token in (',', '&', 'AND'):
+                self.take()
+                # Tolerate trailing separators such as "invoice, ".
+                if self.peek() in (None, ')', '|', 'OR'):
+                    break
+            elif token not in ('-', 'NOT', '('):
+                break
+            nodes.append(self.parse_not())
+        return nodes[0] if len(nodes) == 1 else ('and', nodes)
+
+    def parse_not(self):
+        if self.peek() in ('-', 'NOT'):
+            self.take()
+            return ('not', self.parse_not())
+        return self.parse_atom()
+
+    def parse_atom(self):
+        token = self.peek()
+        if token == '(':
+            self.take()
+            node = self.parse_or()
+            if self.take() != ')':
+                raise TagQueryError("Missing ')' in tag query")
+            return node
+        if token is None or token in self.OPERATORS:
+            raise TagQueryError("Expected a tag in tag query")
+        words = []
+        while self.peek() is not None and self.peek() not in self.OPERATORS:
+            words.append(self.take())
+        term = '_'.join(words)
+        if term.endswith('*'):
+            return ('prefix', normalize_tag(term.rstrip('*')))
+        return ('tag', normalize_tag(term))
+
+
+def evaluate(node, index):
+    """
+    Evaluate a parsed query against a rename log's tag index.
+
+    :param node: Node returned by ``parse_query``
+    :param index: A RenameLogBackend
+    :return: Ascending list of matching entry ids
+    """
+    kind = node[0]
+    if kind == 'tag':
+        return index.postings(node[1])
+    if kind == 'prefix':
+        return index.prefix_postings(node[1])
+    if kind == 'not':
+        return difference_sorted(index.all_ids(), evaluate(node[1], index))
+    if kind == 'or':
+        result = []
+        for child in node[1]:
+            result = union_sorted(result, evaluate(child, index))
+        return result
+    if kind == 'and':
+        positives = [child for child in node[1] if child[0] != 'not']
+        negatives = [child[1] for child in node[1] if child[0] == 'not']
+        if not positives:
+            result = index.all_ids()
+        else:
+            # Intersect the shortest posting lists first so the working set shrinks quickly.
+            lists = sorted((evaluate(child, index) for child in positives), key=len)
+            result = lists[0]
+            for ids in lists[1:]:
+                if not result:
+                    break
+                result = intersect_sorted(result, ids)
+        for child in negatives:
+            if not result:
+                break
+            result = difference_sorted(result, evaluate(child, index))
+        return result
+    raise TagQueryError(f"Unknown query node '{kind}'")
+
+
+def search(query, index, limit=None):
+    """
+    Run a tag query and load the matching log entries.
+
+    :param query: Query text
+    :param index: A RenameLogBackend
+    :param limit: Maximum number of entries to return
+    :return: List of matching log entries
+    """
+    node = parse_query(query)
+    if node is None:
+        return []
+    ids = evaluate(node, index)
+    if limit is not None:
+        ids = ids[:limit]
+    return index.entries_by_ids(ids)
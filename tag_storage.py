@@ -0,0 +1,373 @@
+import os
+import sys
+import json
+import time
+import errno
+import ctypes
+import sqlite3
+import logging
+import plistlib
+import threading
+import ctypes.util
+
+SIDECAR_FILE = 'file_tags.db'
+LINUX_TAG_ATTRIBUTE = 'user.xdg.tags'
+MACOS_TAG_ATTRIBUTE = 'com.apple.metadata:_kMDItemUserTags'
+
+# errno values meaning "this filesystem cannot store extended attributes"
+_UNSUPPORTED_ERRNOS = {getattr(errno, name) for name in ('ENOTSUP', 'EOPNOTSUPP') if hasattr(errno, name)}
+# ... or only this file cannot (e.g. user attributes on special files, read-only mounts)
+_FILE_UNSUPPORTED_ERRNOS = {errno.EPERM, errno.EROFS}
+_MISSING_ERRNOS = {getattr(errno, name) for name in ('ENODATA', 'ENOATTR') if hasattr(errno, name)}
+
+logger = logging.getLogger(__name__)
+
+
+class TagBackend:
+    """
+    Stores the tags of a file. ``write`` raises OSError when the file's
+    filesystem cannot hold them; ``read`` returns None when the file has no
+    tags in this backend.
+    """
+
+    name = None
+
+    def write(self, path, tags):
+        raise NotImplementedError
+
+    def read(self, path):
+        raise NotImplementedError
+
+    def remove(self, path):
+        raise NotImplementedError
+
+    def write_many(self, items):
+        for path, tags in items:
+            self.write(path, tags)
+
+
+class LinuxXattrBackend(TagBackend):
+    """Comma-separated tags in the ``user.xdg.tags`` attribute (freedesktop.org convention)."""
+
+    name = 'xattr'
+
+    def write(self, path, tags):
+        if tags:
+            os.setxattr(path, LINUX_TAG_ATTRIBUTE, ','.join(tags).encode('utf-8'))
+        else:
+            self.remove(path)
+
+    def read(self, path):
+        try:
+            value = os.getxattr(path, LINUX_TAG_ATTRIBUTE)
+        except OSError as e:
+            if e.errno in _MISSING_ERRNOS:
+                return None
+            raise
+        return [tag.strip() for tag in value.decode('utf-8', 'replace').split(',') if tag.strip()]
+
+    def remove(self, path):
+        try:
+            os.removexattr(path, LINUX_TAG_ATTRIBUTE)
+        except OSError as e:
+            if e.errno not in _MISSING_ERRNOS:
+                raise
+
+
+class MacXattrBackend(TagBackend):
+    """
+    Finder tags: a binary property list of tag names in the
+    ``com.apple.metadata:_kMDItemUserTags`` attribute, written through libc
+    (Python has no ``os.setxattr`` on macOS).
+    """
+
+    name = 'xattr'
+
+    def __init__(self):
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.libc.setxattr.argtypes = [ctypes.c_char_p, ctypes.c_char_p, ctypes.c_void_p, ctypes.c_size_t,
+                                       ctypes.c_uint32, ctypes.c_int]
+        self.libc.getxattr.argtypes = [ctypes.c_char_p, ctypes.c_char_p, ctypes.c_void_p, ctypes.c_size_t,
+                                       ctypes.c_uint32, ctypes.c_int]
+        self.libc.getxattr.restype = ctypes.c_ssize_t
+        self.libc.removexattr.argtypes = [ctypes.c_char_p, ctypes.c_char_p, ctypes.c_int]
+        self._name = MACOS_TAG_ATTRIBUTE.encode('utf-8')
+
+    def _error(self, path):
+        code = ctypes.get_errno()
+        return OSError(code, os.strerror(code), path)
+
+    def write(self, path, tags):
+        if not tags:
+            self.remove(path)
+            return
+        value = plistlib.dumps(list(tags), fmt=plistlib.FMT_BINARY)
+        if self.libc.setxattr(os.fsencode(path), self._name, value, len(value), 0, 0) != 0:
+            raise self._error(path)
+
+    def read(self, path):
+        encoded = os.fsencode(path)
+        size = self.libc.getxattr(encoded, self._name, None, 0, 0, 0)
+        if size < 0:
+            error = self._error(path)
+            if error.errno in _MISSING_ERRNOS:
+                return None
+            raise error
+        buffer = ctypes.create_string_buffer(size)
+        size = self.libc.getxattr(encoded, self._name, buffer, size, 0, 0)
+        if size < 0:
+            raise self._error(path)
+        # Finder stores "name\ncolor"; only the name is a tag.
+        return [str(tag).split('\n')[0] for tag in plistlib.loads(buffer.raw[:size])]
+
+    def remove(self, path):
+        if self.libc.removexattr(os.fsencode(path), self._name, 0) != 0:
+            error = self._error(path)
+            if error.errno not in _MISSING_ERRNOS:
+                raise error
+
+
+class SidecarBackend(TagBackend):
+    """Tags kept in a SQLite database by absolute path, for filesystems (and platforms) without xattrs."""
+
+    name = 'sidecar'
+
+    def __init__(self, path=SIDECAR_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS file_tags (
+                path TEXT PRIMARY KEY,
+                tags TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+
+    def write(self, path, tags):
+        self.write_many([(path, tags)])
+
+    def write_many(self, items):
+        rows = [(os.path.abspath(path), json.dumps(list(tags)), time.time()) for path, tags in items]
+        with self._lock:
+            self.conn.execute("BEGIN")
+            try:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO file_tags (path, tags, updated_at) VALUES (?, ?, ?)", rows)
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+
+    def read(self, path):
+        with self._lock:
+            row = self.conn.execute("SELECT tags FROM file_tags WHERE path = ?",
+                                    (os.path.abspath(path),)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def remove(self, path):
+        with self._lock:
+            self.conn.execute("DELETE FROM file_tags WHERE path = ?", (os.path.abspath(path),))
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+def native_backend():
+    """:return: The xattr backend of this platform, or None (Windows)"""
+    if sys.platform == 'darwin':
+        return MacXattrBackend()
+    if hasattr(os, 'setxattr'):
+        return LinuxXattrBackend()
+    return None
+
+
+class TagStorage:
+    """
+    Writes file tags as extended attributes where the filesystem supports
+    them, and to a sidecar database otherwise.
+
+    A filesystem that rejects xattrs is remembered by device, so later files
+    on it go straight to the sidecar without another failed system call.
+    ``tag_backend`` chooses ``auto`` (default), ``xattr``, ``sidecar`` or ``none``.
+    """
+
+    def __init__(self, mode=None, sidecar_path=None):
+        self.mode = (mode or os.getenv("tag_backend", "auto")).lower()
+        self.sidecar_path = sidecar_path or os.getenv("tag_sidecar_path", SIDECAR_FILE)
+        self.native = native_backend() if self.mode in ('auto', 'xattr') else None
+        self._sidecar = None
+        self._lock = threading.Lock()
+        self._unsupported_devices = set()
+
+    @property
+    def sidecar(self):
+        # Opened on first use so xattr-only setups never create the database.
+        with self._lock:
+            if self._sidecar is None:
+                self._sidecar = SidecarBackend(self.sidecar_path)
+            return self._sidecar
+
+    def _device(self, path):
+        try:
+            return os.stat(path).st_dev
+        except OSError:
+            return None
+
+    def _use_native(self, path):
+        return self.native is not None and self._device(path) not in self._unsupported_devices
+
+    def apply_many(self, items):
+        """
+        Write the tags of several files; sidecar writes share one transaction.
+
+        :param items: Iterable of (path, tags)
+        :return: Dict of path -> backend name ('xattr' or 'sidecar'); files that failed are left out
+        """
+        if self.mode == 'none':
+            return {}
+        written = {}
+        fallback = []
+        for path, tags in items:
+            if self._use_native(path):
+                try:
+                    self.native.write(path, tags)
+                    written[path] = self.native.name
+                    continue
+                except OSError as e:
+                    unsupported = e.errno in _UNSUPPORTED_ERRNOS or e.errno in _FILE_UNSUPPORTED_ERRNOS
+                    if not unsupported or self.mode == 'xattr':
+                        logger.warning("Could not write tags to '%s': %s", path, e)
+                        continue
+                    if e.errno in _UNSUPPORTED_ERRNOS:
+                        self._unsupported_devices.add(self._device(path))
+                    logger.info("Extended attributes are not supported for '%s'; using '%s'",
+                                path, self.sidecar_path)
+            fallback.append((path, tags))
+        if fallback:
+            self.sidecar.write_many(fallback)
+            written.update((path, self.sidecar.name) for path, _ in fallback)
+        return written
+
+    def apply(self, path, tags):
+        return self.apply_many([(path, tags)]).get(path)
+
+    def read(self, path):
+        """:return: Tags stored for ``path`` (xattr first, then sidecar), or None"""
+        if self.mode == 'none':
+            return None
+        if self._use_native(path):
+            try:
+                tags = self.native.read(path)
+            except OSError as e:
+                if e.errno not in _UNSUPPORTED_ERRNOS and e.errno not in _FILE_UNSUPPORTED_ERRNOS:
+                    raise
+                tags = None
+            if tags is not None:
+                return tags
+        return self.sidecar.read(path) if self._has_sidecar() else None
+
+    def _has_sidecar(self):
+        return self.mode != 'xattr' and (self._sidecar is not None or os.path.exists(self.sidecar_path))
+
+    def remove(self, path, previous_path=None):
+        """Remove the tags of ``path`` (and sidecar tags recorded under ``previous_path``)."""
+        if self.mode == 'none':
+            return
+        if self._use_native(path):
+            try:
+                self.native.remove(path)
+            except OSError as e:
+                logger.warning("Could not remove tags from '%s': %s", path, e)
+        if self._has_sidecar():
+            self.sidecar.remove(path)
+            if previous_path:
+                self.sidecar.remove(previous_path)
+
+
+def sync_from_disk(file_ops, batch_size=500):
+    """
+    Reverse sync: update the tags in the rename log (and content index)
+    from the tags stored on disk, e.g. after tags were edited in Finder or
+    a file manager.
+
+    :return: Number of log entries whose tags changed
+    """
+    rename_log = file_ops.rename_log
+    ids = rename_log.all_ids()
+    latest = {}
+    for start in range(0, len(ids), batch_size):
+        chunk = ids[start:start + batch_size]
+        for entry_id, entry in zip(chunk, rename_log.entries_by_ids(chunk)):
+            latest[entry["full_path"]] = (entry_id, entry)
+
+    changed = 0
+    with file_ops.batch():
+        for path, (entry_id, entry) in latest.items():
+            if not os.path.exists(path):
+                continue
+            try:
+                tags = file_ops.tag_storage.read(path)
+            except OSError as e:
+                logger.warning("Could not read tags of '%s': %s", path, e)
+                continue
+            if tags is None:
+                continue
+            tags = [file_ops.sanitize_tag(tag) for tag in tags if file_ops.sanitize_tag(tag)]
+            if tags != entry["tags"]:
+                rename_log.update_tags(entry_id, tags)
+                if file_ops.content_index is not None:
+                    file_ops.content_index.update_tags(entry_id, tags)
+                changed += 1
+    return changed
+
+
+def push_to_disk(file_ops, batch_size=500):
+    """
+    Write the tags in the rename log to the files, e.g. after moving the
+    log to another machine or switching backends.
+
+    :return: Number of files tagged
+    """
+    rename_log = file_ops.rename_log
+    ids = rename_log.all_ids()
+    latest = {}
+    for start in range(0, len(ids), batch_size):
+        chunk = ids[start:start + batch_size]
+        for entry in rename_log.entries_by_ids(chunk):
+            latest[entry["full_path"]] = entry["tags"]
+    items = [(path, tags) for path, tags in latest.items() if os.path.exists(path)]
+    written = 0
+    for start in range(0, len(items), batch_size):
+        written += len(file_ops.tag_storage.apply_many(items[start:start + batch_size]))
+    return written
+
+
+if __name__ == '__main__':
+    import argparse
+    from dotenv import load_dotenv
+    import telemetry
+
+    load_dotenv()
+    telemetry.configure_from_env()
+    parser = argparse.ArgumentParser(description="Synchronize file tags between the rename log and the files.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('pull', help="Update the rename log from the tags stored on disk")
+    subparsers.add_parser('push', help="Write the tags in the rename log to the files")
+    show_parser = subparsers.add_parser('show', help="Print the tags stored for files")
+    show_parser.add_argument('paths', nargs='+')
+    args = parser.parse_args()
+
+    from file_operations import FileOperations
+    file_ops = FileOperations()
+    if args.command == 'pull':
+        print(f"Updated the tags of {sync_from_disk(file_ops)} log entries")
+    elif args.command == 'push':
+        print(f"Tagged {push_to_disk(file_ops)} files")
+    else:
+        for path in args.paths:
+            tags = file_ops.tag_storage.read(path)
+            print(f"{path}: {', '.join(tags) if tags else '(no tags)'}")
@@ -0,0 +1,209 @@
+import os
+import json
+import time
+import bisect
+import logging
+import threading
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+METRIC_PREFIX = 'file_organizer'
+# Upper bounds (seconds) of the span duration histogram buckets.
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+DEFAULT_LOG_LEVEL = 'INFO'
+LOG_FORMAT = '%(asctime)s %(levelname)s %(name)s: %(message)s'
+
+logger = logging.getLogger(__name__)
+
+
+def _label_key(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items() if value is not None))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class Telemetry:
+    """
+    Process-wide counters and span timings.
+
+    Spans are kept as duration histograms per name and label set, and, when a
+    trace file is configured, also written to it as one JSON object per line.
+    ``render_prometheus`` exports everything in the Prometheus text format.
+    """
+
+    def __init__(self, trace_path=None):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._trace = None
+        self._trace_lock = threading.Lock()
+        if trace_path:
+            self.open_trace(trace_path)
+
+    def open_trace(self, path):
+        with self._trace_lock:
+            if self._trace:
+                self._trace.close()
+            self._trace = open(path, 'a', buffering=1, encoding='utf-8')
+
+    def close(self):
+        with self._trace_lock:
+            if self._trace:
+                self._trace.close()
+                self._trace = None
+
+    def increment(self, name, amount=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, seconds, error=None, **labels):
+        """Record a finished span that took ``seconds``."""
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * len(DURATION_BUCKETS), 0, 0.0]
+            index = bisect.bisect_left(DURATION_BUCKETS, seconds)
+            if index < len(DURATION_BUCKETS):
+                histogram[0][index] += 1
+            histogram[1] += 1
+            histogram[2] += seconds
+        if self._trace:
+            record = {"ts": round(time.time() - seconds, 6), "span": name, "duration_ms": round(seconds * 1000, 3),
+                      "thread": threading.current_thread().name}
+            record.update(labels)
+            if error:
+                record["error"] = error
+            line = json.dumps(record, default=str) + '\n'
+            with self._trace_lock:
+                if self._trace:
+                    self._trace.write(line)
+
+    @contextmanager
+    def span(self, name, **labels):
+        """
+        Time the enclosed block. Labels can be added inside the block through
+        the yielded dict, e.g. once the file type is known.
+        """
+        start = time.perf_counter()
+        error = None
+        try:
+            yield labels
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - start, error, **labels)
+
+    def snapshot(self):
+        """
+        :return: {"counters": {name: {labels: value}}, "spans": {name: {labels: (count, total_seconds)}}}
+        """
+        with self._lock:
+            counters, spans = {}, {}
+            for (name, key), value in self._counters.items():
+                counters.setdefault(name, {})[key] = value
+            for (name, key), (_, count, total) in self._histograms.items():
+                spans.setdefault(name, {})[key] = (count, total)
+        return {"counters": counters, "spans": spans}
+
+    def render_prometheus(self):
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, (list(h[0]), h[1], h[2])) for key, h in self._histograms.items())
+        current = None
+        for (name, key), value in counters:
+            metric = f"{METRIC_PREFIX}_{name.replace('.', '_')}_total"
+            if metric != current:
+                lines.append(f"# TYPE {metric} counter")
+                current = metric
+            lines.append(f"{metric}{_format_labels(key)} {value}")
+        for (name, key), (buckets, count, total) in histograms:
+            metric = f"{METRIC_PREFIX}_{name.replace('.', '_')}_seconds"
+            if metric != current:
+                lines.append(f"# TYPE {metric} histogram")
+                current = metric
+            cumulative = 0
+            for bound, bucket_count in zip(DURATION_BUCKETS, buckets):
+                cumulative += bucket_count
+                lines.append(f"{metric}_bucket{_format_labels(key, [('le', str(bound))])} {cumulative}")
+            lines.append(f"{metric}_bucket{_format_labels(key, [('le', '+Inf')])} {count}")
+            lines.append(f"{metric}_count{_format_labels(key)} {count}")
+            lines.append(f"{metric}_sum{_format_labels(key)} {total:.6f}")
+        return '\n'.join(lines) + '\n'
+
+
+_telemetry = Telemetry()
+_metrics_server = None
+
+
+def get_telemetry():
+    return _telemetry
+
+
+def span(name, **labels):
+    return _telemetry.span(name, **labels)
+
+
+def observe(name, seconds, **labels):
+    _telemetry.observe(name, seconds, **labels)
+
+
+def increment(name, amount=1, **labels):
+    _telemetry.increment(name, amount, **labels)
+
+
+def start_metrics_server(port, host='127.0.0.1'):
+    """
+    Serve the Prometheus text export at http://host:port/metrics on a daemon thread.
+
+    :return: The HTTP server (already started); calling again returns the same server
+    """
+    global _metrics_server
+    if _metrics_server is not None:
+        return _metrics_server
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?', 1)[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = _telemetry.render_prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    _metrics_server = ThreadingHTTPServer((host, port), MetricsHandler)
+    _metrics_server.daemon_threads = True
+    threading.Thread(target=_metrics_server.serve_forever, name="metrics", daemon=True).start()
+    logger.info("Serving metrics at http://%s:%d/metrics", host, _metrics_server.server_address[1])
+    return _metrics_server
+
+
+def configure_from_env():
+    """
+    Set up logging (``log_level``, default INFO), the JSON-lines trace file
+    (``trace_file``) and the Prometheus endpoint (``metrics_port``) from the
+    environment. Called once by the GUI and CLI entry points.
+    """
+    level = os.getenv("log_level", DEFAULT_LOG_LEVEL).upper()
+    logging.basicConfig(level=getattr(logging, level, logging.INFO), format=LOG_FORMAT)
+    trace_file = os.getenv("trace_file")
+    if trace_file and _telemetry._trace is None:
+        _telemetry.open_trace(trace_file)
+    port = os.getenv("metrics_port")
+    if port:
+        start_metrics_server(int(port))
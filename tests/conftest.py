@@ -0,0 +1,18 @@
+import pytest
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """A working directory for the log, journal and index files, with settings for tests."""
+    monkeypatch.chdir(tmp_path)
+    # Extract in the test process and keep tags in the sidecar database under tmp_path.
+    monkeypatch.setenv("extraction_processes", "0")
+    monkeypatch.setenv("tag_backend", "sidecar")
+    monkeypatch.setenv("content_index_enabled", "true")
+    return tmp_path
+
+
+@pytest.fixture
+def file_ops(workdir):
+    from file_operations import FileOperations
+    return FileOperations()
@@ -0,0 +1,43 @@
+import pytest
+from content_index import ContentIndex, ContentIndexError, to_fts_query
+
+
+def test_to_fts_query_words_phrases_prefixes_and_exclusions():
+    assert to_fts_query("budget") == '"budget"'
+    assert to_fts_query('"quarterly report" budget') == '"quarterly report" AND "budget"'
+    assert to_fts_query("fin*") == '"fin"*'
+    assert to_fts_query('budget -draft -"old copy"') == '"budget" NOT "draft" NOT "old copy"'
+
+
+def test_to_fts_query_treats_syntax_as_text():
+    assert to_fts_query('a AND (b OR "c') == '"a" AND "AND" AND "b" AND "OR" AND "c"'
+    assert to_fts_query("don't") == '"don" AND "t"'
+
+
+@pytest.mark.parametrize("query", ["", "   ", "-budget", "***", '""'])
+def test_to_fts_query_needs_something_to_match(query):
+    with pytest.raises(ContentIndexError):
+        to_fts_query(query)
+
+
+def test_search_ranks_and_filters(tmp_path):
+    index = ContentIndex(str(tmp_path / "content_index.db"))
+    index.add(1, str(tmp_path / "budget_2023.txt"), ["finance"], "quarterly budget for the team")
+    index.add(2, str(tmp_path / "notes.txt"), ["draft"], "the budget is mentioned once")
+    index.add(3, str(tmp_path / "travel.txt"), [], "flights and hotels")
+
+    assert [result["id"] for result in index.search("budget")] == [1, 2]
+    assert [result["id"] for result in index.search("budget -draft")] == [1]
+    assert [result["id"] for result in index.search("budget", allowed_ids={2})] == [2]
+    assert index.search("missing") == []
+
+
+def test_search_content_with_a_tag_filter(workdir, file_ops):
+    (workdir / "a.txt").write_text("annual budget review")
+    (workdir / "b.txt").write_text("budget draft")
+    file_ops.apply_renames([(str(workdir / "a.txt"), "review.txt", ["finance"]),
+                            (str(workdir / "b.txt"), "draft.txt", ["draft"])])
+
+    results = file_ops.search_content("budget", tag_filter="-draft")
+
+    assert [result["new_name"] for result in results] == ["review.txt"]
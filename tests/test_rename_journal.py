@@ -0,0 +1,97 @@
+import os
+from rename_journal import unique_path, DONE, FAILED, RENAMED
+from file_operations import FileOperations
+
+
+def write(path, text="content"):
+    with open(path, 'w') as f:
+        f.write(text)
+    return str(path)
+
+
+def test_unique_path_keeps_a_free_name(tmp_path):
+    assert unique_path(str(tmp_path / "report.txt")) == str(tmp_path / "report.txt")
+
+
+def test_unique_path_counts_past_existing_and_taken_names(tmp_path):
+    write(tmp_path / "report.txt")
+    write(tmp_path / "report_1.txt")
+    taken = {str(tmp_path / "report_2.txt")}
+    assert unique_path(str(tmp_path / "report.txt"), taken) == str(tmp_path / "report_3.txt")
+
+
+def test_unique_path_without_extension(tmp_path):
+    write(tmp_path / "README")
+    assert unique_path(str(tmp_path / "README")) == str(tmp_path / "README_1")
+
+
+def test_apply_renames_adds_a_suffix_on_collision(workdir, file_ops):
+    first = write(workdir / "a.txt", "first")
+    second = write(workdir / "b.txt", "second")
+    write(workdir / "same.txt", "already there")
+
+    operations = file_ops.apply_renames([(first, "same.txt", ["x"]), (second, "same.txt", ["y"])])
+
+    assert [op.state for op in operations] == [DONE, DONE]
+    assert [os.path.basename(op.target) for op in operations] == ["same_1.txt", "same_2.txt"]
+    with open(workdir / "same_2.txt") as f:
+        assert f.read() == "second"
+    assert [entry["new_name"] for entry in file_ops.rename_log.entries_by_ids(
+        [op.entry_id for op in operations])] == ["same_1.txt", "same_2.txt"]
+
+
+def test_undo_batch_restores_names_and_removes_entries(workdir, file_ops):
+    source = write(workdir / "scan.txt", "quarterly budget")
+    operations = file_ops.apply_renames([(source, "budget.txt", ["finance"])])
+    assert file_ops.search_content("budget")
+
+    undone = file_ops.undo_batch()
+
+    assert [op.id for op in undone] == [op.id for op in operations]
+    assert os.path.exists(source) and not os.path.exists(workdir / "budget.txt")
+    assert file_ops.search_files_by_tags(["finance"]) == []
+    assert file_ops.search_content("budget") == []
+
+
+def test_recover_renames_logs_a_rename_that_reached_the_disk(workdir, file_ops):
+    # Crash after os.replace and the journal commit, before the file was logged.
+    source = write(workdir / "old.txt")
+    target = str(workdir / "new.txt")
+    _, (op,) = file_ops.journal.plan([(source, target, ["tag"])])
+    os.replace(source, target)
+    op.state = RENAMED
+    file_ops.journal.update([op])
+
+    restarted = FileOperations()
+    assert restarted.recover_renames() == 1
+
+    (recovered,) = restarted.journal.operations(op.batch_id)
+    assert recovered.state == DONE
+    assert [entry["full_path"] for entry in restarted.search_files_by_tags(["tag"])] == [target]
+    assert restarted.journal.unfinished() == []
+
+
+def test_recover_renames_does_not_log_a_finished_rename_twice(workdir, file_ops):
+    # Crash after the log committed, before the journal recorded the rename as done.
+    source = write(workdir / "old.txt")
+    (op,) = file_ops.apply_renames([(source, "new.txt", ["tag"])])
+    op.state = RENAMED
+    file_ops.journal.update([op])
+
+    restarted = FileOperations()
+    restarted.recover_renames()
+
+    assert restarted.journal.operations(op.batch_id)[0].state == DONE
+    assert len(restarted.search_files_by_tags(["tag"])) == 1
+
+
+def test_recover_renames_fails_a_rename_that_never_happened(workdir, file_ops):
+    source = write(workdir / "old.txt")
+    _, (op,) = file_ops.journal.plan([(source, str(workdir / "new.txt"), ["tag"])])
+
+    restarted = FileOperations()
+    restarted.recover_renames()
+
+    assert restarted.journal.operations(op.batch_id)[0].state == FAILED
+    assert os.path.exists(source)
+    assert restarted.search_files_by_tags(["tag"]) == []
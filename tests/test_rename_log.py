@@ -0,0 +1,51 @@
+import json
+from rename_log import SQLiteRenameLog
+
+
+def entry(number):
+    return {"original_name": f"scan{number}.pdf", "new_name": f"invoice{number}.pdf",
+            "full_path": f"/docs/invoice{number}.pdf", "tags": ["invoice"]}
+
+
+def write_log(path, entries):
+    with open(path, 'w') as f:
+        json.dump(entries, f)
+
+
+def test_import_json_is_idempotent(tmp_path):
+    legacy = tmp_path / "renamed_files.json"
+    write_log(legacy, [entry(1), entry(2)])
+    log = SQLiteRenameLog(str(tmp_path / "renamed_files.db"))
+
+    assert log.import_json(str(legacy)) == 2
+    assert log.import_json(str(legacy)) == 0
+    assert log.tag_counts() == {"invoice": 2}
+
+
+def test_import_json_imports_only_appended_entries(tmp_path):
+    legacy = tmp_path / "renamed_files.json"
+    write_log(legacy, [entry(1), entry(2)])
+    log = SQLiteRenameLog(str(tmp_path / "renamed_files.db"))
+    log.import_json(str(legacy))
+
+    write_log(legacy, [entry(1), entry(2), entry(3)])
+
+    assert log.import_json(str(legacy)) == 1
+    assert log.tag_counts() == {"invoice": 3}
+
+
+def test_import_json_skips_logged_entries_of_a_rewritten_file(tmp_path):
+    legacy = tmp_path / "renamed_files.json"
+    write_log(legacy, [entry(1), entry(2), entry(3)])
+    log = SQLiteRenameLog(str(tmp_path / "renamed_files.db"))
+    log.import_json(str(legacy))
+
+    write_log(legacy, [entry(2), entry(4)])
+
+    assert log.import_json(str(legacy)) == 1
+    assert log.tag_counts() == {"invoice": 4}
+
+
+def test_import_json_without_a_file(tmp_path):
+    log = SQLiteRenameLog(str(tmp_path / "renamed_files.db"))
+    assert log.import_json(str(tmp_path / "missing.json")) == 0
@@ -0,0 +1,34 @@
+import pytest
+from tag_query import parse_query, TagQueryError
+
+
+def test_parse_query_operators():
+    assert parse_query("finance -q1") == ('and', [('tag', 'finance'), ('not', ('tag', 'q1'))])
+    assert parse_query("invoice, 2023 | receipt") == \
+        ('or', [('and', [('tag', 'invoice'), ('tag', '2023')]), ('tag', 'receipt')])
+    assert parse_query("NOT draft") == ('not', ('tag', 'draft'))
+    assert parse_query("(a | b), c") == ('and', [('or', [('tag', 'a'), ('tag', 'b')]), ('tag', 'c')])
+
+
+def test_parse_query_words_and_prefixes():
+    assert parse_query("Annual Report") == ('tag', 'annual_report')
+    assert parse_query("fin*") == ('prefix', 'fin')
+    assert parse_query("invoice, ") == ('tag', 'invoice')
+    assert parse_query("   ") is None
+
+
+@pytest.mark.parametrize("query", ["(invoice", "invoice |", "-", "a | )"])
+def test_parse_query_rejects_malformed_queries(query):
+    with pytest.raises(TagQueryError):
+        parse_query(query)
+
+
+def test_search_files_by_query(workdir, file_ops):
+    for name, tags in (("a.txt", ["finance", "q1"]), ("b.txt", ["finance", "q2"]), ("c.txt", ["travel"])):
+        (workdir / name).write_text(name)
+        file_ops.log_rename(str(workdir / name), str(workdir / name), tags)
+
+    names = lambda query: sorted(entry["new_name"] for entry in file_ops.search_files_by_query(query))
+    assert names("finance -q1") == ["b.txt"]
+    assert names("q* | travel") == ["a.txt", "b.txt", "c.txt"]
+    assert names("-finance") == ["c.txt"]